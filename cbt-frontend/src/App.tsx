@@ -47,11 +47,14 @@ export default function App() {
     thinking,
     draftMarkdown,
     blackboard,
+    liveDraft,
     startNewSession,
     clearSession,
     run,
     doApprove,
     doReject,
+    doCancel,
+    doContinue,
     refresh,
   } = useCbtSession() as any;
 
@@ -73,6 +76,7 @@ export default function App() {
     if (pending?.status === "HALTED") return "HALTED (needs approval)";
     if (latest?.status === "COMPLETED") return "COMPLETED";
     if (latest?.status === "FAILED") return "FAILED";
+    if (latest?.status === "CANCELLED") return "CANCELLED";
     return threadId ? "READY" : "NO SESSION";
   }, [pending, latest, threadId]);
 
@@ -90,7 +94,11 @@ export default function App() {
     (Array.isArray(blackboard?.drafts) && blackboard.drafts.length
       ? blackboard.drafts[blackboard.drafts.length - 1]?.markdown
       : "");
-  const draftPreviewMd = typeof bbDraftMd === "string" && bbDraftMd.trim() ? bbDraftMd : draftMarkdown;
+  const draftPreviewMd = liveDraft?.markdown
+    ? liveDraft.markdown
+    : typeof bbDraftMd === "string" && bbDraftMd.trim()
+    ? bbDraftMd
+    : draftMarkdown;
 
   const bbTrace = Array.isArray(blackboard?.trace) ? blackboard.trace : [];
   const bbScratch = blackboard?.scratchpad ?? null;
@@ -245,6 +253,16 @@ export default function App() {
             >
               Launch run
             </button>
+            {(thinkingSafe.status === "running" || thinkingSafe.status === "resuming") && (
+              <button className="btn secondary" onClick={() => doCancel()}>
+                Cancel run
+              </button>
+            )}
+            {thinkingSafe.status === "cancelled" && (
+              <button className="btn secondary" onClick={() => doContinue()} disabled={busy}>
+                Continue
+              </button>
+            )}
             {showSessionWarning && <span className="chip bad">Create a session first.</span>}
           </div>
         </div>
@@ -2,6 +2,8 @@
 import { useCallback, useEffect, useMemo, useRef, useState } from "react";
 import {
   approve,
+  cancelRun,
+  continueRun,
   createSession,
   latestRun,
   pendingApproval,
@@ -45,7 +47,7 @@ function extractDraftMarkdownFromPending(pending: RunRecord | null): string {
   return typeof md === "string" ? md : "";
 }
 
-type ThinkingStatus = "idle" | "running" | "halted" | "resuming" | "completed" | "failed";
+type ThinkingStatus = "idle" | "running" | "halted" | "resuming" | "completed" | "failed" | "cancelled";
 type StageStatus = "pending" | "active" | "done" | "error";
 
 type StageInfo = {
@@ -229,6 +231,9 @@ export function useCbtSession() {
   // ✅ NEW: live blackboard state (from WS node_update.state)
   const [blackboard, setBlackboard] = useState<Blackboard | null>(null);
 
+  // markdown of the draft being generated (draft_delta events); cleared when the drafter's node_update lands
+  const [liveDraft, setLiveDraft] = useState<{ runId?: string; version?: number; markdown: string } | null>(null);
+
   const [thinking, setThinking] = useState<Thinking>({
     status: "idle",
     history: [],
@@ -284,6 +289,22 @@ export function useCbtSession() {
         );
       }
 
+      if ((l as any)?.status === "CANCELLED") {
+        return pushHistory(
+          {
+            ...prev,
+            status: "cancelled",
+            runId: (l as any).run_id ?? prev.runId,
+            step: "Cancelled",
+            detail: (l as any).error === "deadline_exceeded" ? "Deadline exceeded." : "Cancelled.",
+            updatedAt: ts,
+            history: prev.history,
+          },
+          "Cancelled",
+          ts
+        );
+      }
+
       if ((l as any)?.status === "FAILED") {
         return pushHistory(
           {
@@ -463,6 +484,47 @@ export function useCbtSession() {
     }
   }, [threadId, refresh]);
 
+  // not gated on `busy`: the inline /run request is still pending while the run executes
+  const doCancel = useCallback(async () => {
+    const runId = thinking.runId;
+    if (!runId) return;
+    try {
+      await cancelRun(runId);
+    } catch (e: any) {
+      setError(e?.message || String(e));
+    }
+  }, [thinking.runId]);
+
+  const doContinue = useCallback(async () => {
+    if (!threadId) return;
+    setBusy(true);
+    setError(null);
+
+    setThinking((prev) =>
+      pushHistory(
+        { ...prev, status: "resuming", step: "Resuming", detail: "Continuing from last checkpoint…" },
+        "Continuing…",
+        new Date().toISOString()
+      )
+    );
+
+    try {
+      await continueRun(threadId);
+      await refresh(threadId);
+    } catch (e: any) {
+      setError(e?.message || String(e));
+      setThinking((prev) =>
+        pushHistory(
+          { ...prev, status: "failed", step: "Failed", detail: e?.message || String(e) },
+          "Continue failed",
+          new Date().toISOString()
+        )
+      );
+    } finally {
+      setBusy(false);
+    }
+  }, [threadId, refresh]);
+
   // connect WS when thread changes
   useEffect(() => {
     wsRef.current?.close();
@@ -473,13 +535,40 @@ export function useCbtSession() {
     const conn = connectWs(
       threadId,
       (msg) => {
+        // delta sync: ws.ts rebuilds `state` from the snapshot + deltas
+        if (msg.type === "snapshot") {
+          if (isObj((msg as any).state)) setBlackboard((msg as any).state as Blackboard);
+          return;
+        }
+
+        if (msg.type === "draft_delta") {
+          const { run_id, version, offset, text } = msg as any;
+          setLiveDraft((prev) => {
+            const same = prev && prev.runId === run_id && prev.version === version;
+            const md = same ? prev.markdown : "";
+            // offset = chars already sent; a gap (missed delta) waits for the node_update instead
+            if (typeof text !== "string" || offset > md.length) return same ? prev : null;
+            return { runId: run_id, version, markdown: md.slice(0, offset) + text };
+          });
+          return;
+        }
+
+        if (msg.type === "draft_reset") {
+          // the stream failed and the drafter retries without streaming: the partial text is void
+          const { run_id, version } = msg as any;
+          setLiveDraft((prev) => (prev && prev.runId === run_id && prev.version === version ? null : prev));
+          return;
+        }
+
         setEvents((prev) => [msg, ...prev].slice(0, 80));
 
         // ✅ NEW: if backend sends full state snapshot, update blackboard immediately
         if (msg.type === "node_update") {
           const s = (msg as any).state;
           if (isObj(s)) setBlackboard(s as Blackboard);
+          if ((msg as any).node === "drafter") setLiveDraft(null);
         }
+        if (msg.type.endsWith("_failed") || msg.type.endsWith("_cancelled")) setLiveDraft(null);
 
         setThinking((prev) => {
           const ts = (msg as any).ts ?? new Date().toISOString();
@@ -611,6 +700,21 @@ export function useCbtSession() {
             );
           }
 
+          if (msg.type === "run_cancelled" || msg.type === "resume_cancelled") {
+            const reason = (msg as any).reason;
+            return pushHistory(
+              {
+                ...prev,
+                status: "cancelled",
+                runId: (msg as any).run_id ?? prev.runId,
+                step: "Cancelled",
+                detail: reason === "deadline_exceeded" ? "Deadline exceeded." : "Cancelled.",
+              },
+              "Cancelled",
+              ts
+            );
+          }
+
           if (msg.type === "run_failed" || msg.type === "resume_failed") {
             return pushHistory(
               {
@@ -635,12 +739,15 @@ export function useCbtSession() {
           t === "run_completed" ||
           t === "resume_completed" ||
           t === "run_failed" ||
-          t === "resume_failed"
+          t === "resume_failed" ||
+          t === "run_cancelled" ||
+          t === "resume_cancelled"
         ) {
           refresh(threadId);
         }
       },
-      (s) => setWsStatus(s)
+      (s) => setWsStatus(s),
+      { sync: "delta" }
     );
 
     wsRef.current = conn;
@@ -672,6 +779,7 @@ export function useCbtSession() {
 
     // ✅ NEW
     blackboard,
+    liveDraft,
 
     thinking,
     draftMarkdown,
@@ -681,5 +789,7 @@ export function useCbtSession() {
     run,
     doApprove,
     doReject,
+    doCancel,
+    doContinue,
   };
 }
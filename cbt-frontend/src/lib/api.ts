@@ -13,14 +13,15 @@ export type RunRequest = {
 export type RunResult =
   | { run_id: string; status: "COMPLETED" }
   | { run_id: string; status: "HALTED"; interrupts: any[] }
-  | { run_id: string; status: "FAILED"; error?: string };
+  | { run_id: string; status: "FAILED"; error?: string }
+  | { run_id: string; status: "CANCELLED"; reason?: string };
 
 export type RunRecord = {
   run_id: string;
   thread_id: string;
   created_at: string;
   updated_at: string;
-  status: "RUNNING" | "HALTED" | "COMPLETED" | "FAILED";
+  status: "RUNNING" | "HALTED" | "COMPLETED" | "FAILED" | "CANCELLED";
   require_human_approval: boolean;
   input_text: string;
   final_markdown?: string | null;
@@ -87,3 +88,17 @@ export function approve(
     body: JSON.stringify(body),
   });
 }
+
+export function cancelRun(run_id: string) {
+  return http<{ run_id: string; status: "CANCELLING" | "CANCELLED" }>(`/runs/${run_id}/cancel`, {
+    method: "POST",
+  });
+}
+
+// resumes the latest (cancelled) run from its last checkpoint
+export function continueRun(thread_id: string) {
+  return http<{ thread_id: string; result: RunResult }>(`/sessions/${thread_id}/continue`, {
+    method: "POST",
+    body: JSON.stringify({}),
+  });
+}
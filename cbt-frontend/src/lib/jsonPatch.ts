@@ -0,0 +1,45 @@
+// cbt-frontend/src/lib/jsonPatch.ts
+// Applies the RFC 6902 subset the backend emits (add / remove / replace; "-" appends to arrays).
+// Mirrors cbt_backend/app/services/state_sync.py apply_patch.
+
+export type PatchOp =
+  | { op: "add"; path: string; value: any }
+  | { op: "replace"; path: string; value: any }
+  | { op: "remove"; path: string };
+
+function unescape(part: string) {
+  return part.replace(/~1/g, "/").replace(/~0/g, "~");
+}
+
+function clone<T>(v: T): T {
+  return v === undefined ? v : structuredClone(v);
+}
+
+export function applyPatch(doc: any, ops: PatchOp[]): any {
+  let root = clone(doc);
+
+  for (const op of ops) {
+    const parts = op.path ? op.path.split("/").slice(1).map(unescape) : [];
+    if (!parts.length) {
+      root = clone((op as any).value);
+      continue;
+    }
+
+    let parent = root;
+    for (const p of parts.slice(0, -1)) parent = Array.isArray(parent) ? parent[Number(p)] : parent[p];
+    const last = parts[parts.length - 1];
+
+    if (op.op === "remove") {
+      if (Array.isArray(parent)) parent.splice(Number(last), 1);
+      else delete parent[last];
+    } else if (Array.isArray(parent)) {
+      if (last === "-") parent.push(clone(op.value));
+      else if (op.op === "add") parent.splice(Number(last), 0, clone(op.value));
+      else parent[Number(last)] = clone(op.value);
+    } else {
+      parent[last] = clone(op.value);
+    }
+  }
+
+  return root;
+}
@@ -1,4 +1,5 @@
 // cbt-frontend/src/lib/ws.ts
+import { applyPatch } from "./jsonPatch";
 
 // If you set VITE_WS_BASE_URL, it should be like:
 //   ws://127.0.0.1:8000
@@ -24,29 +25,125 @@ export type WsMessage = {
   [k: string]: any;
 };
 
+export type WsOptions = {
+  // "delta": server sends a snapshot on connect, then JSON-patch deltas; we rebuild `state` here
+  sync?: "full" | "delta";
+  // also receive the raw state_update debug stream
+  debug?: boolean;
+};
+
 export function connectWs(
   threadId: string,
   onMessage: (msg: WsMessage) => void,
-  onStatus?: (s: "open" | "closed" | "error") => void
+  onStatus?: (s: "open" | "closed" | "error") => void,
+  opts: WsOptions = {}
 ) {
-  const url = `${WS_BASE}/ws/${threadId}`;
-  const ws = new WebSocket(url);
-
-  ws.onopen = () => onStatus?.("open");
-  ws.onclose = () => onStatus?.("closed");
-  ws.onerror = () => onStatus?.("error");
-
-  ws.onmessage = (ev) => {
-    try {
-      const msg = JSON.parse(ev.data) as WsMessage;
-      onMessage(msg);
-    } catch {
-      // ignore non-json
+  // reconnect point: the last run event we saw; the server replays anything after it
+  let lastRunId: string | null = null;
+  let lastSeq = 0;
+
+  const urlFor = () => {
+    const params = new URLSearchParams();
+    if (opts.sync === "delta") params.set("sync", "delta");
+    if (opts.debug) params.set("debug", "1");
+    if (lastRunId) {
+      params.set("run_id", lastRunId);
+      params.set("after_seq", String(lastSeq));
+    }
+    const qs = params.toString();
+    return `${WS_BASE}/ws/${threadId}${qs ? `?${qs}` : ""}`;
+  };
+
+  let ws: WebSocket;
+  let closedByUser = false;
+  let retries = 0;
+  let retryTimer: ReturnType<typeof setTimeout> | null = null;
+
+  // delta sync: local copy of the thread state and the version it corresponds to
+  let state: any = undefined;
+  let stateSeq: number | null = null;
+
+  // returns false when the message can't be applied yet (no snapshot / stale delta)
+  const reconcile = (msg: WsMessage): boolean => {
+    if (msg.type === "snapshot") {
+      state = msg.state;
+      stateSeq = msg.state_seq ?? 0;
+      return true;
+    }
+    if (!Array.isArray(msg.delta)) return true;
+
+    // deltas sent before our snapshot arrived: the snapshot already includes them
+    if (stateSeq === null || msg.base_seq < stateSeq) return false;
+    if (msg.base_seq !== stateSeq) {
+      // missed a version => ask for a fresh snapshot rather than apply onto the wrong base
+      try {
+        ws.send(JSON.stringify({ type: "resync" }));
+      } catch {}
+      return false;
+    }
+
+    state = applyPatch(state, msg.delta);
+    stateSeq = msg.state_seq;
+    msg.state = state;
+    return true;
+  };
+
+  const track = (msg: WsMessage) => {
+    // state_update repeats its node_update's seq; everything else has its own
+    if (!msg.run_id || typeof msg.seq !== "number" || msg.type === "state_update") return;
+    if (msg.run_id !== lastRunId) {
+      lastRunId = msg.run_id;
+      lastSeq = 0;
     }
+    if (msg.seq > lastSeq) lastSeq = msg.seq;
   };
 
+  const open = () => {
+    // every connection starts from a snapshot, so drop the local delta base
+    state = undefined;
+    stateSeq = null;
+    ws = new WebSocket(urlFor());
+
+    ws.onopen = () => {
+      retries = 0;
+      onStatus?.("open");
+    };
+    ws.onclose = () => {
+      onStatus?.("closed");
+      if (closedByUser) return;
+      // back off 0.5s, 1s, 2s, ... up to 10s; the resume point makes a reconnect a cheap catch-up
+      const delay = Math.min(10_000, 500 * 2 ** retries);
+      retries += 1;
+      retryTimer = setTimeout(open, delay);
+    };
+    ws.onerror = () => onStatus?.("error");
+
+    ws.onmessage = (ev) => {
+      try {
+        const msg = JSON.parse(ev.data) as WsMessage;
+        if (msg.type === "heartbeat") {
+          // server keepalive: answer, or the server treats the socket as dead
+          ws.send("pong");
+          return;
+        }
+        if (opts.sync === "delta" && !reconcile(msg)) {
+          // still deliver the event itself (summary/signals), just without a state
+          delete msg.delta;
+        }
+        track(msg);
+        onMessage(msg);
+      } catch {
+        // ignore non-json
+      }
+    };
+  };
+
+  open();
+
   return {
     close: () => {
+      closedByUser = true;
+      if (retryTimer) clearTimeout(retryTimer);
       try {
         ws.close();
       } catch {}
@@ -0,0 +1,55 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.core.config import get_settings
+from app.services.batches import batch_runner, progress
+
+router = APIRouter(prefix="/batches", tags=["batches"])
+
+
+class BatchRequest(BaseModel):
+    prompts: list[str] = Field(min_length=1)
+    mode: str = Field(default="auto", description="human_optional | auto | human_required")
+    # runs of this batch in flight at once; defaults to BATCH_DEFAULT_CONCURRENCY, capped at BATCH_MAX_CONCURRENCY
+    concurrency: int | None = Field(default=None, ge=1)
+    require_human_approval: bool | None = None
+    deadline_seconds: float | None = None
+
+
+@router.post("")
+async def create_batch(body: BatchRequest):
+    """
+    One session + run per prompt, streamed back as NDJSON (application/x-ndjson) as runs finish.
+    The batch keeps running if the client goes away; poll GET /batches/{batch_id} instead.
+    """
+    if body.mode not in ("human_optional", "auto", "human_required"):
+        raise HTTPException(status_code=422, detail=f"Unknown mode {body.mode!r}")
+    limit = get_settings().BATCH_MAX_PROMPTS
+    if len(body.prompts) > limit:
+        raise HTTPException(status_code=413, detail=f"At most {limit} prompts per batch")
+    if any(not p.strip() for p in body.prompts):
+        raise HTTPException(status_code=422, detail="Prompts must not be empty")
+
+    batch = await batch_runner.start(
+        body.prompts,
+        mode=body.mode,
+        concurrency=body.concurrency,
+        require_human_approval=body.require_human_approval,
+        deadline_seconds=body.deadline_seconds,
+    )
+    return StreamingResponse(
+        batch_runner.stream(batch),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Batch-Id": batch.batch_id},
+    )
+
+
+@router.get("/{batch_id}")
+async def get_batch(batch_id: str):
+    row = await asyncio.to_thread(progress, batch_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Unknown batch_id")
+    return row
@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+
+from app.services import intent_classifier
+from app.services.batches import batch_runner
+from app.services.llm import pool_stats
+from app.services.llm_cache import llm_cache
+from app.services.llm_rate_limit import rate_limiter
+from app.services.llm_resilience import resilience
+from app.services.scheduler import run_scheduler
+from app.services.websocket_manager import ws_manager
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics")
+def metrics():
+    return {
+        "scheduler": run_scheduler.stats(),
+        "ws": ws_manager.stats(),
+        "llm": pool_stats(),
+        "llm_cache": llm_cache.stats(),
+        "llm_resilience": resilience.stats(),
+        "llm_rate_limit": rate_limiter.stats(),
+        "intent": intent_classifier.stats(),
+        "batches": batch_runner.stats(),
+    }
@@ -1,6 +1,12 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
 
-from app.persistence.run_store import get_run, list_run_events
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from app.persistence.run_store import get_run, list_run_events, list_run_llm_usage
+from app.services.jobs import cancel_run
+from app.services.llm_usage import summarize
+from app.services.run_stream import TERMINAL_STATUSES, stream_run
 
 router = APIRouter(prefix="/runs", tags=["runs"])
 
@@ -10,7 +16,8 @@ def get_run_detail(run_id: str):
     row = get_run(run_id)
     if not row:
         raise HTTPException(status_code=404, detail="Unknown run_id")
-    return row
+    # per-node LLM calls, tokens, wall time, retries and cost (run_llm_calls)
+    return {**row, "llm_usage": summarize(list_run_llm_usage(run_id))}
 
 
 @router.get("/{run_id}/events")
@@ -19,3 +26,44 @@ def get_run_events(run_id: str, limit: int = 200):
     if not row:
         raise HTTPException(status_code=404, detail="Unknown run_id")
     return {"run_id": run_id, "events": list_run_events(run_id, limit=limit)}
+
+
+@router.get("/{run_id}/stream")
+async def stream_run_events(run_id: str, request: Request, after_seq: int | None = None):
+    """
+    Server-Sent Events: the run's node_update/halt_required/... events as they happen, `id` = seq.
+    Resumes after the Last-Event-ID header (EventSource sends it on reconnect) or ?after_seq=;
+    without either, starts from the beginning of the run.
+    """
+    row = await asyncio.to_thread(get_run, run_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Unknown run_id")
+
+    last_id = request.headers.get("last-event-id")
+    if last_id is not None:
+        try:
+            after_seq = int(last_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID must be an event seq")
+
+    return StreamingResponse(
+        stream_run(run_id, row["thread_id"], max(0, after_seq or 0), row["status"] in TERMINAL_STATUSES),
+        media_type="text/event-stream",
+        # no caching, no proxy buffering (nginx), so events go out as they happen
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/{run_id}/cancel", status_code=202)
+async def cancel(run_id: str):
+    # async on purpose: task/future cancellation has to happen on the event loop thread
+    row = await asyncio.to_thread(get_run, run_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Unknown run_id")
+
+    status = await cancel_run(run_id)
+    if status is None:
+        raise HTTPException(status_code=409, detail=f"Run is {row['status']}, not RUNNING")
+    # CANCELLING: the runner aborts the in-flight node and marks the run CANCELLED (checkpoint kept;
+    # POST /sessions/{thread_id}/continue picks it back up)
+    return {"run_id": run_id, "status": status}
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from pydantic import BaseModel
 from typing import Optional
 
@@ -8,7 +8,18 @@ from app.persistence.checkpointer import checkpointer_manager
 from app.utils.ids import new_thread_id
 from app.persistence.run_store import list_runs
 from app.persistence.run_store import get_latest_run, get_latest_halted_run, get_run
-from app.services.runner import resume_with_ws
+from app.core.config import get_settings
+from app.services.jobs import (
+    JobQueueFull,
+    check_admission,
+    dispatch_continue,
+    dispatch_resume,
+    dispatch_run,
+    schedule_continue,
+    schedule_resume,
+    schedule_run,
+)
+from app.services.scheduler import lane_for_mode
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
@@ -20,11 +31,37 @@ class HumanDecisionBody(BaseModel):
 class RunRequest(BaseModel):
     input_text: str
     require_human_approval: bool | None = None
+    # True => 202 + run_id immediately, graph executes on the background job pool
+    background: bool | None = None
+    # wall-clock budget for this run; defaults to RUN_DEADLINE_SECONDS
+    deadline_seconds: float | None = None
 
 class ApproveRequest(BaseModel):
     approved: bool
     edited_text: str | None = None
     feedback: str | None = None
+    background: bool | None = None
+    deadline_seconds: float | None = None
+
+class ContinueRequest(BaseModel):
+    background: bool | None = None
+    deadline_seconds: float | None = None
+
+
+def _use_background(flag: bool | None) -> bool:
+    return bool(flag) if flag is not None else get_settings().RUN_BACKGROUND_DEFAULT
+
+
+def _admit(lane: str, background: bool) -> None:
+    # checked before any DB write; nothing awaits between this and the dispatch
+    try:
+        check_admission(lane, background=background)
+    except JobQueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many queued {e.lane} runs; try again shortly",
+            headers={"Retry-After": str(e.retry_after)},
+        )
 
 @router.post("", response_model=CreateSessionResponse)
 def create_session(body: CreateSessionRequest):
@@ -78,7 +115,7 @@ def get_state(thread_id: str):
 
 
 @router.post("/{thread_id}/run")
-async def run_session(thread_id: str, body: RunRequest):
+async def run_session(thread_id: str, body: RunRequest, response: Response):
     row = fetch_one("SELECT thread_id, mode FROM sessions WHERE thread_id=%s", [thread_id])
     if not row:
         raise HTTPException(status_code=404, detail="Unknown thread_id")
@@ -92,19 +129,39 @@ async def run_session(thread_id: str, body: RunRequest):
     else:
         require_human_approval = bool(body.require_human_approval) if body.require_human_approval is not None else True
 
-    from app.services.runner import run_with_ws
+    lane = lane_for_mode(mode)
+    background = _use_background(body.background)
+    _admit(lane, background)
+
+    if background:
+        run_id = await dispatch_run(
+            thread_id=thread_id,
+            input_text=body.input_text,
+            require_human_approval=require_human_approval,
+            lane=lane,
+            deadline_seconds=body.deadline_seconds,
+        )
+        response.status_code = 202
+        return {
+            "thread_id": thread_id,
+            "require_human_approval": require_human_approval,
+            "result": {"run_id": run_id, "status": "RUNNING"},
+        }
 
-    result = await run_with_ws(
+    _, fut = await schedule_run(
         thread_id=thread_id,
         input_text=body.input_text,
         require_human_approval=require_human_approval,
+        lane=lane,
+        deadline_seconds=body.deadline_seconds,
     )
+    result = await fut
     return {"thread_id": thread_id, "require_human_approval": require_human_approval, "result": result}
 
 
 @router.post("/{thread_id}/approve")
-async def approve_and_resume(thread_id: str, body: ApproveRequest):
-    row = fetch_one("SELECT thread_id FROM sessions WHERE thread_id=%s", [thread_id])
+async def approve_and_resume(thread_id: str, body: ApproveRequest, response: Response):
+    row = fetch_one("SELECT thread_id, mode FROM sessions WHERE thread_id=%s", [thread_id])
     if not row:
         raise HTTPException(status_code=404, detail="Unknown thread_id")
 
@@ -113,18 +170,65 @@ async def approve_and_resume(thread_id: str, body: ApproveRequest):
     if not halted:
         raise HTTPException(status_code=409, detail="No pending approval for this thread")
 
-
-
-    result = await resume_with_ws(
+    lane = lane_for_mode(row["mode"])
+    background = _use_background(body.background)
+    _admit(lane, background)
+
+    if background:
+        run_id = halted["run_id"]
+        await dispatch_resume(
+            thread_id=thread_id,
+            run_id=run_id,
+            approved=body.approved,
+            edited_text=body.edited_text,
+            feedback=body.feedback,
+            lane=lane,
+            deadline_seconds=body.deadline_seconds,
+        )
+        response.status_code = 202
+        return {"thread_id": thread_id, "result": {"run_id": run_id, "status": "RUNNING"}}
+
+    fut = await schedule_resume(
         thread_id=thread_id,
         run_id=halted["run_id"],      # ✅ always resume the latest halted run
         approved=body.approved,
         edited_text=body.edited_text,
         feedback=body.feedback,       # ✅ pass feedback through
+        lane=lane,
+        deadline_seconds=body.deadline_seconds,
     )
+    result = await fut
     return {"thread_id": thread_id, "result": result}
 
 
+@router.post("/{thread_id}/continue")
+async def continue_cancelled(thread_id: str, body: ContinueRequest, response: Response):
+    """
+    Picks the latest run back up from its last checkpoint after POST /runs/{run_id}/cancel or a deadline.
+    """
+    row = fetch_one("SELECT thread_id, mode FROM sessions WHERE thread_id=%s", [thread_id])
+    if not row:
+        raise HTTPException(status_code=404, detail="Unknown thread_id")
+
+    # only the newest run: an older cancelled run's checkpoint has been superseded
+    latest = get_latest_run(thread_id)
+    if not latest or latest["status"] != "CANCELLED":
+        raise HTTPException(status_code=409, detail="Latest run for this thread is not cancelled")
+
+    run_id = latest["run_id"]
+    lane = lane_for_mode(row["mode"])
+    background = _use_background(body.background)
+    _admit(lane, background)
+
+    if background:
+        await dispatch_continue(thread_id=thread_id, run_id=run_id, lane=lane, deadline_seconds=body.deadline_seconds)
+        response.status_code = 202
+        return {"thread_id": thread_id, "result": {"run_id": run_id, "status": "RUNNING"}}
+
+    fut = await schedule_continue(thread_id=thread_id, run_id=run_id, lane=lane, deadline_seconds=body.deadline_seconds)
+    result = await fut
+    return {"thread_id": thread_id, "result": result}
+
 
 @router.get("/{thread_id}/runs")
 def list_session_runs(thread_id: str, limit: int = 20):
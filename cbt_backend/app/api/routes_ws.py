@@ -1,19 +1,164 @@
+import json
+import uuid
+from typing import Any
+
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from app.services.websocket_manager import ws_manager
+from app.services.runner import load_run_events, load_thread_state
+from app.services.websocket_manager import MSGPACK_SUBPROTOCOL, ConnectionOptions, ws_manager
 
 router = APIRouter(tags=["ws"])
 
+
+def _flag(websocket: WebSocket, name: str) -> bool:
+    return websocket.query_params.get(name, "").strip().lower() in ("1", "true", "yes")
+
+
+def _subprotocol(websocket: WebSocket) -> str | None:
+    # Sec-WebSocket-Protocol: cbt.msgpack => MessagePack binary frames; anything else => JSON text
+    return MSGPACK_SUBPROTOCOL if MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", ()) else None
+
+
+def _resume_point(run_id: Any, after_seq: Any) -> tuple[str, int] | None:
+    run_id = str(run_id or "").strip()
+    if not run_id:
+        return None
+    try:
+        uuid.UUID(run_id)
+    except ValueError:
+        return None
+    try:
+        after_seq = int(after_seq or 0)
+    except (TypeError, ValueError):
+        after_seq = 0
+    return run_id, max(0, after_seq)
+
+
 @router.websocket("/ws/{thread_id}")
 async def websocket_endpoint(websocket: WebSocket, thread_id: str):
-    await ws_manager.connect(thread_id, websocket)
+    # ?sync=delta => snapshot + JSON-patch deltas; ?debug=1 => also the raw state_update stream
+    options = ConnectionOptions(
+        delta=websocket.query_params.get("sync", "").strip().lower() == "delta",
+        debug=_flag(websocket, "debug"),
+    )
+    # ?run_id=&after_seq= => reconnect: that run's missed events first, then a snapshot of the current state
+    after = _resume_point(websocket.query_params.get("run_id"), websocket.query_params.get("after_seq"))
+    await ws_manager.connect(
+        thread_id, websocket, options, after=after, load_events=load_run_events, subprotocol=_subprotocol(websocket)
+    )
     try:
+        if options.delta or after is not None:
+            await ws_manager.send_snapshot(thread_id, websocket, lambda: load_thread_state(thread_id))
+
         while True:
             msg = await websocket.receive_text()
+            ws_manager.touch(websocket)
 
-            # optional keepalive
+            # client keepalive; "pong" answers the server's heartbeat (touch() above is all it needs)
             if msg == "ping":
-                await websocket.send_text("pong")
+                ws_manager.send_text(websocket, "pong")
+                continue
+            if msg == "pong":
+                continue
+
+            # delta client saw a base_seq it doesn't have => resend the full state
+            if options.delta and msg.startswith("{"):
+                try:
+                    req = json.loads(msg)
+                except ValueError:
+                    continue
+                if isinstance(req, dict) and req.get("type") == "resync":
+                    await ws_manager.send_snapshot(thread_id, websocket, lambda: load_thread_state(thread_id))
     except WebSocketDisconnect:
         await ws_manager.disconnect(thread_id, websocket)
     except Exception:
         await ws_manager.disconnect(thread_id, websocket)
+
+
+def _subscription_options(req: dict) -> ConnectionOptions:
+    sync = str(req.get("sync") or "none").strip().lower()
+    types = req.get("types")
+    fields = req.get("fields")
+    return ConnectionOptions(
+        delta=sync == "delta",
+        state=sync == "full",
+        debug=bool(req.get("debug")),
+        types=frozenset(str(t) for t in types) if isinstance(types, list) else None,
+        fields=tuple(sorted(str(f) for f in fields)) if isinstance(fields, list) else None,
+    )
+
+
+def _thread_ids(req: dict) -> list[str]:
+    ids = req.get("thread_ids") if isinstance(req.get("thread_ids"), list) else [req.get("thread_id")]
+    return [t for t in ids if isinstance(t, str) and t]
+
+
+@router.websocket("/ws")
+async def multiplexed_endpoint(websocket: WebSocket):
+    """
+    One socket, many threads. Client messages (JSON text):
+      {"type": "subscribe", "thread_id" | "thread_ids": ..., "sync": "none"|"full"|"delta",
+       "types": [...], "fields": [...], "debug": bool, "run_id": ..., "after_seq": ...}
+      {"type": "unsubscribe", "thread_id" | "thread_ids": ...}
+      {"type": "resync", "thread_id": ...}
+    Every event carries its thread_id. sync defaults to "none" (events without state).
+    """
+    await ws_manager.connect_mux(websocket, subprotocol=_subprotocol(websocket))
+    try:
+        while True:
+            msg = await websocket.receive_text()
+            ws_manager.touch(websocket)
+
+            if msg == "ping":
+                ws_manager.send_text(websocket, "pong")
+                continue
+            if msg == "pong":
+                continue
+
+            try:
+                req = json.loads(msg)
+            except ValueError:
+                req = None
+            if not isinstance(req, dict):
+                ws_manager.send_json(websocket, {"type": "error", "error": "expected a JSON object"})
+                continue
+
+            kind = req.get("type")
+            thread_ids = _thread_ids(req)
+            if kind in ("subscribe", "unsubscribe", "resync") and not thread_ids:
+                ws_manager.send_json(websocket, {"type": "error", "error": f"{kind} needs thread_id or thread_ids"})
+                continue
+
+            if kind == "subscribe":
+                options = _subscription_options(req)
+                after = _resume_point(req.get("run_id"), req.get("after_seq")) if len(thread_ids) == 1 else None
+                for thread_id in thread_ids:
+                    ok = await ws_manager.subscribe(
+                        websocket, thread_id, options, after=after, load_events=load_run_events
+                    )
+                    if not ok:
+                        ws_manager.send_json(
+                            websocket, {"type": "error", "thread_id": thread_id, "error": "subscription limit reached"}
+                        )
+                        continue
+                    # everything after this ack is live; replayed events (if any) came before it
+                    ws_manager.send_json(websocket, {"type": "subscribed", "thread_id": thread_id})
+                    if options.delta or after is not None:
+                        await ws_manager.send_snapshot(thread_id, websocket, lambda t=thread_id: load_thread_state(t))
+
+            elif kind == "unsubscribe":
+                for thread_id in thread_ids:
+                    ws_manager.unsubscribe(websocket, thread_id)
+                    ws_manager.send_json(websocket, {"type": "unsubscribed", "thread_id": thread_id})
+
+            elif kind == "resync":
+                subs = ws_manager.subscriptions(websocket)
+                for thread_id in thread_ids:
+                    if thread_id in subs:
+                        await ws_manager.send_snapshot(thread_id, websocket, lambda t=thread_id: load_thread_state(t))
+
+            else:
+                ws_manager.send_json(websocket, {"type": "error", "error": f"unknown message type {kind!r}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await ws_manager.release(websocket)
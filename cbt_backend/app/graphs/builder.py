@@ -4,11 +4,11 @@ from langgraph.graph import StateGraph, END
 
 from app.graphs.state import GraphState
 from app.graphs.nodes.intake import intake_node
-from app.graphs.nodes.intent_guard import intent_guard_node
-from app.graphs.nodes.drafter import drafter_node
-from app.graphs.nodes.safety import safety_node
-from app.graphs.nodes.critic import critic_node
-from app.graphs.nodes.supervisor import supervisor_node
+from app.graphs.nodes.intent_guard import intent_guard_node, intent_guard_node_async
+from app.graphs.nodes.drafter import drafter_node, drafter_node_async
+from app.graphs.nodes.safety import safety_node, safety_node_async
+from app.graphs.nodes.critic import critic_node, critic_node_async
+from app.graphs.nodes.supervisor import supervisor_node, supervisor_node_async
 from app.graphs.nodes.human_review import human_review_node
 from app.graphs.nodes.finalize import finalize_node
 
@@ -47,15 +47,24 @@ def _quality_pass(state: GraphState) -> bool | None:
     return (state.get("reviews") or {}).get("critic", {}).get("quality_pass")
 
 
-def build_graph():
+def _safety_unreviewed(state: GraphState) -> bool:
+    # safety's LLM was unreachable (see safety._UNAVAILABLE): the draft was never actually reviewed
+    return "llm_unavailable" in ((state.get("reviews") or {}).get("safety", {}).get("flags") or [])
+
+
+def build_graph(async_nodes: bool = False):
+    """
+    async_nodes=True wires the LLM-bound nodes to their coroutine variants (use with graph.astream);
+    intake/finalize/human_review stay sync since they never block on I/O.
+    """
     g = StateGraph(GraphState)
 
     g.add_node("intake", intake_node)
-    g.add_node("intent_guard", intent_guard_node)
-    g.add_node("drafter", drafter_node)
-    g.add_node("safety", safety_node)
-    g.add_node("critic", critic_node)
-    g.add_node("supervisor", supervisor_node)
+    g.add_node("intent_guard", intent_guard_node_async if async_nodes else intent_guard_node)
+    g.add_node("drafter", drafter_node_async if async_nodes else drafter_node)
+    g.add_node("safety", safety_node_async if async_nodes else safety_node)
+    g.add_node("critic", critic_node_async if async_nodes else critic_node)
+    g.add_node("supervisor", supervisor_node_async if async_nodes else supervisor_node)
     g.add_node("finalize", finalize_node)
     g.add_node("human_review", human_review_node)
 
@@ -108,9 +117,12 @@ def build_graph():
         {"finalize": "finalize", "drafter": "drafter"},
     )
 
-    # human gate AFTER finalize (only if required)
+    # human gate AFTER finalize: when required, and always when safety couldn't review the draft
+    # (an LLM outage must not auto-publish unreviewed content)
     def route_after_finalize(state: GraphState) -> str:
-        return "human_review" if bool(state.get("require_human_approval")) else "end"
+        if bool(state.get("require_human_approval")) or _safety_unreviewed(state):
+            return "human_review"
+        return "end"
 
     g.add_conditional_edges(
         "finalize",
@@ -5,7 +5,7 @@ from typing import Any
 
 from app.graphs.prompts import CRITIC_SYSTEM
 from app.graphs.state import GraphState
-from app.services.llm import chat_json
+from app.services.llm import LLMUnavailable, chat_json, chat_json_async
 
 
 def _now_iso() -> str:
@@ -38,48 +38,53 @@ def _truncate(s: str, n: int = 2500) -> str:
     return s if len(s) <= n else (s[: n - 20] + "\n…(truncated)…\n" + s[-20:])
 
 
-def critic_node(state: GraphState) -> dict:
-    ts = _now_iso()
-
-    text = (state.get("input_text") or "").strip()
-    drafts = state.get("drafts") or []
-    metrics_in = state.get("metrics") or {}
+def _missing_draft_update(ts: str, metrics_in: dict) -> dict:
+    critic = {
+        "quality_pass": False,
+        "quality_score": 0.0,
+        "issues": ["missing_draft"],
+        "suggestions": ["No draft available to review."],
+    }
+    summary = "Quality review failed: missing draft."
 
-    if not drafts:
-        critic = {
-            "quality_pass": False,
+    return {
+        "current_node": "critic",
+        "status": "RUNNING",
+        # merge into existing reviews
+        "reviews": {"critic": critic},
+        "metrics": {
+            **metrics_in,
             "quality_score": 0.0,
-            "issues": ["missing_draft"],
-            "suggestions": ["No draft available to review."],
-        }
-        summary = "Quality review failed: missing draft."
-
-        return {
-            "current_node": "critic",
-            "status": "RUNNING",
-            # merge into existing reviews
-            "reviews": {"critic": critic},
-            "metrics": {
-                **metrics_in,
-                "quality_score": 0.0,
-                "last_node": "critic",
-                "updated_at": ts,
-            },
-            "trace": [{"ts": ts, "node": "critic", "summary": summary}],
-            "scratchpad": {"critic": ["No draft found — critic cannot run."]},
-        }
+            "last_node": "critic",
+            "updated_at": ts,
+        },
+        "trace": [{"ts": ts, "node": "critic", "summary": summary}],
+        "scratchpad": {"critic": ["No draft found — critic cannot run."]},
+    }
+
 
+def _user_prompt(state: GraphState) -> str:
+    text = (state.get("input_text") or "").strip()
+    drafts = state.get("drafts") or []
     md = (drafts[-1].get("markdown") or "").strip()
 
-    user_prompt = (
+    return (
         f"User request:\n{text}\n\n"
         f"Draft to review:\n{_truncate(md)}\n\n"
         "Return ONLY valid JSON with:\n"
         "{quality_pass: bool, quality_score: number, issues: string[], suggestions: string[]}\n"
     )
 
-    resp = chat_json(system=CRITIC_SYSTEM, user=user_prompt) or {}
 
+_UNAVAILABLE = {
+    "quality_pass": False,
+    "quality_score": 0.0,
+    "issues": ["Quality review unavailable (LLM unreachable)."],
+    "suggestions": [],
+}
+
+
+def _review_update(ts: str, metrics_in: dict, resp: dict) -> dict:
     quality_pass = bool(resp.get("quality_pass", True))
     quality_score = _safe_float(resp.get("quality_score"), 1.0 if quality_pass else 0.0)
 
@@ -111,3 +116,31 @@ def critic_node(state: GraphState) -> dict:
         "trace": [{"ts": ts, "node": "critic", "summary": summary}],
         "scratchpad": {"critic": [summary]},
     }
+
+
+def critic_node(state: GraphState) -> dict:
+    ts = _now_iso()
+    metrics_in = state.get("metrics") or {}
+
+    if not state.get("drafts"):
+        return _missing_draft_update(ts, metrics_in)
+
+    try:
+        resp = chat_json(system=CRITIC_SYSTEM, user=_user_prompt(state), node="critic") or {}
+    except LLMUnavailable:
+        resp = _UNAVAILABLE
+    return _review_update(ts, metrics_in, resp)
+
+
+async def critic_node_async(state: GraphState) -> dict:
+    ts = _now_iso()
+    metrics_in = state.get("metrics") or {}
+
+    if not state.get("drafts"):
+        return _missing_draft_update(ts, metrics_in)
+
+    try:
+        resp = await chat_json_async(system=CRITIC_SYSTEM, user=_user_prompt(state), node="critic") or {}
+    except LLMUnavailable:
+        resp = _UNAVAILABLE
+    return _review_update(ts, metrics_in, resp)
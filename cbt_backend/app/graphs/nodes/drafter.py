@@ -5,7 +5,8 @@ from typing import Any
 
 from app.graphs.prompts import DRAFTER_SYSTEM
 from app.graphs.state import GraphState
-from app.services.llm import chat_json
+from app.services import draft_stream
+from app.services.llm import LLMUnavailable, chat_json, chat_json_async, chat_json_stream_async
 
 
 def _now_iso() -> str:
@@ -58,7 +59,10 @@ def _fallback_markdown(title: str) -> str:
     )
 
 
-def drafter_node(state: GraphState) -> dict:
+def _draft_context(state: GraphState) -> dict:
+    """
+    Everything the drafter needs before and after the LLM call (shared by the sync/async nodes).
+    """
     ts = _now_iso()
 
     text = (state.get("input_text") or "").strip()
@@ -107,7 +111,20 @@ def drafter_node(state: GraphState) -> dict:
         "- Keep it practical, clear, and safe.\n"
     )
 
-    resp = chat_json(system=DRAFTER_SYSTEM, user=user_prompt) or {}
+    return {
+        "ts": ts,
+        "iteration": iteration,
+        "human_feedback": human_feedback,
+        "prev_md": prev_md,
+        "user_prompt": user_prompt,
+    }
+
+
+def _draft_update(ctx: dict, resp: dict) -> dict:
+    ts = ctx["ts"]
+    iteration = ctx["iteration"]
+    human_feedback = ctx["human_feedback"]
+    prev_md = ctx["prev_md"]
 
     markdown = resp.get("markdown") or resp.get("final_markdown") or ""
     if not isinstance(markdown, str):
@@ -154,3 +171,33 @@ def drafter_node(state: GraphState) -> dict:
         "scratchpad": {"drafter": [scratch_note]},
         "human_feedback": None,  # clear after incorporating
     }
+
+
+def drafter_node(state: GraphState) -> dict:
+    ctx = _draft_context(state)
+    try:
+        resp = chat_json(system=DRAFTER_SYSTEM, user=ctx["user_prompt"], node="drafter") or {}
+    except LLMUnavailable:
+        resp = {}  # -> _fallback_markdown
+    return _draft_update(ctx, resp)
+
+
+async def drafter_node_async(state: GraphState) -> dict:
+    ctx = _draft_context(state)
+    # DRAFTER_STREAMING: the markdown reaches the UI as draft_delta events while it's generated
+    deltas = draft_stream.publisher(ctx["iteration"])
+    try:
+        if deltas is None:
+            resp = await chat_json_async(system=DRAFTER_SYSTEM, user=ctx["user_prompt"], node="drafter") or {}
+        else:
+            resp = await chat_json_stream_async(
+                system=DRAFTER_SYSTEM,
+                user=ctx["user_prompt"],
+                on_text=deltas.feed,
+                on_fallback=deltas.reset,
+                node="drafter",
+            ) or {}
+            await deltas.flush()
+    except LLMUnavailable:
+        resp = {}  # -> _fallback_markdown
+    return _draft_update(ctx, resp)
@@ -4,7 +4,8 @@ from datetime import datetime, timezone
 from typing import Any
 
 from app.graphs.state import GraphState
-from app.services.llm import chat_json
+from app.services.intent_classifier import classify_locally
+from app.services.llm import chat_json, chat_json_async
 
 
 def _now_iso() -> str:
@@ -19,39 +20,60 @@ def _safe_bool(x: Any, default: bool = True) -> bool:
     return default
 
 
-def _classify_relevance(text: str) -> tuple[bool, str]:
-    """
-    Use a lightweight classifier to decide if the request is CBT-related.
-    Falls back to keyword check on failure.
-    """
-    prompt = (
+_CLASSIFIER_SYSTEM = "You are a strict classifier. Decide if the user is asking for CBT/mental health support."
+
+
+def _classifier_prompt(text: str) -> str:
+    return (
         "Classify if this request is asking for CBT, mental health coping, or therapy-related guidance.\n"
         "Return ONLY JSON: {relevant: boolean, reason: string}\n\n"
         f"Request:\n{text}"
     )
+
+
+def _parse_classification(resp: dict) -> tuple[bool, str]:
+    relevant = _safe_bool(resp.get("relevant"), default=False)
+    reason = resp.get("reason") if isinstance(resp.get("reason"), str) else ""
+    return relevant, reason
+
+
+def _keyword_fallback(text: str) -> tuple[bool, str]:
+    # fallback: simple keyword heuristic
+    lowered = text.lower()
+    keywords = ["cbt", "therapy", "mental", "anxiety", "depression", "panic", "exposure", "grounding", "coping"]
+    relevant = any(k in lowered for k in keywords)
+    return relevant, "keyword fallback (no LLM)"
+
+
+def _classify_relevance(text: str) -> tuple[bool, str]:
+    """
+    Use a lightweight classifier to decide if the request is CBT-related: the local lexicon when it
+    is confident, the LLM otherwise. Falls back to keyword check on failure.
+    """
+    local = classify_locally(text)
+    if local is not None:
+        return local
     try:
-        resp = chat_json(
-            system="You are a strict classifier. Decide if the user is asking for CBT/mental health support.",
-            user=prompt,
-            model=None,
-        ) or {}
-        relevant = _safe_bool(resp.get("relevant"), default=False)
-        reason = resp.get("reason") if isinstance(resp.get("reason"), str) else ""
-        return relevant, reason
+        resp = chat_json(system=_CLASSIFIER_SYSTEM, user=_classifier_prompt(text), node="intent_guard") or {}
+        return _parse_classification(resp)
     except Exception:
-        # fallback: simple keyword heuristic
-        lowered = text.lower()
-        keywords = ["cbt", "therapy", "mental", "anxiety", "depression", "panic", "exposure", "grounding", "coping"]
-        relevant = any(k in lowered for k in keywords)
-        return relevant, "keyword fallback (no LLM)"
+        return _keyword_fallback(text)
 
 
-def intent_guard_node(state: GraphState) -> dict:
-    ts = _now_iso()
-    text = (state.get("input_text") or "").strip()
+async def _classify_relevance_async(text: str) -> tuple[bool, str]:
+    local = classify_locally(text)
+    if local is not None:
+        return local
+    try:
+        resp = await chat_json_async(
+            system=_CLASSIFIER_SYSTEM, user=_classifier_prompt(text), node="intent_guard"
+        ) or {}
+        return _parse_classification(resp)
+    except Exception:
+        return _keyword_fallback(text)
 
-    relevant, reason = _classify_relevance(text)
 
+def _guard_update(ts: str, relevant: bool, reason: str) -> dict:
     if relevant:
         summary = "Request accepted for CBT pipeline."
         return {
@@ -93,3 +115,19 @@ def intent_guard_node(state: GraphState) -> dict:
         "trace": [{"ts": ts, "node": "intent_guard", "summary": summary}],
         "scratchpad": {"intake": [summary]},
     }
+
+
+def intent_guard_node(state: GraphState) -> dict:
+    ts = _now_iso()
+    text = (state.get("input_text") or "").strip()
+
+    relevant, reason = _classify_relevance(text)
+    return _guard_update(ts, relevant, reason)
+
+
+async def intent_guard_node_async(state: GraphState) -> dict:
+    ts = _now_iso()
+    text = (state.get("input_text") or "").strip()
+
+    relevant, reason = await _classify_relevance_async(text)
+    return _guard_update(ts, relevant, reason)
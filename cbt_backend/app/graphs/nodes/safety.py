@@ -5,7 +5,7 @@ from typing import Any
 
 from app.graphs.prompts import SAFETY_SYSTEM
 from app.graphs.state import GraphState
-from app.services.llm import chat_json
+from app.services.llm import LLMUnavailable, chat_json, chat_json_async
 
 
 def _now_iso() -> str:
@@ -38,51 +38,56 @@ def _truncate(s: str, n: int = 2500) -> str:
     return s if len(s) <= n else (s[: n - 20] + "\n…(truncated)…\n" + s[-20:])
 
 
-def safety_node(state: GraphState) -> dict:
-    ts = _now_iso()
+def _missing_draft_update(ts: str, metrics_in: dict) -> dict:
+    safety = {
+        "safety_pass": False,
+        "safety_score": 0.0,
+        "flags": ["missing_draft"],
+        "required_changes": ["No draft available to review."],
+        "safety_note": "Draft was missing; please generate a draft before running safety.",
+    }
 
-    text = (state.get("input_text") or "").strip()
-    drafts = state.get("drafts") or []
-    metrics_in = state.get("metrics") or {}
+    summary = "Safety check failed: missing draft."
 
-    # Ensure we don't wipe other reviews by replacing the whole "reviews" object
-    # (GraphState uses _merge_dict for reviews)
-    if not drafts:
-        safety = {
-            "safety_pass": False,
+    return {
+        "current_node": "safety",
+        "status": "RUNNING",
+        "reviews": {"safety": safety},
+        "metrics": {
+            **metrics_in,
             "safety_score": 0.0,
-            "flags": ["missing_draft"],
-            "required_changes": ["No draft available to review."],
-            "safety_note": "Draft was missing; please generate a draft before running safety.",
-        }
-
-        summary = "Safety check failed: missing draft."
-
-        return {
-            "current_node": "safety",
-            "status": "RUNNING",
-            "reviews": {"safety": safety},
-            "metrics": {
-                **metrics_in,
-                "safety_score": 0.0,
-                "last_node": "safety",
-                "updated_at": ts,
-            },
-            "trace": [{"ts": ts, "node": "safety", "summary": summary}],
-            "scratchpad": {"safety": ["No draft found — safety cannot run."]},
-        }
+            "last_node": "safety",
+            "updated_at": ts,
+        },
+        "trace": [{"ts": ts, "node": "safety", "summary": summary}],
+        "scratchpad": {"safety": ["No draft found — safety cannot run."]},
+    }
+
 
+def _user_prompt(state: GraphState) -> str:
+    text = (state.get("input_text") or "").strip()
+    drafts = state.get("drafts") or []
     md = (drafts[-1].get("markdown") or "").strip()
 
-    user_prompt = (
+    return (
         f"User request:\n{text}\n\n"
         f"Draft to review:\n{_truncate(md)}\n\n"
         "Return ONLY valid JSON with:\n"
         "{safety_pass: bool, safety_score: number, flags: string[], required_changes: string[], safety_note: string}\n"
     )
 
-    resp = chat_json(system=SAFETY_SYSTEM, user=user_prompt) or {}
 
+# when the LLM is unreachable the draft is not passed as safe; the supervisor/human decide
+_UNAVAILABLE = {
+    "safety_pass": False,
+    "safety_score": 0.0,
+    "flags": ["llm_unavailable"],
+    "required_changes": [],
+    "safety_note": "Safety review unavailable (LLM unreachable); please review manually.",
+}
+
+
+def _review_update(ts: str, metrics_in: dict, resp: dict) -> dict:
     safety_pass = bool(resp.get("safety_pass", True))
     safety_score = _safe_float(resp.get("safety_score"), 1.0 if safety_pass else 0.0)
 
@@ -123,3 +128,33 @@ def safety_node(state: GraphState) -> dict:
         # append into scratchpad.safety
         "scratchpad": {"safety": [summary]},
     }
+
+
+def safety_node(state: GraphState) -> dict:
+    ts = _now_iso()
+    metrics_in = state.get("metrics") or {}
+
+    # Ensure we don't wipe other reviews by replacing the whole "reviews" object
+    # (GraphState uses _merge_dict for reviews)
+    if not state.get("drafts"):
+        return _missing_draft_update(ts, metrics_in)
+
+    try:
+        resp = chat_json(system=SAFETY_SYSTEM, user=_user_prompt(state), node="safety") or {}
+    except LLMUnavailable:
+        resp = _UNAVAILABLE
+    return _review_update(ts, metrics_in, resp)
+
+
+async def safety_node_async(state: GraphState) -> dict:
+    ts = _now_iso()
+    metrics_in = state.get("metrics") or {}
+
+    if not state.get("drafts"):
+        return _missing_draft_update(ts, metrics_in)
+
+    try:
+        resp = await chat_json_async(system=SAFETY_SYSTEM, user=_user_prompt(state), node="safety") or {}
+    except LLMUnavailable:
+        resp = _UNAVAILABLE
+    return _review_update(ts, metrics_in, resp)
@@ -6,7 +6,7 @@ from typing import Any
 from app.core.config import get_settings
 from app.graphs.prompts import SUPERVISOR_SYSTEM
 from app.graphs.state import GraphState
-from app.services.llm import chat_json
+from app.services.llm import LLMUnavailable, chat_json, chat_json_async
 
 
 def _now_iso() -> str:
@@ -25,10 +25,20 @@ def _truncate(s: str, n: int = 160) -> str:
     return s if len(s) <= n else (s[: n - 1] + "…")
 
 
-def supervisor_node(state: GraphState) -> dict:
-    ts = _now_iso()
+def _decision_update(ts: str, supervisor: dict, summary: str) -> dict:
+    return {
+        "current_node": "supervisor",
+        "status": "RUNNING",
+        "supervisor": supervisor,
+        "trace": [{"ts": ts, "node": "supervisor", "summary": summary}],
+        "scratchpad": {"supervisor": [summary]},
+    }
 
-    req = state.get("request") or {"text": state.get("input_text") or ""}
+
+def _rule_based_update(state: GraphState, ts: str) -> dict | None:
+    """
+    Deterministic decisions that don't need the LLM (max iterations, both reviews passed).
+    """
     reviews = state.get("reviews") or {}
     metrics = state.get("metrics") or {}
 
@@ -46,36 +56,34 @@ def supervisor_node(state: GraphState) -> dict:
     if iteration >= max_iters:
         supervisor = {"action": "finalize", "rationale": f"Max iterations reached ({iteration}/{max_iters})."}
         summary = f"Decision: finalize — max iterations reached ({iteration}/{max_iters})."
-        return {
-            "current_node": "supervisor",
-            "status": "RUNNING",
-            "supervisor": supervisor,
-            "trace": [{"ts": ts, "node": "supervisor", "summary": summary}],
-            "scratchpad": {"supervisor": [summary]},
-        }
+        return _decision_update(ts, supervisor, summary)
 
     if safety_pass and quality_pass:
         supervisor = {"action": "finalize", "rationale": "Safety and quality passed."}
         summary = "Decision: finalize — safety and quality passed ✅"
-        return {
-            "current_node": "supervisor",
-            "status": "RUNNING",
-            "supervisor": supervisor,
-            "trace": [{"ts": ts, "node": "supervisor", "summary": summary}],
-            "scratchpad": {"supervisor": [summary]},
-        }
-
-    decision = chat_json(
-        system=SUPERVISOR_SYSTEM,
-        user=(
-            f"Request:\n{req}\n\n"
-            f"Safety review:\n{safety}\n\n"
-            f"Critic review:\n{critic}\n\n"
-            f"Metrics:\n{metrics}\n\n"
-            "Return ONLY JSON: {action: 'finalize'|'revise', rationale: string}."
-        ),
-    ) or {}
+        return _decision_update(ts, supervisor, summary)
+
+    return None
+
+
+def _user_prompt(state: GraphState) -> str:
+    req = state.get("request") or {"text": state.get("input_text") or ""}
+    reviews = state.get("reviews") or {}
+    metrics = state.get("metrics") or {}
+
+    safety = reviews.get("safety") or {}
+    critic = reviews.get("critic") or {}
+
+    return (
+        f"Request:\n{req}\n\n"
+        f"Safety review:\n{safety}\n\n"
+        f"Critic review:\n{critic}\n\n"
+        f"Metrics:\n{metrics}\n\n"
+        "Return ONLY JSON: {action: 'finalize'|'revise', rationale: string}."
+    )
 
+
+def _llm_update(ts: str, decision: dict) -> dict:
     action = decision.get("action")
     if action not in ("finalize", "revise"):
         action = "revise"
@@ -87,10 +95,36 @@ def supervisor_node(state: GraphState) -> dict:
     supervisor = {"action": action, "rationale": rationale.strip()}
     summary = f"Decision: {action} — {_truncate(supervisor['rationale'])}"
 
-    return {
-        "current_node": "supervisor",
-        "status": "RUNNING",
-        "supervisor": supervisor,
-        "trace": [{"ts": ts, "node": "supervisor", "summary": summary}],
-        "scratchpad": {"supervisor": [summary]},
-    }
+    return _decision_update(ts, supervisor, summary)
+
+
+# another revision loop can't help while the LLM is down; finalize and let the human gate decide
+_UNAVAILABLE = {"action": "finalize", "rationale": "LLM unavailable; finalizing the current draft for human review."}
+
+
+def supervisor_node(state: GraphState) -> dict:
+    ts = _now_iso()
+
+    ruled = _rule_based_update(state, ts)
+    if ruled is not None:
+        return ruled
+
+    try:
+        decision = chat_json(system=SUPERVISOR_SYSTEM, user=_user_prompt(state), node="supervisor") or {}
+    except LLMUnavailable:
+        decision = _UNAVAILABLE
+    return _llm_update(ts, decision)
+
+
+async def supervisor_node_async(state: GraphState) -> dict:
+    ts = _now_iso()
+
+    ruled = _rule_based_update(state, ts)
+    if ruled is not None:
+        return ruled
+
+    try:
+        decision = await chat_json_async(system=SUPERVISOR_SYSTEM, user=_user_prompt(state), node="supervisor") or {}
+    except LLMUnavailable:
+        decision = _UNAVAILABLE
+    return _llm_update(ts, decision)
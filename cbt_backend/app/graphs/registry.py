@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Tuple
+
+from app.core.config import get_settings
+from app.graphs.builder import build_graph
+
+
+def current_variant() -> str:
+    """
+    Graph variant matching GRAPH_EXECUTION_MODE ("async" nodes for astream, "sync" for stream).
+    """
+    return "async" if get_settings().async_execution else "sync"
+
+
+class CompiledGraphRegistry:
+    """
+    Process-wide cache of compiled graphs.
+
+    Compiled graphs are stateless (thread_id lives in the run config), so one instance per
+    (checkpointer, variant) can serve every run. Keys use id(checkpointer); the entry keeps a
+    reference to the checkpointer so the id cannot be recycled while cached.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._graphs: Dict[Tuple[int, str], Tuple[Any, Any]] = {}
+
+    def get(self, checkpointer: Any, variant: str | None = None) -> Any:
+        v = variant or current_variant()
+        key = (id(checkpointer), v)
+
+        entry = self._graphs.get(key)
+        if entry is not None and entry[0] is checkpointer:
+            return entry[1]
+
+        with self._lock:
+            entry = self._graphs.get(key)
+            if entry is not None and entry[0] is checkpointer:
+                return entry[1]
+            compiled = build_graph(async_nodes=(v == "async")).compile(checkpointer=checkpointer)
+            self._graphs[key] = (checkpointer, compiled)
+            return compiled
+
+    def warm(self, checkpointer: Any, variant: str | None = None) -> None:
+        """
+        Compile ahead of the first request (called from app lifespan / MCP bootstrap).
+        """
+        self.get(checkpointer, variant)
+
+    def invalidate(self, checkpointer: Any | None = None) -> None:
+        """
+        Drop graphs compiled against `checkpointer` (or everything when None).
+        """
+        with self._lock:
+            if checkpointer is None:
+                self._graphs.clear()
+                return
+            for key in [k for k, (cp, _) in self._graphs.items() if cp is checkpointer]:
+                self._graphs.pop(key, None)
+
+    def size(self) -> int:
+        return len(self._graphs)
+
+
+graph_registry = CompiledGraphRegistry()
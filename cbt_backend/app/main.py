@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -6,10 +7,25 @@ from app.api.routes_health import router as health_router
 from app.api.routes_sessions import router as sessions_router
 from app.api.routes_ws import router as ws_router
 from app.api.routes_runs import router as runs_router
+from app.api.routes_metrics import router as metrics_router
+from app.api.routes_batches import router as batches_router
 
+from app.core.config import get_settings
+from app.graphs.registry import graph_registry
 from app.persistence.checkpointer import checkpointer_manager
-from app.persistence.db import exec_sql
-from app.persistence.run_tables import RUNS_TABLE_SQL, RUN_EVENTS_TABLE_SQL, RUNS_ALTER_SQL
+from app.persistence.db import advisory_lock, exec_sql
+from app.persistence.run_tables import (
+    BATCHES_TABLE_SQL,
+    RUNS_TABLE_SQL,
+    RUN_EVENTS_TABLE_SQL,
+    RUN_LLM_CALLS_TABLE_SQL,
+    RUNS_ALTER_SQL,
+)
+from app.services.llm import close_llm_clients
+from app.services.batches import batch_runner
+from app.services.jobs import watch_cancellations
+from app.services.scheduler import run_scheduler
+from app.services.websocket_manager import ws_manager
 
 
 SESSIONS_TABLE_SQL = """
@@ -22,16 +38,38 @@ CREATE TABLE IF NOT EXISTS sessions (
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    checkpointer_manager.start()
+    if get_settings().async_execution:
+        await checkpointer_manager.astart()
+    else:
+        checkpointer_manager.start()
+
+    with advisory_lock():
+        exec_sql(SESSIONS_TABLE_SQL)
+        exec_sql(RUNS_TABLE_SQL)
+        exec_sql(RUN_EVENTS_TABLE_SQL)
+        exec_sql(RUNS_ALTER_SQL)
+        exec_sql(RUN_LLM_CALLS_TABLE_SQL)
+        exec_sql(BATCHES_TABLE_SQL)
+
+    # compile once so request latency never includes StateGraph build/validation
+    graph_registry.warm(checkpointer_manager.get())
 
-    exec_sql(SESSIONS_TABLE_SQL)
-    exec_sql(RUNS_TABLE_SQL)
-    exec_sql(RUN_EVENTS_TABLE_SQL)
-    exec_sql(RUNS_ALTER_SQL)
+    await ws_manager.start()
+    await run_scheduler.start()
+    # cancel requests for this process's runs that another replica received
+    cancel_watch = asyncio.create_task(watch_cancellations(), name="run-cancel-watch")
 
     yield
 
-    checkpointer_manager.stop()
+    cancel_watch.cancel()
+    await asyncio.gather(cancel_watch, return_exceptions=True)
+    await batch_runner.stop()
+    await run_scheduler.stop()
+    await ws_manager.stop()
+    # let writers deliver the final run events before the server closes the sockets
+    await ws_manager.flush(timeout=5)
+    await close_llm_clients()
+    await checkpointer_manager.astop()
 
 
 app = FastAPI(title="CBT Protocol Backend", lifespan=lifespan)
@@ -52,3 +90,5 @@ app.include_router(health_router)
 app.include_router(sessions_router)
 app.include_router(ws_router)
 app.include_router(runs_router)
+app.include_router(metrics_router)
+app.include_router(batches_router)
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import uuid
+
+from app.persistence.db import exec_sql, fetch_one
+
+
+def create_batch(mode: str, concurrency: int, total: int) -> str:
+    batch_id = str(uuid.uuid4())
+    exec_sql(
+        "INSERT INTO batches (batch_id, status, mode, concurrency, total) VALUES (%s, %s, %s, %s, %s)",
+        [batch_id, "RUNNING", mode, concurrency, total],
+    )
+    return batch_id
+
+
+def finish_batch(batch_id: str, status: str) -> None:
+    exec_sql(
+        "UPDATE batches SET status=%s, finished_at=now() WHERE batch_id=%s::uuid AND status='RUNNING'",
+        [status, batch_id],
+    )
+
+
+def get_batch_progress(batch_id: str) -> dict | None:
+    """
+    The batch row plus its runs counted by status, their mean duration and LLM token use.
+    elapsed_seconds runs to finished_at, or to now while the batch is RUNNING.
+    """
+    return fetch_one(
+        """
+        SELECT b.batch_id::text AS batch_id, b.created_at::text AS created_at, b.finished_at::text AS finished_at,
+               b.status, b.mode, b.concurrency, b.total,
+               EXTRACT(EPOCH FROM COALESCE(b.finished_at, now()) - b.created_at)::float AS elapsed_seconds,
+               r.started, r.running, r.completed, r.halted, r.failed, r.cancelled, r.mean_run_seconds,
+               (SELECT COALESCE(sum(c.prompt_tokens), 0) + COALESCE(sum(c.completion_tokens), 0)
+                FROM run_llm_calls c JOIN runs cr ON cr.run_id = c.run_id
+                WHERE cr.batch_id = b.batch_id)::bigint AS llm_tokens
+        FROM batches b,
+        LATERAL (
+          SELECT count(*)::int AS started,
+                 count(*) FILTER (WHERE status='RUNNING')::int AS running,
+                 count(*) FILTER (WHERE status='COMPLETED')::int AS completed,
+                 count(*) FILTER (WHERE status='HALTED')::int AS halted,
+                 count(*) FILTER (WHERE status='FAILED')::int AS failed,
+                 count(*) FILTER (WHERE status='CANCELLED')::int AS cancelled,
+                 (avg(EXTRACT(EPOCH FROM updated_at - created_at)) FILTER (WHERE status <> 'RUNNING'))::float
+                   AS mean_run_seconds
+          FROM runs WHERE batch_id = b.batch_id
+        ) r
+        WHERE b.batch_id=%s::uuid
+        """,
+        [batch_id],
+    )
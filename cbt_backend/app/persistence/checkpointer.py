@@ -5,10 +5,14 @@ from pathlib import Path
 from typing import Any, Optional
 
 from app.core.config import get_settings
+from app.graphs.registry import graph_registry
+from app.persistence.db import advisory_lock
 
 # These imports are provided by langgraph-checkpoint-* packages
 from langgraph.checkpoint.postgres import PostgresSaver
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 
 
 @dataclass
@@ -17,9 +21,11 @@ class CheckpointerHandle:
     Holds:
       - checkpointer: the active saver instance used by LangGraph
       - _cm: the context-manager object returned by *.from_conn_string(...)
+      - is_async: True when the saver is an Async*Saver (entered via __aenter__)
     """
     checkpointer: Any
     _cm: Any
+    is_async: bool = False
 
     def close(self) -> None:
         # Close resources opened by the CM (connections/files)
@@ -29,6 +35,12 @@ class CheckpointerHandle:
             # We don't want shutdown to crash the server
             pass
 
+    async def aclose(self) -> None:
+        try:
+            await self._cm.__aexit__(None, None, None)
+        except Exception:
+            pass
+
 
 class CheckpointerManager:
     def __init__(self) -> None:
@@ -46,7 +58,9 @@ class CheckpointerManager:
             cm = PostgresSaver.from_conn_string(s.DATABASE_URL)
             checkpointer = cm.__enter__()
             # Call .setup() the first time you use Postgres checkpointer :contentReference[oaicite:5]{index=5}
-            checkpointer.setup()
+            # (serialized: concurrent setup() from several processes races on checkpoint_migrations)
+            with advisory_lock():
+                checkpointer.setup()
             self._handle = CheckpointerHandle(checkpointer=checkpointer, _cm=cm)
             return checkpointer
 
@@ -60,16 +74,61 @@ class CheckpointerManager:
 
         raise ValueError(f"Unsupported CHECKPOINT_BACKEND={s.CHECKPOINT_BACKEND!r} (use 'postgres' or 'sqlite')")
 
+    async def astart(self) -> Any:
+        """
+        Async counterpart of start(): opens an Async*Saver bound to the running event loop,
+        so graph.astream can checkpoint without blocking it.
+        """
+        if self._handle is not None:
+            return self._handle.checkpointer
+
+        s = get_settings()
+        backend = s.CHECKPOINT_BACKEND.strip().lower()
+
+        if backend == "postgres":
+            cm = AsyncPostgresSaver.from_conn_string(s.DATABASE_URL)
+            checkpointer = await cm.__aenter__()
+            with advisory_lock():
+                await checkpointer.setup()
+            self._handle = CheckpointerHandle(checkpointer=checkpointer, _cm=cm, is_async=True)
+            return checkpointer
+
+        if backend == "sqlite":
+            Path(s.SQLITE_PATH).parent.mkdir(parents=True, exist_ok=True)
+            cm = AsyncSqliteSaver.from_conn_string(s.SQLITE_PATH)
+            checkpointer = await cm.__aenter__()
+            await checkpointer.setup()
+            self._handle = CheckpointerHandle(checkpointer=checkpointer, _cm=cm, is_async=True)
+            return checkpointer
+
+        raise ValueError(f"Unsupported CHECKPOINT_BACKEND={s.CHECKPOINT_BACKEND!r} (use 'postgres' or 'sqlite')")
+
     def get(self) -> Any:
         if self._handle is None:
             raise RuntimeError("CheckpointerManager not started yet")
         return self._handle.checkpointer
 
+    @property
+    def is_async(self) -> bool:
+        return self._handle is not None and self._handle.is_async
+
     def stop(self) -> None:
         if self._handle is None:
             return
+        # compiled graphs hold the saver; drop them so nothing reuses a closed connection
+        graph_registry.invalidate(self._handle.checkpointer)
         self._handle.close()
         self._handle = None
 
+    async def astop(self) -> None:
+        if self._handle is None:
+            return
+        graph_registry.invalidate(self._handle.checkpointer)
+        if self._handle.is_async:
+            await self._handle.aclose()
+        else:
+            self._handle.close()
+        self._handle = None
+
 
 checkpointer_manager = CheckpointerManager()
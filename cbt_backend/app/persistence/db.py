@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import Any, Sequence
+from contextlib import contextmanager
+from typing import Any, Iterator, Sequence
 
 import psycopg
 from psycopg.rows import dict_row
@@ -8,13 +9,13 @@ from psycopg.rows import dict_row
 from app.core.config import get_settings
 
 
-def get_conn() -> psycopg.Connection:
+def get_conn(autocommit: bool = False) -> psycopg.Connection:
     """
     Lightweight helper for short-lived connections (used by REST endpoints).
     For higher throughput we can add a pool later.
     """
     s = get_settings()
-    return psycopg.connect(s.DATABASE_URL, row_factory=dict_row)
+    return psycopg.connect(s.DATABASE_URL, row_factory=dict_row, autocommit=autocommit)
 
 
 def exec_sql(sql: str, params: Sequence[Any] | None = None) -> None:
@@ -38,3 +39,35 @@ def fetch_one(sql: str, params: Sequence[Any] | None = None) -> dict | None:
             cur.execute(sql, params or [])
             row = cur.fetchone()
         return row
+
+
+def exec_sql_returning(sql: str, params: Sequence[Any] | None = None) -> dict | None:
+    """
+    Runs a write with RETURNING and commits; returns the first row (or None).
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params or [])
+            row = cur.fetchone()
+        conn.commit()
+        return row
+
+
+# Arbitrary constant shared by every process that bootstraps schema/checkpointer tables.
+SCHEMA_LOCK_KEY = 0x43425401
+
+
+@contextmanager
+def advisory_lock(key: int = SCHEMA_LOCK_KEY) -> Iterator[None]:
+    """
+    Session-level pg_advisory_lock held on a dedicated connection.
+    Serializes startup DDL/migrations when several API replicas or workers boot at once.
+    Autocommit, so the lock session isn't left idle in a transaction: the checkpointer's
+    CREATE INDEX CONCURRENTLY migrations wait for every open transaction to end.
+    """
+    with get_conn(autocommit=True) as conn:
+        conn.execute("SELECT pg_advisory_lock(%s)", [key])
+        try:
+            yield
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(%s)", [key])
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import uuid
+
+from psycopg.types.json import Jsonb
+
+from app.persistence.db import exec_sql, exec_sql_returning, fetch_all
+
+
+def enqueue_run(
+    thread_id: str,
+    input_text: str,
+    require_human_approval: bool,
+    deadline_seconds: float | None = None,
+) -> str:
+    run_id = str(uuid.uuid4())
+    exec_sql(
+        """
+        INSERT INTO runs (run_id, thread_id, status, require_human_approval, input_text, job_kind, job_payload, queued_at)
+        VALUES (%s, %s, 'RUNNING', %s, %s, 'run', %s, now())
+        """,
+        [run_id, thread_id, require_human_approval, input_text, Jsonb({"deadline_seconds": deadline_seconds})],
+    )
+    return run_id
+
+
+def _requeue(run_id: str, job_kind: str, payload: dict) -> None:
+    # status flips to RUNNING so a second approve / continue finds nothing to pick up
+    exec_sql(
+        """
+        UPDATE runs
+        SET status='RUNNING', job_kind=%s, job_payload=%s,
+            queued_at=now(), claimed_by=NULL, claimed_at=NULL, cancel_requested_at=NULL, updated_at=now()
+        WHERE run_id=%s
+        """,
+        [job_kind, Jsonb(payload), run_id],
+    )
+
+
+def enqueue_resume(
+    run_id: str,
+    approved: bool,
+    edited_text: str | None,
+    feedback: str | None,
+    deadline_seconds: float | None = None,
+) -> None:
+    # Re-queues a HALTED run.
+    _requeue(
+        run_id,
+        "resume",
+        {"approved": approved, "edited_text": edited_text, "feedback": feedback, "deadline_seconds": deadline_seconds},
+    )
+
+
+def enqueue_continue(run_id: str, deadline_seconds: float | None = None) -> None:
+    # Re-queues a CANCELLED run to carry on from its last checkpoint.
+    _requeue(run_id, "continue", {"deadline_seconds": deadline_seconds})
+
+
+def cancel_unclaimed_run(run_id: str) -> bool:
+    """
+    Cancels a queued job no worker has picked up yet. Returns False if it is already claimed
+    (the owning worker sees cancel_requested_at and aborts it).
+    """
+    row = exec_sql_returning(
+        """
+        UPDATE runs
+        SET status='CANCELLED', error='cancelled', cancel_requested_at=NULL, job_kind=NULL, updated_at=now()
+        WHERE run_id=%s AND status='RUNNING' AND job_kind IS NOT NULL AND claimed_by IS NULL
+        RETURNING run_id::text AS run_id
+        """,
+        [run_id],
+    )
+    return row is not None
+
+
+def cancel_requested_runs(worker_id: str) -> list[str]:
+    rows = fetch_all(
+        """
+        SELECT run_id::text AS run_id
+        FROM runs
+        WHERE claimed_by=%s AND status='RUNNING' AND cancel_requested_at IS NOT NULL
+        """,
+        [worker_id],
+    )
+    return [r["run_id"] for r in rows]
+
+
+def claim_next_run(worker_id: str, stale_seconds: int) -> dict | None:
+    """
+    Atomically claims the oldest queued job.
+    SKIP LOCKED lets many workers poll concurrently without blocking on (or double-claiming) the same row;
+    claims whose heartbeat is older than stale_seconds are treated as abandoned by a dead worker.
+    """
+    return exec_sql_returning(
+        """
+        UPDATE runs
+        SET claimed_by=%s, claimed_at=now(), updated_at=now()
+        WHERE run_id = (
+          SELECT run_id
+          FROM runs
+          WHERE status='RUNNING'
+            AND job_kind IS NOT NULL
+            AND (claimed_by IS NULL OR claimed_at < now() - make_interval(secs => %s))
+          ORDER BY queued_at
+          LIMIT 1
+          FOR UPDATE SKIP LOCKED
+        )
+        RETURNING run_id::text AS run_id, thread_id, job_kind, job_payload, input_text, require_human_approval
+        """,
+        [worker_id, stale_seconds],
+    )
+
+
+def heartbeat_run(run_id: str, worker_id: str) -> None:
+    exec_sql(
+        "UPDATE runs SET claimed_at=now() WHERE run_id=%s AND claimed_by=%s",
+        [run_id, worker_id],
+    )
+
+
+def release_run(run_id: str, worker_id: str) -> None:
+    # Hand an unfinished job back to the queue (graceful shutdown mid-run).
+    exec_sql(
+        "UPDATE runs SET claimed_by=NULL, claimed_at=NULL WHERE run_id=%s AND claimed_by=%s AND status='RUNNING'",
+        [run_id, worker_id],
+    )
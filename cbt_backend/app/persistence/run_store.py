@@ -5,25 +5,35 @@ from typing import Any, Dict
 
 from psycopg.types.json import Jsonb
 
-from app.persistence.db import exec_sql, fetch_all, fetch_one
+from app.persistence.db import exec_sql, exec_sql_returning, fetch_all, fetch_one, get_conn
 
 
 def create_run(
     thread_id: str,
     input_text: str,
     require_human_approval: bool,
+    batch: tuple[str, int] | None = None,
 ) -> str:
+    """
+    batch: (batch_id, index) for runs started by POST /batches.
+    """
     run_id = str(uuid.uuid4())
+    batch_id, batch_index = batch if batch is not None else (None, None)
     exec_sql(
         """
-        INSERT INTO runs (run_id, thread_id, status, require_human_approval, input_text)
-        VALUES (%s, %s, %s, %s, %s)
+        INSERT INTO runs (run_id, thread_id, status, require_human_approval, input_text, batch_id, batch_index)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
         """,
-        [run_id, thread_id, "RUNNING", require_human_approval, input_text],
+        [run_id, thread_id, "RUNNING", require_human_approval, input_text, batch_id, batch_index],
     )
     return run_id
 
 
+def delete_run(run_id: str) -> None:
+    # only for a row whose job never reached the scheduler (the lane filled up in between)
+    exec_sql("DELETE FROM runs WHERE run_id=%s", [run_id])
+
+
 def update_run_from_state(
     run_id: str,
     status: str,
@@ -67,7 +77,12 @@ def update_run_from_state(
           reviews=%s,
           supervisor=%s,
           human_edit=%s,
-          error=%s
+          error=%s,
+          cancel_requested_at=NULL,
+          -- leaving RUNNING ends the queue job (see set_run_status)
+          job_kind=CASE WHEN %s='RUNNING' THEN job_kind END,
+          claimed_by=CASE WHEN %s='RUNNING' THEN claimed_by END,
+          claimed_at=CASE WHEN %s='RUNNING' THEN claimed_at END
         WHERE run_id=%s
         """,
         [
@@ -81,11 +96,73 @@ def update_run_from_state(
             Jsonb(supervisor) if supervisor is not None else None,
             Jsonb(human_edit) if human_edit is not None else None,
             error,
+            status,
+            status,
+            status,
             run_id,
         ],
     )
 
 
+def set_run_status(run_id: str, status: str) -> None:
+    # any status transition settles an outstanding cancel request. Leaving RUNNING also ends the queue
+    # job, so an inline resume/continue later (status back to RUNNING) doesn't look like a job with a
+    # stale claim that claim_next_run would hand to a worker again.
+    exec_sql(
+        """
+        UPDATE runs
+        SET status=%s, updated_at=now(), cancel_requested_at=NULL,
+            job_kind=CASE WHEN %s='RUNNING' THEN job_kind END,
+            claimed_by=CASE WHEN %s='RUNNING' THEN claimed_by END,
+            claimed_at=CASE WHEN %s='RUNNING' THEN claimed_at END
+        WHERE run_id=%s
+        """,
+        [status, status, status, status, run_id],
+    )
+
+
+def abandon_run(run_id: str, status: str, error: str | None = None) -> None:
+    """
+    Settles a run this process was holding when it shut down, unless the run already left RUNNING.
+    """
+    exec_sql(
+        """
+        UPDATE runs
+        SET status=%s, error=%s, updated_at=now(), cancel_requested_at=NULL,
+            job_kind=NULL, claimed_by=NULL, claimed_at=NULL
+        WHERE run_id=%s AND status='RUNNING'
+        """,
+        [status, error, run_id],
+    )
+
+
+def request_cancel(run_id: str) -> dict | None:
+    """
+    Flags a RUNNING run for cancellation. Returns the row (with its queue claim) or None if it isn't running.
+    """
+    return exec_sql_returning(
+        """
+        UPDATE runs
+        SET cancel_requested_at=now(), updated_at=now()
+        WHERE run_id=%s AND status='RUNNING'
+        RETURNING run_id::text AS run_id, thread_id, job_kind, claimed_by
+        """,
+        [run_id],
+    )
+
+
+def cancel_requested_among(run_ids: list[str]) -> list[str]:
+    rows = fetch_all(
+        """
+        SELECT run_id::text AS run_id
+        FROM runs
+        WHERE run_id = ANY(%s::uuid[]) AND status='RUNNING' AND cancel_requested_at IS NOT NULL
+        """,
+        [run_ids],
+    )
+    return [r["run_id"] for r in rows]
+
+
 def log_event(run_id: str, event_type: str, payload: dict | None = None, seq: int | None = None) -> None:
     exec_sql(
         """
@@ -96,6 +173,30 @@ def log_event(run_id: str, event_type: str, payload: dict | None = None, seq: in
     )
 
 
+def next_event_seq(run_id: str) -> int:
+    """
+    First seq for the next leg (run / resume / continue) of a run; seqs never restart within a run.
+    """
+    row = fetch_one(
+        "SELECT COALESCE(max(seq), 0) + 1 AS seq FROM run_events WHERE run_id=%s::uuid AND event_type <> 'ws_broadcast'",
+        [run_id],
+    )
+    return int(row["seq"]) if row else 1
+
+
+def list_run_events_after(run_id: str, after_seq: int, limit: int = 500) -> list[dict]:
+    return fetch_all(
+        """
+        SELECT ts::text AS ts, seq, event_type, payload
+        FROM run_events
+        WHERE run_id=%s::uuid AND seq > %s AND event_type <> 'ws_broadcast'
+        ORDER BY seq ASC, id ASC
+        LIMIT %s
+        """,
+        [run_id, after_seq, limit],
+    )
+
+
 def get_latest_run(thread_id: str) -> dict | None:
     # ✅ FIX: filter by thread_id (not run_id)
     return fetch_one(
@@ -169,7 +270,7 @@ def list_run_events(run_id: str, limit: int = 100) -> list[dict]:
         """
         SELECT id, ts::text AS ts, seq, event_type, payload
         FROM run_events
-        WHERE run_id=%s::uuid
+        WHERE run_id=%s::uuid AND event_type <> 'ws_broadcast'
         ORDER BY id ASC
         LIMIT %s
         """,
@@ -189,3 +290,43 @@ def set_pending_interrupt(run_id: str, interrupt_payload: dict | None) -> None:
         "UPDATE runs SET pending_interrupt=%s, updated_at=now() WHERE run_id=%s",
         [Jsonb(interrupt_payload), run_id],
     )
+
+
+def insert_llm_calls(run_id: str, calls: list[dict]) -> None:
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.executemany(
+                """
+                INSERT INTO run_llm_calls (run_id, node, model, prompt_tokens, completion_tokens, wall_ms, retries, outcome)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """,
+                [
+                    [run_id, c["node"], c["model"], c["prompt_tokens"], c["completion_tokens"], c["wall_ms"], c["retries"], c["outcome"]]
+                    for c in calls
+                ],
+            )
+        conn.commit()
+
+
+def list_run_llm_usage(run_id: str) -> list[dict]:
+    """
+    run_llm_calls aggregated per (node, model), in the order the nodes first called the LLM.
+    """
+    return fetch_all(
+        """
+        SELECT node, model,
+               count(*)::int AS calls,
+               count(*) FILTER (WHERE outcome='cached')::int AS cached,
+               count(*) FILTER (WHERE outcome IN ('unavailable', 'error'))::int AS failed,
+               COALESCE(sum(prompt_tokens), 0)::int AS prompt_tokens,
+               COALESCE(sum(completion_tokens), 0)::int AS completion_tokens,
+               sum(wall_ms)::int AS wall_ms,
+               max(wall_ms)::int AS max_wall_ms,
+               sum(retries)::int AS retries
+        FROM run_llm_calls
+        WHERE run_id=%s::uuid
+        GROUP BY node, model
+        ORDER BY min(id)
+        """,
+        [run_id],
+    )
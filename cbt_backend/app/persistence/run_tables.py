@@ -6,7 +6,7 @@ CREATE TABLE IF NOT EXISTS runs (
   created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
   updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
 
-  status TEXT NOT NULL, -- RUNNING | HALTED | COMPLETED | FAILED
+  status TEXT NOT NULL, -- RUNNING | HALTED | COMPLETED | FAILED | CANCELLED
   require_human_approval BOOLEAN NOT NULL DEFAULT TRUE,
 
   input_text TEXT,
@@ -39,8 +39,57 @@ CREATE TABLE IF NOT EXISTS run_events (
 );
 
 CREATE INDEX IF NOT EXISTS idx_run_events_run_ts ON run_events(run_id, ts DESC);
+
+-- WS_BROADCAST_BACKEND=postgres: oversized WS events passed by reference, pruned by age
+CREATE INDEX IF NOT EXISTS idx_run_events_ws_broadcast_ts ON run_events(ts) WHERE event_type='ws_broadcast';
+"""
+
+RUN_LLM_CALLS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS run_llm_calls (
+  id BIGSERIAL PRIMARY KEY,
+  run_id UUID NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+  ts TIMESTAMPTZ NOT NULL DEFAULT now(),
+  node TEXT,
+  model TEXT NOT NULL,
+  prompt_tokens INT,
+  completion_tokens INT,
+  wall_ms INT NOT NULL, -- whole chat_json call: queueing, retries and backoff included
+  retries INT NOT NULL DEFAULT 0,
+  outcome TEXT NOT NULL -- ok | cached | unavailable | error | cancelled
+);
+
+CREATE INDEX IF NOT EXISTS idx_run_llm_calls_run ON run_llm_calls(run_id);
+"""
+
+BATCHES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS batches (
+  batch_id UUID PRIMARY KEY,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  finished_at TIMESTAMPTZ,
+  status TEXT NOT NULL, -- RUNNING | COMPLETED | CANCELLED
+  mode TEXT NOT NULL,
+  concurrency INT NOT NULL,
+  total INT NOT NULL
+);
 """
 
 RUNS_ALTER_SQL = """
 ALTER TABLE runs ADD COLUMN IF NOT EXISTS pending_interrupt JSONB;
+
+-- work queue (RUN_JOB_BACKEND=postgres): RUNNING + job_kind set + unclaimed => claimable
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS job_kind TEXT; -- run | resume | continue
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS job_payload JSONB;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS queued_at TIMESTAMPTZ;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS claimed_by TEXT;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMPTZ;
+
+-- POST /runs/{run_id}/cancel; whichever process drives the run watches for it
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS cancel_requested_at TIMESTAMPTZ;
+
+-- POST /batches: the batch a run belongs to, and its prompt's position in the request
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS batch_id UUID;
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS batch_index INT;
+
+CREATE INDEX IF NOT EXISTS idx_runs_queue ON runs(queued_at) WHERE status='RUNNING' AND job_kind IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_runs_batch ON runs(batch_id) WHERE batch_id IS NOT NULL;
 """
\ No newline at end of file
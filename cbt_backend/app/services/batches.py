@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List
+
+from app.core.config import get_settings
+from app.persistence.batch_store import create_batch, finish_batch, get_batch_progress
+from app.persistence.db import exec_sql
+from app.persistence.run_store import get_run
+from app.services.jobs import schedule_run
+from app.services.scheduler import BULK, JobQueueFull
+from app.utils.ids import new_thread_id
+from app.utils.json_codec import dumps
+
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def require_approval_for(mode: str, flag: bool | None) -> bool:
+    # same rule as POST /sessions/{id}/run, except human_optional defaults to no approval for bulk work
+    if mode == "human_required":
+        return True
+    if mode == "auto":
+        return False
+    return bool(flag)
+
+
+@dataclass
+class Batch:
+    batch_id: str
+    prompts: List[str]
+    mode: str
+    concurrency: int
+    require_human_approval: bool
+    deadline_seconds: float | None
+    # result lines for the POST /batches response; unbounded so a slow reader never stalls the runs
+    results: asyncio.Queue = field(default_factory=asyncio.Queue)
+    task: asyncio.Task | None = None
+
+
+def progress(batch_id: str) -> dict | None:
+    """
+    GET /batches/{id}: counts by status plus throughput (finished runs per minute since the batch started).
+    """
+    row = get_batch_progress(batch_id)
+    if row is None:
+        return None
+    finished = row["completed"] + row["halted"] + row["failed"] + row["cancelled"]
+    elapsed = max(row["elapsed_seconds"], 1e-6)
+    return {
+        **row,
+        "pending": row["total"] - row["started"],
+        "finished": finished,
+        "runs_per_minute": round(finished * 60 / elapsed, 3),
+        "tokens_per_minute": round(row["llm_tokens"] * 60 / elapsed, 1),
+    }
+
+
+class BatchRunner:
+    """
+    Drives POST /batches: one session + run per prompt, through the scheduler's bulk lane
+    (schedule_run -> run_with_ws), at most `concurrency` of the batch's runs in flight at once.
+
+    A batch runs as its own task, so it keeps going if the client streaming its results disconnects;
+    GET /batches/{id} reports progress from the runs table.
+    """
+
+    def __init__(self) -> None:
+        self._batches: Dict[str, Batch] = {}
+
+    async def start(
+        self,
+        prompts: List[str],
+        *,
+        mode: str,
+        concurrency: int | None,
+        require_human_approval: bool | None,
+        deadline_seconds: float | None,
+    ) -> Batch:
+        s = get_settings()
+        limit = max(1, min(concurrency or s.BATCH_DEFAULT_CONCURRENCY, s.BATCH_MAX_CONCURRENCY))
+        batch = Batch(
+            batch_id=await asyncio.to_thread(create_batch, mode, limit, len(prompts)),
+            prompts=prompts,
+            mode=mode,
+            concurrency=limit,
+            require_human_approval=require_approval_for(mode, require_human_approval),
+            deadline_seconds=deadline_seconds,
+        )
+        self._batches[batch.batch_id] = batch
+        batch.task = asyncio.create_task(self._drive(batch), name=f"batch-{batch.batch_id}")
+        return batch
+
+    async def _submit(self, batch: Batch, index: int) -> tuple[str, str, asyncio.Future]:
+        thread_id = new_thread_id()
+        await asyncio.to_thread(
+            exec_sql, "INSERT INTO sessions (thread_id, mode) VALUES (%s, %s)", [thread_id, batch.mode]
+        )
+        while True:
+            try:
+                run_id, fut = await schedule_run(
+                    thread_id,
+                    batch.prompts[index],
+                    batch.require_human_approval,
+                    lane=BULK,
+                    deadline_seconds=batch.deadline_seconds,
+                    batch=(batch.batch_id, index),
+                )
+                return thread_id, run_id, fut
+            except JobQueueFull as e:
+                # other bulk work filled the lane; wait our turn rather than fail the item
+                await asyncio.sleep(e.retry_after)
+
+    async def _item(self, batch: Batch, index: int, slots: asyncio.Semaphore) -> None:
+        async with slots:
+            line: Dict[str, Any] = {"type": "result", "index": index}
+            try:
+                thread_id, run_id, fut = await self._submit(batch, index)
+                line.update(thread_id=thread_id, run_id=run_id)
+                result = await fut
+                row = await asyncio.to_thread(get_run, run_id) or {}
+                line.update(
+                    status=result.get("status"),
+                    final_markdown=row.get("final_markdown"),
+                    final_data=row.get("final_data"),
+                    error=row.get("error"),
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                line.update(status="FAILED", error=str(e))
+            batch.results.put_nowait(line)
+
+    async def _drive(self, batch: Batch) -> None:
+        slots = asyncio.Semaphore(batch.concurrency)
+        status = "COMPLETED"
+        try:
+            await asyncio.gather(*(self._item(batch, i, slots) for i in range(len(batch.prompts))))
+        except asyncio.CancelledError:
+            status = "CANCELLED"
+            raise
+        finally:
+            try:
+                await asyncio.to_thread(finish_batch, batch.batch_id, status)
+                batch.results.put_nowait({"type": "summary", **(await asyncio.to_thread(progress, batch.batch_id))})
+            except Exception:
+                logger.exception("batch %s: can't record the outcome", batch.batch_id)
+            batch.results.put_nowait(_DONE)
+            self._batches.pop(batch.batch_id, None)
+
+    async def stream(self, batch: Batch) -> AsyncIterator[bytes]:
+        """
+        NDJSON: a `batch` line, one `result` line per prompt as its run finishes, then a `summary` line.
+        """
+        head = {"type": "batch", "batch_id": batch.batch_id, "total": len(batch.prompts), "concurrency": batch.concurrency}
+        yield dumps(head) + b"\n"
+        while True:
+            line = await batch.results.get()
+            if line is _DONE:
+                return
+            yield dumps(line) + b"\n"
+
+    async def stop(self) -> None:
+        tasks = [b.task for b in self._batches.values() if b.task is not None]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"active": len(self._batches)}
+
+
+batch_runner = BatchRunner()
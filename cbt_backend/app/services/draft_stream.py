@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Tuple
+
+from app.core.config import get_settings
+from app.services.websocket_manager import ws_manager
+
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonStringFieldReader:
+    """
+    Incrementally decodes one top-level string field ("markdown") out of a JSON object that is still
+    being generated. feed() takes the next raw chunk and returns the field text decoded so far that
+    it hasn't returned before; a chunk ending mid-escape is held until the rest arrives.
+    """
+
+    def __init__(self, field: str) -> None:
+        self._opening = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buf = ""
+        self._pos = -1  # index in _buf of the next undecoded character of the value; -1 = not found yet
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        if self.done:
+            return ""
+        self._buf += chunk
+        if self._pos < 0:
+            m = self._opening.search(self._buf)
+            if m is None:
+                return ""
+            self._pos = m.end()
+
+        out: List[str] = []
+        buf, i, n = self._buf, self._pos, len(self._buf)
+        while i < n:
+            c = buf[i]
+            if c == '"':
+                self.done = True
+                i += 1
+                break
+            if c != "\\":
+                j = i
+                while j < n and buf[j] not in '"\\':
+                    j += 1
+                out.append(buf[i:j])
+                i = j
+                continue
+            if i + 1 >= n:
+                break
+            e = buf[i + 1]
+            if e == "u":
+                if i + 6 > n:
+                    break
+                code = int(buf[i + 2 : i + 6], 16)
+                if 0xD800 <= code < 0xDC00:  # surrogate pair: wait for the low half
+                    if i + 12 > n:
+                        break
+                    low = int(buf[i + 8 : i + 12], 16)
+                    out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    i += 12
+                    continue
+                out.append(chr(code))
+                i += 6
+                continue
+            out.append(_ESCAPES.get(e, e))
+            i += 2
+        # keep only what's still undecoded; the prefix before the value is never needed again
+        self._buf, self._pos = buf[i:], 0
+        return "".join(out)
+
+
+class DraftDeltaPublisher:
+    """
+    Turns the drafter's streamed completion into `draft_delta` WS events for one draft version:
+    {"type": "draft_delta", "run_id", "node": "drafter", "version", "offset", "text"}, where text is
+    the markdown generated since offset. Sent at most every DRAFT_DELTA_INTERVAL_MS; no seq, so they
+    are neither replayed nor logged, and the drafter's node_update still carries the committed draft.
+    A slow socket gets them merged rather than queued one by one (websocket_manager's DRAFT frames).
+    """
+
+    def __init__(self, thread_id: str, run_id: str, version: int) -> None:
+        self.thread_id = thread_id
+        self.run_id = run_id
+        self.version = version
+        self.interval = get_settings().DRAFT_DELTA_INTERVAL_MS / 1000
+        self.reader = JsonStringFieldReader("markdown")
+        self.sent = 0
+        self._pending: List[str] = []
+        self._last = 0.0
+
+    async def feed(self, chunk: str) -> None:
+        text = self.reader.feed(chunk)
+        if text:
+            self._pending.append(text)
+        if self._pending and time.monotonic() - self._last >= self.interval:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending.clear()
+        self._last = time.monotonic()
+        await ws_manager.broadcast(
+            self.thread_id,
+            {
+                "type": "draft_delta",
+                "run_id": self.run_id,
+                "node": "drafter",
+                "version": self.version,
+                "offset": self.sent,
+                "text": text,
+            },
+        )
+        self.sent += len(text)
+
+    async def reset(self) -> None:
+        """
+        The stream failed and the call is retried without streaming: tells the UI to drop the partial
+        draft ({"type": "draft_reset", "run_id", "node", "version"}) and starts over.
+        """
+        self._pending.clear()
+        self.reader = JsonStringFieldReader("markdown")
+        if self.sent:
+            await ws_manager.broadcast(
+                self.thread_id,
+                {"type": "draft_reset", "run_id": self.run_id, "node": "drafter", "version": self.version},
+            )
+        self.sent = 0
+
+
+# set by the runner around a graph invocation (the drafter node has no other way to know its thread/run)
+_target: ContextVar[Tuple[str, str] | None] = ContextVar("draft_stream_target", default=None)
+
+
+@contextmanager
+def track_drafts(thread_id: str, run_id: str) -> Iterator[None]:
+    token = _target.set((thread_id, run_id))
+    try:
+        yield
+    finally:
+        _target.reset(token)
+
+
+def publisher(version: int) -> DraftDeltaPublisher | None:
+    """
+    A publisher for this draft when DRAFTER_STREAMING is on and the drafter runs under the runner.
+    """
+    target = _target.get()
+    if target is None or not get_settings().DRAFTER_STREAMING:
+        return None
+    return DraftDeltaPublisher(target[0], target[1], version)
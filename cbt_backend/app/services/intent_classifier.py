@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import random
+import re
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+from app.core.config import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+RESOURCES = Path(__file__).resolve().parents[1] / "resources"
+DEFAULT_MODEL_PATH = RESOURCES / "intent_lexicon.v1.json"
+SEED_PATH = RESOURCES / "intent_seed.jsonl"
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9'-]*")
+
+# how intent_guard requests were decided (GET /metrics -> intent)
+_counters = {"local_accepted": 0, "local_rejected": 0, "deferred_to_llm": 0}
+
+
+def features(text: str) -> Set[str]:
+    """
+    Lowercased words and adjacent word pairs ("panic attacks", "exposure ladder"), presence only.
+    """
+    words = _WORD.findall(text.lower())
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def _sigmoid(z: float) -> float:
+    if z < -30:
+        return 0.0
+    if z > 30:
+        return 1.0
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+@dataclass(frozen=True)
+class IntentModel:
+    """
+    A weighted lexicon: logistic regression over features(text). Unknown words weigh nothing,
+    so text the model has no evidence about lands near sigmoid(bias) and goes to the LLM.
+    """
+
+    version: str
+    bias: float
+    weights: Dict[str, float]
+
+    def probability(self, text: str) -> float:
+        w = self.weights
+        return _sigmoid(self.bias + sum(w.get(f, 0.0) for f in features(text)))
+
+    @classmethod
+    def load(cls, path: str | Path) -> "IntentModel":
+        raw = json.loads(Path(path).read_text(encoding="utf-8"))
+        return cls(version=str(raw["version"]), bias=float(raw["bias"]), weights=dict(raw["weights"]))
+
+
+@lru_cache
+def get_intent_model() -> IntentModel | None:
+    """
+    The artifact named by INTENT_MODEL_PATH (default: the packaged lexicon); None if the fast path
+    is off or the artifact can't be read, in which case every request goes to the LLM.
+    """
+    s = get_settings()
+    if not s.INTENT_FAST_PATH:
+        return None
+    path = s.INTENT_MODEL_PATH or DEFAULT_MODEL_PATH
+    try:
+        return IntentModel.load(path)
+    except Exception:
+        logger.warning("intent classifier: can't load %s; using the LLM for every request", path, exc_info=True)
+        return None
+
+
+def classify_locally(text: str) -> Tuple[bool, str] | None:
+    """
+    (relevant, reason) when the local model is confident, otherwise None. Accepts at
+    INTENT_ACCEPT_THRESHOLD; rejects only if INTENT_REJECT_THRESHOLD is set (> 0).
+    """
+    model = get_intent_model()
+    if model is None:
+        return None
+    s = get_settings()
+    p = model.probability(text)
+    if p >= s.INTENT_ACCEPT_THRESHOLD:
+        _counters["local_accepted"] += 1
+        return True, f"local classifier {model.version} (p={p:.2f})"
+    if s.INTENT_REJECT_THRESHOLD > 0 and p <= s.INTENT_REJECT_THRESHOLD:
+        _counters["local_rejected"] += 1
+        return False, f"local classifier {model.version} (p={p:.2f})"
+    _counters["deferred_to_llm"] += 1
+    return None
+
+
+def stats() -> dict:
+    model = get_intent_model()
+    return {"model": model.version if model is not None else None, **{f"{k}_total": v for k, v in _counters.items()}}
+
+
+# ---- training -------------------------------------------------------------------------------------
+
+
+def train(
+    examples: List[Tuple[str, bool]],
+    *,
+    epochs: int = 30,
+    lr: float = 0.3,
+    l2: float = 0.01,
+    min_weight: float = 0.05,
+    seed: int = 0,
+) -> Tuple[float, Dict[str, float]]:
+    """
+    Plain SGD logistic regression; the L2 term keeps single-example words from getting confident weights.
+    Weights below min_weight are dropped from the lexicon.
+    """
+    rows = [(features(t), 1.0 if y else 0.0) for t, y in examples]
+    rng = random.Random(seed)
+    bias = 0.0
+    weights: Dict[str, float] = {}
+    for _ in range(epochs):
+        rng.shuffle(rows)
+        for feats, y in rows:
+            err = _sigmoid(bias + sum(weights.get(f, 0.0) for f in feats)) - y
+            bias -= lr * err
+            for f in feats:
+                w = weights.get(f, 0.0)
+                weights[f] = w - lr * (err + l2 * w)
+    kept = {f: round(w, 4) for f, w in weights.items() if abs(w) >= min_weight}
+    return round(bias, 4), dict(sorted(kept.items()))
+
+
+def load_seed(path: Path = SEED_PATH) -> List[Tuple[str, bool]]:
+    out = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.strip():
+            row = json.loads(line)
+            out.append((row["text"], bool(row["relevant"])))
+    return out
+
+
+def load_history(limit: int = 50000) -> List[Tuple[str, bool]]:
+    """
+    Finished runs labelled by their outcome: redirected by intent_guard (the "Out of scope" final) or not.
+    """
+    from app.persistence.db import fetch_all
+
+    rows = fetch_all(
+        """
+        SELECT input_text, final_markdown
+        FROM runs
+        WHERE status IN ('COMPLETED', 'HALTED') AND input_text IS NOT NULL AND input_text <> ''
+        ORDER BY created_at DESC
+        LIMIT %s
+        """,
+        [limit],
+    )
+    return [(r["input_text"], not (r["final_markdown"] or "").startswith("## Out of scope")) for r in rows]
+
+
+def build_artifact(examples: Iterable[Tuple[str, bool]], version: str) -> dict:
+    examples = list(examples)
+    bias, weights = train(examples)
+    return {
+        "version": version,
+        "trained_at": date.today().isoformat(),
+        "examples": len(examples),
+        "relevant": sum(1 for _, y in examples if y),
+        "bias": bias,
+        "weights": weights,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the intent_guard fast-path lexicon.")
+    parser.add_argument("--out", default=str(DEFAULT_MODEL_PATH))
+    parser.add_argument("--version", required=True, help="recorded in the artifact, e.g. v2")
+    parser.add_argument("--from-db", action="store_true", help="add finished runs from DATABASE_URL to the seed set")
+    args = parser.parse_args()
+
+    examples = load_seed()
+    if args.from_db:
+        examples += load_history()
+    artifact = build_artifact(examples, args.version)
+    Path(args.out).write_text(json.dumps(artifact, indent=1, sort_keys=True) + "\n", encoding="utf-8")
+    print(f"wrote {args.out}: {len(artifact['weights'])} weights from {artifact['examples']} examples")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Callable
+
+from app.core.config import get_settings
+from app.persistence.run_queue import cancel_unclaimed_run, enqueue_continue, enqueue_resume, enqueue_run
+from app.persistence.run_store import (
+    cancel_requested_among,
+    create_run,
+    delete_run,
+    log_event,
+    request_cancel,
+    set_run_status,
+)
+from app.services.run_control import run_controls
+from app.services.scheduler import INTERACTIVE, JobQueueFull, RunJob, run_scheduler
+
+
+__all__ = [
+    "JobQueueFull",
+    "cancel_run",
+    "check_admission",
+    "dispatch_continue",
+    "dispatch_resume",
+    "dispatch_run",
+    "schedule_continue",
+    "schedule_resume",
+    "schedule_run",
+    "watch_cancellations",
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+def _queue_backend() -> str:
+    return get_settings().RUN_JOB_BACKEND.strip().lower()
+
+
+def check_admission(lane: str, *, background: bool = False) -> None:
+    """
+    Raises JobQueueFull if `lane` is saturated. Background runs on the postgres backend skip this:
+    that queue is unbounded and app.worker processes drain it at their own pace.
+    """
+    if background and _queue_backend() == "postgres":
+        return
+    run_scheduler.check_admission(lane)
+
+
+async def _submit(job: RunJob, rollback: Callable[[], None]) -> asyncio.Future:
+    # the row was written off the loop, so the lane may have filled up in the meantime: undo the write
+    try:
+        return run_scheduler.submit(job)
+    except JobQueueFull:
+        await asyncio.to_thread(rollback)
+        raise
+
+
+async def schedule_run(
+    thread_id: str,
+    input_text: str,
+    require_human_approval: bool,
+    lane: str = INTERACTIVE,
+    deadline_seconds: float | None = None,
+    batch: tuple[str, int] | None = None,
+) -> tuple[str, asyncio.Future]:
+    """
+    Creates the run row (off the event loop) and queues it on the in-process scheduler.
+    Returns (run_id, future); await the future for the runner's result. Raises JobQueueFull, with the
+    row deleted again, if the lane filled up while the row was being written.
+    """
+    from app.services.runner import run_with_ws
+
+    run_id = await asyncio.to_thread(
+        create_run,
+        thread_id=thread_id,
+        input_text=input_text,
+        require_human_approval=require_human_approval,
+        batch=batch,
+    )
+    fut = await _submit(
+        RunJob(
+            run_id=run_id,
+            thread_id=thread_id,
+            kind="run",
+            lane=lane,
+            factory=lambda: run_with_ws(
+                thread_id=thread_id,
+                input_text=input_text,
+                require_human_approval=require_human_approval,
+                run_id=run_id,
+                deadline_seconds=deadline_seconds,
+            ),
+        ),
+        rollback=lambda: delete_run(run_id),
+    )
+    return run_id, fut
+
+
+async def schedule_resume(
+    thread_id: str,
+    run_id: str,
+    approved: bool,
+    edited_text: str | None = None,
+    feedback: str | None = None,
+    lane: str = INTERACTIVE,
+    deadline_seconds: float | None = None,
+) -> asyncio.Future:
+    from app.services.runner import resume_with_ws
+
+    # claim the halted run so a second approve gets 409 instead of a duplicate resume
+    await asyncio.to_thread(set_run_status, run_id, "RUNNING")
+    return await _submit(
+        RunJob(
+            run_id=run_id,
+            thread_id=thread_id,
+            kind="resume",
+            lane=lane,
+            factory=lambda: resume_with_ws(
+                thread_id=thread_id,
+                run_id=run_id,
+                approved=approved,
+                edited_text=edited_text,
+                feedback=feedback,
+                deadline_seconds=deadline_seconds,
+            ),
+        ),
+        rollback=lambda: set_run_status(run_id, "HALTED"),
+    )
+
+
+async def schedule_continue(
+    thread_id: str,
+    run_id: str,
+    lane: str = INTERACTIVE,
+    deadline_seconds: float | None = None,
+) -> asyncio.Future:
+    from app.services.runner import continue_with_ws
+
+    await asyncio.to_thread(set_run_status, run_id, "RUNNING")
+    return await _submit(
+        RunJob(
+            run_id=run_id,
+            thread_id=thread_id,
+            kind="continue",
+            lane=lane,
+            factory=lambda: continue_with_ws(thread_id=thread_id, run_id=run_id, deadline_seconds=deadline_seconds),
+        ),
+        rollback=lambda: set_run_status(run_id, "CANCELLED"),
+    )
+
+
+async def dispatch_run(
+    thread_id: str,
+    input_text: str,
+    require_human_approval: bool,
+    lane: str = INTERACTIVE,
+    deadline_seconds: float | None = None,
+) -> str:
+    """
+    Background variant: schedules on the in-process lanes ("local") or as a claimable row
+    for `python -m app.worker` ("postgres"). Returns the run_id without waiting.
+    """
+    if _queue_backend() == "postgres":
+        return await asyncio.to_thread(
+            enqueue_run,
+            thread_id=thread_id,
+            input_text=input_text,
+            require_human_approval=require_human_approval,
+            deadline_seconds=deadline_seconds,
+        )
+
+    run_id, _ = await schedule_run(
+        thread_id, input_text, require_human_approval, lane=lane, deadline_seconds=deadline_seconds
+    )
+    return run_id
+
+
+async def dispatch_resume(
+    thread_id: str,
+    run_id: str,
+    approved: bool,
+    edited_text: str | None = None,
+    feedback: str | None = None,
+    lane: str = INTERACTIVE,
+    deadline_seconds: float | None = None,
+) -> None:
+    if _queue_backend() == "postgres":
+        await asyncio.to_thread(
+            enqueue_resume,
+            run_id,
+            approved=approved,
+            edited_text=edited_text,
+            feedback=feedback,
+            deadline_seconds=deadline_seconds,
+        )
+        return
+
+    await schedule_resume(
+        thread_id,
+        run_id,
+        approved,
+        edited_text=edited_text,
+        feedback=feedback,
+        lane=lane,
+        deadline_seconds=deadline_seconds,
+    )
+
+
+async def dispatch_continue(
+    thread_id: str,
+    run_id: str,
+    lane: str = INTERACTIVE,
+    deadline_seconds: float | None = None,
+) -> None:
+    if _queue_backend() == "postgres":
+        await asyncio.to_thread(enqueue_continue, run_id, deadline_seconds=deadline_seconds)
+        return
+
+    await schedule_continue(thread_id, run_id, lane=lane, deadline_seconds=deadline_seconds)
+
+
+async def cancel_run(run_id: str) -> str | None:
+    """
+    Returns "CANCELLED" when the run never started (dropped from the queue), "CANCELLING" when the
+    process driving it will abort it and mark the row CANCELLED, or None if the run isn't RUNNING.
+    DB writes go through a thread; the task and future cancellation stays on the event loop.
+    """
+    if await asyncio.to_thread(request_cancel, run_id) is None:
+        return None
+
+    # executing in this process: abort the in-flight node now
+    if run_controls.cancel(run_id):
+        return "CANCELLING"
+
+    # still queued here, or queued in postgres and not yet claimed
+    if run_scheduler.cancel_queued(run_id) is not None:
+        await asyncio.to_thread(_record_queued_cancel, run_id)
+        return "CANCELLED"
+    if _queue_backend() == "postgres" and await asyncio.to_thread(cancel_unclaimed_run, run_id):
+        await asyncio.to_thread(log_event, run_id, "run_cancelled", payload={"reason": "cancelled", "queued": True})
+        return "CANCELLED"
+
+    # running or queued in another API process or an app.worker; both poll cancel_requested_at
+    return "CANCELLING"
+
+
+def _record_queued_cancel(run_id: str) -> None:
+    set_run_status(run_id, "CANCELLED")
+    log_event(run_id, "run_cancelled", payload={"reason": "cancelled", "queued": True})
+
+
+async def watch_cancellations() -> None:
+    """
+    API-process twin of app.worker's cancel watch: POST /runs/{id}/cancel may be served by another replica,
+    which can only set cancel_requested_at. Every RUN_CANCEL_POLL_SECONDS the runs executing or queued in
+    this process are checked, one query per tick, and the flagged ones are cancelled here.
+    """
+    interval = get_settings().RUN_CANCEL_POLL_SECONDS
+    while True:
+        await asyncio.sleep(interval)
+        mine = run_controls.tracked() + run_scheduler.queued_run_ids()
+        if not mine:
+            continue
+        try:
+            flagged = await asyncio.to_thread(cancel_requested_among, mine)
+            for run_id in flagged:
+                if run_controls.cancel(run_id):
+                    continue
+                # dropping the job resolves its future, so that part stays on the loop
+                if run_scheduler.cancel_queued(run_id) is not None:
+                    await asyncio.to_thread(_record_queued_cancel, run_id)
+        except Exception:
+            logger.warning("cancel watch: can't check for cancel requests", exc_info=True)
@@ -1,42 +1,478 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
 
-from openai import OpenAI
+import httpx
+import openai
+import orjson
+from openai import AsyncOpenAI, OpenAI
 
 from app.core.config import get_settings
+from app.services.llm_cache import cache_key, llm_cache
+from app.services.llm_fake import FakeProvider
+from app.services.llm_provider import Completion, LLMProvider
+from app.services.llm_rate_limit import estimate_tokens, rate_limiter
+from app.services.llm_resilience import LLMUnavailable, backoff_delay, is_retryable, node_timeout, resilience
+from app.services.llm_usage import record as record_llm_call
 
 
+TEMPERATURE = 0.4
+
 _client: OpenAI | None = None
+_async_client: AsyncOpenAI | None = None
+_async_http: httpx.AsyncClient | None = None
+_fake: FakeProvider | None = None
+
+# traffic through the shared async pool (the sync client only serves the GRAPH_EXECUTION_MODE=sync path).
+# requests counts HTTP attempts, so retries and hedges show up; in_flight counts chat_json_async calls
+_pool_counters = {"requests": 0, "errors": 0, "in_flight": 0}
+
+
+def _limits() -> httpx.Limits:
+    s = get_settings()
+    return httpx.Limits(
+        max_connections=s.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=s.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=s.LLM_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def _timeout(read: float | None = None) -> httpx.Timeout:
+    s = get_settings()
+    return httpx.Timeout(
+        read if read is not None else s.LLM_TIMEOUT_SECONDS,
+        connect=s.LLM_CONNECT_TIMEOUT_SECONDS,
+        pool=s.LLM_POOL_TIMEOUT_SECONDS,
+    )
+
+
+def _api_key() -> str:
+    s = get_settings()
+    if not s.OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY is missing in environment/.env")
+    return s.OPENAI_API_KEY
 
 
 def get_openai_client() -> OpenAI:
     global _client
     if _client is None:
-        s = get_settings()
-        if not s.OPENAI_API_KEY:
-            raise RuntimeError("OPENAI_API_KEY is missing in environment/.env")
-        _client = OpenAI(api_key=s.OPENAI_API_KEY)
+        http = httpx.Client(limits=_limits(), timeout=_timeout(), http2=get_settings().LLM_HTTP2)
+        _client = OpenAI(api_key=_api_key(), base_url=get_settings().OPENAI_BASE_URL, http_client=http, max_retries=0)
     return _client
 
 
-def chat_json(system: str, user: str, *, model: Optional[str] = None) -> Dict[str, Any]:
+async def _on_request(request: httpx.Request) -> None:
+    _pool_counters["requests"] += 1
+
+
+async def _on_response(response: httpx.Response) -> None:
+    if response.status_code >= 400:
+        _pool_counters["errors"] += 1
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    One AsyncOpenAI over one httpx pool for the whole process, so concurrent runs share warm
+    (keep-alive, optionally HTTP/2-multiplexed) connections. Sized by the LLM_* pool settings.
+    """
+    global _async_client, _async_http
+    if _async_client is None:
+        _async_http = httpx.AsyncClient(
+            limits=_limits(),
+            timeout=_timeout(),
+            http2=get_settings().LLM_HTTP2,
+            event_hooks={"request": [_on_request], "response": [_on_response]},
+        )
+        # retries are ours (chat_json_async), not the SDK's; the pool only bounds and reuses connections
+        _async_client = AsyncOpenAI(
+            api_key=_api_key(), base_url=get_settings().OPENAI_BASE_URL, http_client=_async_http, max_retries=0
+        )
+    return _async_client
+
+
+async def close_llm_clients() -> None:
+    # app shutdown: drop pooled connections (they belong to the closing event loop)
+    global _async_client, _async_http, _fake
+    if _async_http is not None:
+        await _async_http.aclose()
+    _async_client = None
+    _async_http = None
+    _fake = None
+
+
+def _messages(system: str, user: str) -> list:
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+
+
+class OpenAIProvider:
+    """
+    LLMProvider over the OpenAI chat completions API in JSON mode, through the shared client pools.
+    """
+
+    name = "openai"
+
+    def complete_json_sync(self, *, model: str, system: str, user: str, temperature: float, timeout: Any) -> Completion:
+        resp = get_openai_client().chat.completions.create(
+            model=model,
+            messages=_messages(system, user),
+            response_format={"type": "json_object"},
+            temperature=temperature,
+            timeout=timeout,
+        )
+        return Completion(content=resp.choices[0].message.content or "{}", usage=getattr(resp, "usage", None))
+
+    async def complete_json(self, *, model: str, system: str, user: str, temperature: float, timeout: Any) -> Completion:
+        resp = await get_async_openai_client().chat.completions.create(
+            model=model,
+            messages=_messages(system, user),
+            response_format={"type": "json_object"},
+            temperature=temperature,
+            timeout=timeout,
+        )
+        return Completion(content=resp.choices[0].message.content or "{}", usage=getattr(resp, "usage", None))
+
+    async def stream_json(
+        self,
+        *,
+        model: str,
+        system: str,
+        user: str,
+        temperature: float,
+        timeout: Any,
+        on_text: Callable[[str], Awaitable[None]],
+    ) -> Completion:
+        stream = await get_async_openai_client().chat.completions.create(
+            model=model,
+            messages=_messages(system, user),
+            response_format={"type": "json_object"},
+            temperature=temperature,
+            timeout=timeout,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        parts: list[str] = []
+        usage = None
+        async for chunk in stream:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                parts.append(text)
+                await on_text(text)
+        return Completion(content="".join(parts) or "{}", usage=usage)
+
+    def stats(self) -> dict:
+        return {}
+
+
+_openai = OpenAIProvider()
+
+
+def get_provider() -> LLMProvider:
+    """
+    The LLMProvider selected by LLM_PROVIDER ("openai" or "fake").
+    """
+    global _fake
+    provider = get_settings().LLM_PROVIDER.strip().lower()
+    if provider == "openai":
+        return _openai
+    if provider == "fake":
+        if _fake is None:
+            _fake = FakeProvider()
+        return _fake
+    raise ValueError(f"Unsupported LLM_PROVIDER={get_settings().LLM_PROVIDER!r} (use 'openai' or 'fake')")
+
+
+def pool_stats() -> dict:
     """
-    Returns a JSON object by using OpenAI structured output via response_format.
+    /metrics view of the shared async pool: configured limits, request counters, and connection states
+    (read from httpcore's pool; empty until the first request).
+    """
+    s = get_settings()
+    connections = {"open": 0, "idle": 0, "active": 0}
+    pool = getattr(getattr(_async_http, "_transport", None), "_pool", None)
+    for conn in getattr(pool, "connections", ()):
+        connections["open"] += 1
+        connections["idle" if conn.is_idle() else "active"] += 1
+    return {
+        "provider": s.LLM_PROVIDER,
+        "max_connections": s.LLM_MAX_CONNECTIONS,
+        "max_keepalive_connections": s.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        "http2": s.LLM_HTTP2,
+        "in_flight": _pool_counters["in_flight"],
+        "requests_total": _pool_counters["requests"],
+        "http_errors_total": _pool_counters["errors"],
+        "connections": connections,
+        **({"fake": _fake.stats()} if _fake is not None else {}),
+    }
+
+
+def _on_failure(exc: Exception, breaker, attempt: int, attempts: int) -> None:
+    """
+    Bookkeeping for a failed attempt; raises when there is nothing left to retry.
+    """
+    if not is_retryable(exc):
+        breaker.record_success()  # a bad request or auth error isn't an outage
+        raise exc
+    breaker.record_failure()
+    if isinstance(exc, openai.APITimeoutError):
+        resilience.counters["timeouts"] += 1
+    if attempt == attempts - 1:
+        resilience.counters["unavailable"] += 1
+        raise LLMUnavailable(f"LLM call failed after {attempts} attempt(s): {exc}") from exc
+    resilience.counters["retries"] += 1
+
+
+def _before_attempt(breaker) -> None:
+    try:
+        breaker.before_call()
+    except LLMUnavailable:
+        resilience.counters["short_circuited"] += 1
+        raise
+
+
+async def _hedged(node: str | None, call: Callable[..., Awaitable[Any]]) -> Any:
+    """
+    Runs call(); with LLM_HEDGE on, a second identical call starts once the first has taken the node's
+    recent p95, and whichever succeeds first wins (the other is cancelled).
+    """
+    delay = resilience.hedge_delay(node)
+    if delay is None:
+        return await call()
+    tasks = {asyncio.ensure_future(call())}
+    hedge = None
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            resilience.counters["hedged"] += 1
+            hedge = asyncio.ensure_future(call(hedge=True))
+            tasks.add(hedge)
+        error: BaseException | None = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    if t is hedge:
+                        resilience.counters["hedge_wins"] += 1
+                    return t.result()
+                error = t.exception()
+        raise error
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+
+
+def _outcome(exc: BaseException) -> str:
+    if isinstance(exc, LLMUnavailable):
+        return "unavailable"
+    return "cancelled" if isinstance(exc, asyncio.CancelledError) else "error"
+
+
+def chat_json(system: str, user: str, *, model: Optional[str] = None, node: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Returns a JSON object from the LLM_PROVIDER provider (JSON mode; OpenAI: response_format=json_object).
+    node: the calling graph node; nodes listed in LLM_CACHE_NODES are answered from llm_cache when possible.
+    Inside a run (llm_usage.track_run) the call is recorded in run_llm_calls.
     """
     s = get_settings()
-    client = get_openai_client()
     m = model or s.OPENAI_MODEL
+    called_at = time.monotonic()
+    key = cache_key(m, system, user, TEMPERATURE) if llm_cache.enabled_for(node) else None
+    if key is not None:
+        hit = llm_cache.get(key)
+        if hit is not None:
+            record_llm_call(node=node, model=m, started=called_at, outcome="cached")
+            return hit
 
-    resp = client.chat.completions.create(
-        model=m,
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
-        response_format={"type": "json_object"},
-        temperature=0.4,
-    )
-    content = resp.choices[0].message.content or "{}"
-    import json
-    return json.loads(content)
+    provider = get_provider()
+    breaker = resilience.breaker(m)
+    timeout = _timeout(node_timeout(node))
+    attempts = 1 + max(0, s.LLM_MAX_RETRIES)
+    estimate = estimate_tokens(system, user)
+    attempt = 0
+    try:
+        for attempt in range(attempts):
+            _before_attempt(breaker)
+            reserved = rate_limiter.acquire_sync(m, estimate)
+            started = time.monotonic()
+            error: Exception | None = None
+            used: int | None = 0
+            try:
+                resp = provider.complete_json_sync(
+                    model=m, system=system, user=user, temperature=TEMPERATURE, timeout=timeout
+                )
+                used = resp.total_tokens
+            except Exception as e:
+                error = e
+            finally:
+                # the attempt's actual usage; a failed one hands its whole reservation back
+                rate_limiter.settle(m, reserved, used)
+            if error is not None:
+                _on_failure(error, breaker, attempt, attempts)
+                time.sleep(backoff_delay(attempt, error))
+                continue
+            breaker.record_success()
+            resilience.observe(node, time.monotonic() - started)
+            break
+    except BaseException as e:
+        record_llm_call(node=node, model=m, started=called_at, outcome=_outcome(e), retries=attempt)
+        raise
+    record_llm_call(node=node, model=m, started=called_at, outcome="ok", usage=resp.usage, retries=attempt)
+    result = orjson.loads(resp.content)
+    if key is not None and isinstance(result, dict):
+        llm_cache.put(key, result)
+    return result
+
+
+async def chat_json_async(
+    system: str, user: str, *, model: Optional[str] = None, node: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Async twin of chat_json: awaits the request so the event loop keeps serving
+    other runs, REST calls and WebSocket traffic while the LLM responds.
+
+    Each attempt is bounded by the node's timeout (LLM_NODE_TIMEOUTS); timeouts, 5xx, 429 and
+    connection errors are retried up to LLM_MAX_RETRIES times with jittered backoff, then raise
+    LLMUnavailable, as does an open circuit breaker. Optionally hedged (LLM_HEDGE).
+    """
+    s = get_settings()
+    m = model or s.OPENAI_MODEL
+    called_at = time.monotonic()
+    key = cache_key(m, system, user, TEMPERATURE) if llm_cache.enabled_for(node) else None
+    if key is not None:
+        hit = await llm_cache.aget(key)
+        if hit is not None:
+            record_llm_call(node=node, model=m, started=called_at, outcome="cached")
+            return hit
+
+    provider = get_provider()
+    breaker = resilience.breaker(m)
+    timeout = _timeout(node_timeout(node))
+    attempts = 1 + max(0, s.LLM_MAX_RETRIES)
+
+    estimate = estimate_tokens(system, user)
+
+    async def call(hedge: bool = False) -> Completion:
+        if hedge:  # a hedge is a real request against the budget too
+            await rate_limiter.acquire(m, estimate)
+        return await provider.complete_json(model=m, system=system, user=user, temperature=TEMPERATURE, timeout=timeout)
+
+    attempt = 0
+    try:
+        for attempt in range(attempts):
+            _before_attempt(breaker)
+            try:
+                reserved = await rate_limiter.acquire(m, estimate)
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            started = time.monotonic()
+            error: Exception | None = None
+            used: int | None = 0
+            _pool_counters["in_flight"] += 1
+            try:
+                resp = await _hedged(node, call)
+                used = resp.total_tokens
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                error = e
+            finally:
+                _pool_counters["in_flight"] -= 1
+                # the attempt's actual usage; a failed or cancelled one hands its whole reservation back
+                await rate_limiter.asettle(m, reserved, used)
+            if error is not None:
+                _on_failure(error, breaker, attempt, attempts)
+                await asyncio.sleep(backoff_delay(attempt, error))
+                continue
+            breaker.record_success()
+            resilience.observe(node, time.monotonic() - started)
+            break
+    except BaseException as e:
+        record_llm_call(node=node, model=m, started=called_at, outcome=_outcome(e), retries=attempt)
+        raise
+    record_llm_call(node=node, model=m, started=called_at, outcome="ok", usage=resp.usage, retries=attempt)
+    result = orjson.loads(resp.content)
+    if key is not None and isinstance(result, dict):
+        await llm_cache.aput(key, result)
+    return result
+
+
+async def chat_json_stream_async(
+    system: str,
+    user: str,
+    *,
+    on_text: Callable[[str], Awaitable[None]],
+    on_fallback: Callable[[], Awaitable[None]] | None = None,
+    model: Optional[str] = None,
+    node: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    chat_json_async over the provider's streaming API: on_text gets each raw content chunk as it
+    arrives, and the parsed object is returned once the stream ends. Never cached or hedged.
+
+    One streamed attempt; if it fails for any reason but a cancel, the call is retried through
+    chat_json_async (retries, breaker, LLMUnavailable), and that result is returned. on_fallback is
+    awaited first, so the caller can discard what on_text already got.
+    """
+    s = get_settings()
+    m = model or s.OPENAI_MODEL
+    called_at = time.monotonic()
+    provider = get_provider()
+    breaker = resilience.breaker(m)
+    _before_attempt(breaker)
+    try:
+        reserved = await rate_limiter.acquire(m, estimate_tokens(system, user))
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+
+    started = time.monotonic()
+    resp: Completion | None = None
+    error: Exception | None = None
+    _pool_counters["in_flight"] += 1
+    try:
+        resp = await provider.stream_json(
+            model=m,
+            system=system,
+            user=user,
+            temperature=TEMPERATURE,
+            timeout=_timeout(node_timeout(node)),
+            on_text=on_text,
+        )
+        result = orjson.loads(resp.content)
+    except asyncio.CancelledError:
+        breaker.release()
+        record_llm_call(node=node, model=m, started=called_at, outcome="cancelled")
+        raise
+    except Exception as e:
+        error = e
+    finally:
+        _pool_counters["in_flight"] -= 1
+        # settled before any fallback, which reserves for itself
+        await rate_limiter.asettle(m, reserved, resp.total_tokens if resp is not None else 0)
+
+    if error is not None:
+        if is_retryable(error):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        record_llm_call(
+            node=node, model=m, started=called_at, outcome="error", usage=resp.usage if resp is not None else None
+        )
+        if on_fallback is not None:
+            await on_fallback()
+        return await chat_json_async(system, user, model=m, node=node)
+
+    breaker.record_success()
+    resilience.observe(node, time.monotonic() - started)
+    record_llm_call(node=node, model=m, started=called_at, outcome="ok", usage=resp.usage)
+    return result
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Protocol, Tuple
+
+import orjson
+
+from app.core.config import get_settings
+from app.persistence.db import advisory_lock, exec_sql, fetch_one
+
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+  key TEXT PRIMARY KEY,
+  response TEXT NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  expires_at TIMESTAMPTZ NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_expires_at ON llm_cache (expires_at);
+"""
+
+# expired rows are deleted every this many writes
+_PRUNE_EVERY = 200
+
+
+def cache_key(model: str, system: str, user: str, temperature: float) -> str:
+    return hashlib.sha256(orjson.dumps([model, system, user, temperature])).hexdigest()
+
+
+class _Tier(Protocol):
+    name: str
+
+    def get(self, key: str) -> bytes | None: ...
+
+    def put(self, key: str, data: bytes, ttl: float) -> None: ...
+
+
+class PostgresCacheTier:
+    """
+    `llm_cache` rows on DATABASE_URL, shared by every API replica / worker.
+    """
+
+    name = "postgres"
+
+    def __init__(self) -> None:
+        self._ready = False
+        self._writes = 0
+
+    def _ensure_table(self) -> None:
+        if not self._ready:
+            with advisory_lock():
+                exec_sql(LLM_CACHE_TABLE_SQL)
+            self._ready = True
+
+    def get(self, key: str) -> bytes | None:
+        self._ensure_table()
+        row = fetch_one("SELECT response FROM llm_cache WHERE key=%s AND expires_at > now()", [key])
+        return row["response"].encode("utf-8") if row else None
+
+    def put(self, key: str, data: bytes, ttl: float) -> None:
+        self._ensure_table()
+        exec_sql(
+            """
+            INSERT INTO llm_cache (key, response, expires_at)
+            VALUES (%s, %s, now() + make_interval(secs => %s))
+            ON CONFLICT (key) DO UPDATE
+              SET response=EXCLUDED.response, created_at=now(), expires_at=EXCLUDED.expires_at
+            """,
+            [key, data.decode("utf-8"), ttl],
+        )
+        self._writes += 1
+        if self._writes % _PRUNE_EVERY == 0:
+            exec_sql("DELETE FROM llm_cache WHERE expires_at <= now()")
+
+
+class SqliteCacheTier:
+    """
+    A local SQLite file (LLM_CACHE_SQLITE_PATH): survives restarts of a single-node deployment.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, response BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT response FROM llm_cache WHERE key=? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def put(self, key: str, data: bytes, ttl: float) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, expires_at) VALUES (?, ?, ?)",
+                (key, data, time.time() + ttl),
+            )
+            self._writes += 1
+            if self._writes % _PRUNE_EVERY == 0:
+                db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+            db.commit()
+
+
+def make_tier() -> _Tier | None:
+    s = get_settings()
+    backend = s.LLM_CACHE_BACKEND.strip().lower()
+    if backend in ("none", "memory"):
+        return None
+    if backend == "postgres":
+        return PostgresCacheTier()
+    if backend == "sqlite":
+        return SqliteCacheTier(s.LLM_CACHE_SQLITE_PATH)
+    raise ValueError(f"Unsupported LLM_CACHE_BACKEND={s.LLM_CACHE_BACKEND!r} (use 'none', 'memory', 'postgres' or 'sqlite')")
+
+
+class LLMResponseCache:
+    """
+    chat_json responses by cache_key(model, system, user, temperature), for the nodes listed in
+    LLM_CACHE_NODES. Tier 1 is an in-process LRU (LLM_CACHE_MAX_ENTRIES); tier 2, if LLM_CACHE_BACKEND
+    names one, is a shared table. Both expire entries after LLM_CACHE_TTL_SECONDS.
+
+    Entries are stored encoded, so every hit is a fresh dict a node may mutate. A failing tier 2 is
+    logged and treated as a miss; the cache never fails an LLM call.
+    """
+
+    def __init__(self) -> None:
+        s = get_settings()
+        self.enabled = s.LLM_CACHE_BACKEND.strip().lower() != "none"
+        self.nodes = frozenset(n.strip() for n in s.LLM_CACHE_NODES.split(",") if n.strip())
+        self.max_entries = max(1, s.LLM_CACHE_MAX_ENTRIES)
+        self.ttl = s.LLM_CACHE_TTL_SECONDS
+        self._lru: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._tier = make_tier() if self.enabled else None
+        self.counters: Dict[str, int] = {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "writes": 0, "errors": 0}
+
+    def enabled_for(self, node: str | None) -> bool:
+        return self.enabled and node is not None and node in self.nodes
+
+    def _lru_get(self, key: str) -> Dict[str, Any] | None:
+        entry = self._lru.get(key)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at <= time.monotonic():
+            del self._lru[key]
+            return None
+        self._lru.move_to_end(key)
+        self.counters["memory_hits"] += 1
+        return orjson.loads(data)
+
+    def _lru_put(self, key: str, data: bytes) -> None:
+        self._lru[key] = (time.monotonic() + self.ttl, data)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def _from_tier(self, key: str, data: bytes | None) -> Dict[str, Any] | None:
+        if data is None:
+            self.counters["misses"] += 1
+            return None
+        self.counters["persistent_hits"] += 1
+        self._lru_put(key, data)
+        return orjson.loads(data)
+
+    def get(self, key: str) -> Dict[str, Any] | None:
+        hit = self._lru_get(key)
+        if hit is not None:
+            return hit
+        data = None
+        if self._tier is not None:
+            try:
+                data = self._tier.get(key)
+            except Exception:
+                self.counters["errors"] += 1
+                logger.warning("llm cache: %s lookup failed", self._tier.name, exc_info=True)
+        return self._from_tier(key, data)
+
+    async def aget(self, key: str) -> Dict[str, Any] | None:
+        hit = self._lru_get(key)
+        if hit is not None:
+            return hit
+        data = None
+        if self._tier is not None:
+            try:
+                data = await asyncio.to_thread(self._tier.get, key)
+            except Exception:
+                self.counters["errors"] += 1
+                logger.warning("llm cache: %s lookup failed", self._tier.name, exc_info=True)
+        return self._from_tier(key, data)
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        data = orjson.dumps(value)
+        self._lru_put(key, data)
+        self.counters["writes"] += 1
+        if self._tier is not None:
+            try:
+                self._tier.put(key, data, self.ttl)
+            except Exception:
+                self.counters["errors"] += 1
+                logger.warning("llm cache: %s write failed", self._tier.name, exc_info=True)
+
+    async def aput(self, key: str, value: Dict[str, Any]) -> None:
+        data = orjson.dumps(value)
+        self._lru_put(key, data)
+        self.counters["writes"] += 1
+        if self._tier is not None:
+            try:
+                await asyncio.to_thread(self._tier.put, key, data, self.ttl)
+            except Exception:
+                self.counters["errors"] += 1
+                logger.warning("llm cache: %s write failed", self._tier.name, exc_info=True)
+
+    def stats(self) -> dict:
+        hits = self.counters["memory_hits"] + self.counters["persistent_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            "backend": self._tier.name if self._tier is not None else ("memory" if self.enabled else "none"),
+            "nodes": sorted(self.nodes),
+            "entries": len(self._lru),
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            **{f"{k}_total": v for k, v in self.counters.items()},
+        }
+
+
+llm_cache = LLMResponseCache()
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import math
+import random
+import re
+import time
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, List, Tuple
+
+import httpx
+import openai
+import orjson
+
+from app.core.config import get_settings
+from app.services.llm_provider import Completion
+
+
+# which prompt is which, by the JSON shape each node's user prompt asks for
+_KINDS = (
+    ("drafter", "{markdown: string, data: object}"),
+    ("safety", "{safety_pass: bool"),
+    ("critic", "{quality_pass: bool"),
+    ("supervisor", "{action: 'finalize'|'revise'"),
+    ("intent_guard", "{relevant: boolean"),
+)
+
+_REQUEST = re.compile(r"(?:User request|Request):\n(.*?)(?:\n\n|$)", re.S)
+_ITERATION = re.compile(r"^Iteration: (\d+)$", re.M)
+_FAKE_URL = "http://fake-llm.invalid/v1/chat/completions"
+
+
+def _kind(user: str) -> str:
+    for kind, marker in _KINDS:
+        if marker in user:
+            return kind
+    return "other"
+
+
+def _digest(*parts: str) -> int:
+    h = hashlib.blake2b("\x00".join(parts).encode("utf-8"), digest_size=8)
+    return int.from_bytes(h.digest(), "big")
+
+
+def _title(request: str) -> str:
+    words = re.findall(r"[\w'’-]+", request)[:6]
+    return " ".join(words).capitalize() or "CBT Exercise"
+
+
+def _draft(request: str, iteration: int) -> dict:
+    title = _title(request)
+    steps = [
+        "Notice the situation and write down the automatic thought.",
+        "Rate how strongly you believe it (0–100%).",
+        "List the evidence for and against the thought.",
+        "Write a balanced alternative thought.",
+        "Pick one small action to try this week.",
+    ]
+    prompts = ["What emotion was strongest, and why?", "What would you tell a friend in this situation?"]
+    safety_note = "If you feel unsafe or at risk of harm, seek immediate local help."
+    markdown = (
+        f"# {title}\n\n"
+        f"## Goal\n- Practise a short CBT exercise for: {request.strip() or 'everyday stress'}.\n\n"
+        "## Steps\n" + "".join(f"{i}. {s}\n" for i, s in enumerate(steps, 1)) + "\n"
+        "## Reflection prompts\n" + "".join(f"- {p}\n" for p in prompts) + "\n"
+        f"## Safety note\n{safety_note}\n\n"
+        f"_Draft revision {iteration}._\n"
+    )
+    data = {
+        "title": title,
+        "goal": f"Practise a short CBT exercise for: {request.strip() or 'everyday stress'}.",
+        "steps": steps,
+        "reflection_prompts": prompts,
+        "safety_note": safety_note,
+    }
+    return {"markdown": markdown, "data": data}
+
+
+def fake_response(system: str, user: str) -> dict:
+    """
+    A schema-valid answer for each node's prompt, a pure function of (system, user). Reviews fail
+    for LLM_FAKE_REVISE_RATE of drafts (by prompt hash), which sends the graph round a revision loop.
+    """
+    kind = _kind(user)
+    m = _REQUEST.search(user)
+    request = m.group(1).strip() if m else ""
+    failed = (_digest(system, user) % 10_000) / 10_000 < get_settings().LLM_FAKE_REVISE_RATE
+    if kind == "drafter":
+        it = _ITERATION.search(user)
+        return _draft(request, int(it.group(1)) if it else 1)
+    if kind == "safety":
+        if failed:
+            return {
+                "safety_pass": False,
+                "safety_score": 0.55,
+                "flags": ["needs_crisis_resources"],
+                "required_changes": ["Add where to get urgent help."],
+                "safety_note": "Point to crisis resources more clearly.",
+            }
+        return {"safety_pass": True, "safety_score": 0.95, "flags": [], "required_changes": [], "safety_note": ""}
+    if kind == "critic":
+        if failed:
+            return {
+                "quality_pass": False,
+                "quality_score": 0.6,
+                "issues": ["Steps are generic."],
+                "suggestions": ["Tie each step to the user's situation."],
+            }
+        return {"quality_pass": True, "quality_score": 0.9, "issues": [], "suggestions": []}
+    if kind == "supervisor":
+        return {"action": "revise", "rationale": "Address the review feedback."}
+    if kind == "intent_guard":
+        return {"relevant": True, "reason": "fake provider"}
+    return {}
+
+
+def _distribution(spec: str) -> Tuple[str, List[float]]:
+    name, *args = spec.strip().split(":")
+    if name not in ("fixed", "uniform", "lognormal") or len(args) != (1 if name == "fixed" else 2):
+        raise ValueError(
+            f"Unsupported LLM_FAKE_LATENCY entry {spec!r} "
+            "(use 'fixed:MS', 'uniform:MIN_MS:MAX_MS' or 'lognormal:MEDIAN_MS:SIGMA')"
+        )
+    return name, [float(a) for a in args]
+
+
+def latency_for(kind: str, rng: random.Random) -> float:
+    """
+    Seconds for one fake completion. LLM_FAKE_LATENCY: "default=lognormal:800:0.5,drafter=lognormal:3000:0.4".
+    """
+    specs = {}
+    for item in get_settings().LLM_FAKE_LATENCY.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            specs[name.strip()] = value
+    spec = specs.get(kind) or specs.get("default") or "fixed:0"
+    name, args = _distribution(spec)
+    if name == "fixed":
+        ms = args[0]
+    elif name == "uniform":
+        ms = rng.uniform(args[0], args[1])
+    else:
+        ms = args[0] * math.exp(rng.gauss(0.0, args[1]))
+    return max(0.0, ms) / 1000
+
+
+def _usage(user: str, system: str, content: str) -> SimpleNamespace:
+    prompt, completion = (len(system) + len(user)) // 4 + 8, len(content) // 4 + 1
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion, total_tokens=prompt + completion)
+
+
+def _read_timeout(timeout: Any) -> float:
+    if isinstance(timeout, httpx.Timeout):
+        return timeout.read if timeout.read is not None else get_settings().LLM_TIMEOUT_SECONDS
+    return float(timeout) if timeout is not None else get_settings().LLM_TIMEOUT_SECONDS
+
+
+class FakeProvider:
+    """
+    Offline LLMProvider (LLM_PROVIDER=fake) for tests, benchmarks and profiling without a key or network.
+    Answers are deterministic per prompt (fake_response); latency (LLM_FAKE_LATENCY) and injected failures
+    (LLM_FAKE_ERROR_RATE: 503s, LLM_FAKE_TIMEOUT_RATE: stalls until the request timeout) come from one RNG
+    seeded with LLM_FAKE_SEED. Failures are the openai errors a real request would raise.
+    """
+
+    name = "fake"
+
+    def __init__(self) -> None:
+        self.rng = random.Random(get_settings().LLM_FAKE_SEED)
+        self.counters = {"requests": 0, "errors": 0, "timeouts": 0}
+
+    def plan(self, user: str, timeout: Any) -> Tuple[float, str | None]:
+        """
+        (delay seconds, failure) for one request; failure is None | "error" | "timeout".
+        """
+        s = get_settings()
+        self.counters["requests"] += 1
+        roll = self.rng.random()
+        if roll < s.LLM_FAKE_TIMEOUT_RATE:
+            self.counters["timeouts"] += 1
+            return _read_timeout(timeout), "timeout"
+        delay = latency_for(_kind(user), self.rng)
+        if roll < s.LLM_FAKE_TIMEOUT_RATE + s.LLM_FAKE_ERROR_RATE:
+            self.counters["errors"] += 1
+            return delay, "error"
+        return delay, None
+
+    @staticmethod
+    def failure(kind: str) -> Exception:
+        request = httpx.Request("POST", _FAKE_URL)
+        if kind == "timeout":
+            return openai.APITimeoutError(request=request)
+        response = httpx.Response(503, request=request)
+        return openai.InternalServerError("fake provider: injected 503", response=response, body=None)
+
+    @staticmethod
+    def completion(system: str, user: str) -> Completion:
+        content = orjson.dumps(fake_response(system, user)).decode()
+        return Completion(content=content, usage=_usage(user, system, content))
+
+    def complete_json_sync(self, *, model: str, system: str, user: str, temperature: float, timeout: Any) -> Completion:
+        delay, failure = self.plan(user, timeout)
+        time.sleep(delay)
+        if failure is not None:
+            raise self.failure(failure)
+        return self.completion(system, user)
+
+    async def complete_json(self, *, model: str, system: str, user: str, temperature: float, timeout: Any) -> Completion:
+        delay, failure = self.plan(user, timeout)
+        await asyncio.sleep(delay)
+        if failure is not None:
+            raise self.failure(failure)
+        return self.completion(system, user)
+
+    async def stream_json(
+        self,
+        *,
+        model: str,
+        system: str,
+        user: str,
+        temperature: float,
+        timeout: Any,
+        on_text: Callable[[str], Awaitable[None]],
+    ) -> Completion:
+        delay, failure = self.plan(user, timeout)
+        if failure is not None:
+            await asyncio.sleep(delay)
+            raise self.failure(failure)
+        # the latency is spread over the chunks, so the first token arrives early as with a real stream
+        resp = self.completion(system, user)
+        parts = _chunks(resp.content)
+        for part in parts:
+            await asyncio.sleep(delay / len(parts))
+            await on_text(part)
+        return resp
+
+    def stats(self) -> dict:
+        return dict(self.counters)
+
+
+def _chunks(content: str) -> List[str]:
+    n = max(1, get_settings().LLM_FAKE_STREAM_CHUNK_CHARS)
+    return [content[i : i + n] for i in range(0, len(content), n)] or [""]
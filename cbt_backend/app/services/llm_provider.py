@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Protocol
+
+
+@dataclass(slots=True)
+class Completion:
+    """
+    One JSON-mode answer: the raw content, and the provider's usage (prompt_tokens, completion_tokens,
+    total_tokens attributes) when it reports one.
+    """
+    content: str
+    usage: Any = None
+
+    @property
+    def total_tokens(self) -> int | None:
+        return getattr(self.usage, "total_tokens", None)
+
+
+class LLMProvider(Protocol):
+    """
+    What chat_json* need from an LLM backend (LLM_PROVIDER). A provider makes exactly one request per
+    call; retries, hedging, the breaker, rate limits, caching and usage accounting stay in llm.py.
+
+    Failures must be (or map to) openai.APITimeoutError / APIConnectionError / APIStatusError, which
+    llm_resilience.is_retryable classifies, so every backend gets the same retry and breaker behaviour.
+    `timeout` is an httpx.Timeout whose read part is the node's timeout.
+    """
+
+    name: str
+
+    def complete_json_sync(self, *, model: str, system: str, user: str, temperature: float, timeout: Any) -> Completion:
+        ...
+
+    async def complete_json(self, *, model: str, system: str, user: str, temperature: float, timeout: Any) -> Completion:
+        ...
+
+    async def stream_json(
+        self,
+        *,
+        model: str,
+        system: str,
+        user: str,
+        temperature: float,
+        timeout: Any,
+        on_text: Callable[[str], Awaitable[None]],
+    ) -> Completion:
+        """
+        Streams the answer, awaiting on_text(chunk) for each content chunk, and returns the whole of it.
+        """
+        ...
+
+    def stats(self) -> dict:
+        ...
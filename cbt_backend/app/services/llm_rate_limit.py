@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Protocol, Tuple
+
+from app.core.config import get_settings
+from app.persistence.db import advisory_lock, exec_sql, exec_sql_returning
+
+
+logger = logging.getLogger(__name__)
+
+LLM_RATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS llm_rate_buckets (
+  model TEXT PRIMARY KEY,
+  requests DOUBLE PRECISION NOT NULL,
+  tokens DOUBLE PRECISION NOT NULL,
+  updated_at TIMESTAMPTZ NOT NULL
+);
+"""
+
+# stands in for "no limit" on one dimension (LLM_RPM=0 or LLM_TPM=0) so the bucket math stays finite
+_UNLIMITED = 1e15
+
+Limits = Tuple[float, float]  # (requests per minute, tokens per minute)
+
+
+def limits_for(model: str) -> Limits | None:
+    """
+    (rpm, tpm) for a model: its LLM_RATE_LIMITS entry ("gpt-4o-mini=500/200000,...") or LLM_RPM/LLM_TPM.
+    A 0 means that dimension is unlimited; None means the model isn't limited at all.
+    """
+    s = get_settings()
+    rpm, tpm = s.LLM_RPM, s.LLM_TPM
+    for item in s.LLM_RATE_LIMITS.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() == model and value.strip():
+            r, _, t = value.partition("/")
+            rpm, tpm = int(r or 0), int(t or 0)
+    if rpm <= 0 and tpm <= 0:
+        return None
+    return (rpm if rpm > 0 else _UNLIMITED, tpm if tpm > 0 else _UNLIMITED)
+
+
+def estimate_tokens(system: str, user: str) -> int:
+    """
+    Prompt tokens at ~4 characters each plus LLM_RATE_OUTPUT_TOKENS for the completion; settled
+    against the response's usage once it arrives.
+    """
+    return (len(system) + len(user)) // 4 + get_settings().LLM_RATE_OUTPUT_TOKENS
+
+
+class _Tier(Protocol):
+    name: str
+
+    def reserve(self, model: str, limits: Limits, requests: float, tokens: float) -> float: ...
+
+    def credit(self, model: str, limits: Limits, requests: float, tokens: float) -> None: ...
+
+
+class MemoryRateTier:
+    """
+    Per-model request/token buckets in this process. Buckets hold up to a minute's budget and refill
+    continuously; a reservation always debits, so the level can go negative, and the debt is the
+    caller's wait.
+    """
+
+    name = "memory"
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, list] = {}  # model -> [requests, tokens, updated_at]
+
+    def _refilled(self, model: str, limits: Limits) -> list:
+        now = time.monotonic()
+        b = self._buckets.get(model)
+        if b is None:
+            b = self._buckets[model] = [limits[0], limits[1], now]
+        elapsed = now - b[2]
+        b[0] = min(limits[0], b[0] + elapsed * limits[0] / 60)
+        b[1] = min(limits[1], b[1] + elapsed * limits[1] / 60)
+        b[2] = now
+        return b
+
+    def reserve(self, model: str, limits: Limits, requests: float, tokens: float) -> float:
+        with self._lock:
+            b = self._refilled(model, limits)
+            b[0] -= requests
+            b[1] -= tokens
+            return max(0.0, -b[0] * 60 / limits[0], -b[1] * 60 / limits[1])
+
+    def credit(self, model: str, limits: Limits, requests: float, tokens: float) -> None:
+        with self._lock:
+            b = self._refilled(model, limits)
+            b[0] = min(limits[0], b[0] + requests)
+            b[1] = min(limits[1], b[1] + tokens)
+
+
+class PostgresRateTier:
+    """
+    The same buckets as `llm_rate_buckets` rows on DATABASE_URL, so every API replica and worker
+    draws on one provider budget. A reservation is a single upsert; the row lock orders callers.
+    """
+
+    name = "postgres"
+
+    def __init__(self) -> None:
+        self._ready = False
+
+    def _ensure_table(self) -> None:
+        if not self._ready:
+            with advisory_lock():
+                exec_sql(LLM_RATE_TABLE_SQL)
+            self._ready = True
+
+    def reserve(self, model: str, limits: Limits, requests: float, tokens: float) -> float:
+        self._ensure_table()
+        rpm, tpm = limits
+        row = exec_sql_returning(
+            """
+            INSERT INTO llm_rate_buckets AS b (model, requests, tokens, updated_at)
+            VALUES (%s, %s, %s, clock_timestamp())
+            ON CONFLICT (model) DO UPDATE SET
+              requests = LEAST(%s, b.requests + EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at) * %s) - %s,
+              tokens = LEAST(%s, b.tokens + EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at) * %s) - %s,
+              updated_at = clock_timestamp()
+            RETURNING requests, tokens
+            """,
+            [model, rpm - requests, tpm - tokens, rpm, rpm / 60, requests, tpm, tpm / 60, tokens],
+        )
+        return max(0.0, -row["requests"] * 60 / rpm, -row["tokens"] * 60 / tpm)
+
+    def credit(self, model: str, limits: Limits, requests: float, tokens: float) -> None:
+        self._ensure_table()
+        exec_sql(
+            "UPDATE llm_rate_buckets SET requests = LEAST(%s, requests + %s), tokens = LEAST(%s, tokens + %s) WHERE model=%s",
+            [limits[0], requests, limits[1], tokens, model],
+        )
+
+
+def make_tier() -> _Tier | None:
+    s = get_settings()
+    backend = s.LLM_RATE_LIMIT_BACKEND.strip().lower()
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return MemoryRateTier()
+    if backend == "postgres":
+        return PostgresRateTier()
+    raise ValueError(
+        f"Unsupported LLM_RATE_LIMIT_BACKEND={s.LLM_RATE_LIMIT_BACKEND!r} (use 'none', 'memory' or 'postgres')"
+    )
+
+
+class LLMRateLimiter:
+    """
+    Client-side token buckets for each model's RPM/TPM budget, shared by every chat_json call.
+
+    acquire() reserves one request and the estimated tokens, then waits out any debt. Reservations
+    queue in arrival order, across processes with the postgres backend, so callers are served
+    first-come first-served at the configured rate instead of bursting into provider 429s.
+    settle() corrects the estimate with the response's usage. A failing postgres tier is logged
+    and the call falls back to the in-process buckets; the limiter never fails an LLM call.
+    """
+
+    def __init__(self) -> None:
+        self._tier = make_tier()
+        self._local = MemoryRateTier()
+        self.waiting = 0
+        self.wait_seconds_max = 0.0
+        self.wait_seconds_total = 0.0
+        self.counters: Dict[str, int] = {"acquired": 0, "waited": 0, "errors": 0}
+
+    def _reserve(self, model: str, limits: Limits, tokens: float) -> float:
+        try:
+            return self._tier.reserve(model, limits, 1, tokens)
+        except Exception:
+            self.counters["errors"] += 1
+            logger.warning("llm rate limit: %s reserve failed", self._tier.name, exc_info=True)
+            return self._local.reserve(model, limits, 1, tokens)
+
+    def _credit(self, model: str, limits: Limits, requests: float, tokens: float) -> None:
+        try:
+            self._tier.credit(model, limits, requests, tokens)
+        except Exception:
+            self.counters["errors"] += 1
+            logger.warning("llm rate limit: %s credit failed", self._tier.name, exc_info=True)
+
+    def _record(self, wait: float) -> None:
+        self.counters["acquired"] += 1
+        if wait > 0:
+            self.counters["waited"] += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def _plan(self, model: str, tokens: int) -> Tuple[Limits, float] | None:
+        if self._tier is None:
+            return None
+        limits = limits_for(model)
+        if limits is None:
+            return None
+        return limits, float(min(tokens, limits[1]))  # a prompt over the whole budget still gets through
+
+    async def acquire(self, model: str, tokens: int) -> float:
+        """
+        Returns the tokens reserved (pass them to settle()); 0 when the model isn't limited.
+        """
+        plan = self._plan(model, tokens)
+        if plan is None:
+            return 0.0
+        limits, reserved = plan
+        if isinstance(self._tier, PostgresRateTier):
+            wait = await asyncio.to_thread(self._reserve, model, limits, reserved)
+        else:
+            wait = self._reserve(model, limits, reserved)
+        self._record(wait)
+        if wait > 0:
+            self.waiting += 1
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self._credit(model, limits, 1, reserved)  # give the slot to the next caller
+                raise
+            finally:
+                self.waiting -= 1
+        return reserved
+
+    def acquire_sync(self, model: str, tokens: int) -> float:
+        plan = self._plan(model, tokens)
+        if plan is None:
+            return 0.0
+        limits, reserved = plan
+        wait = self._reserve(model, limits, reserved)
+        self._record(wait)
+        if wait > 0:
+            self.waiting += 1
+            try:
+                time.sleep(wait)
+            finally:
+                self.waiting -= 1
+        return reserved
+
+    def settle(self, model: str, reserved: float, used: int | None) -> None:
+        """
+        Credits back (or charges) the difference between the estimate and the tokens actually used.
+        """
+        if not reserved or used is None:
+            return
+        limits = limits_for(model)
+        if limits is not None and used != reserved:
+            self._credit(model, limits, 0, reserved - used)
+
+    async def asettle(self, model: str, reserved: float, used: int | None) -> None:
+        if isinstance(self._tier, PostgresRateTier):
+            await asyncio.to_thread(self.settle, model, reserved, used)
+        else:
+            self.settle(model, reserved, used)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self._tier.name if self._tier is not None else "none",
+            "waiting": self.waiting,
+            "wait_seconds_total": round(self.wait_seconds_total, 3),
+            "wait_seconds_max": round(self.wait_seconds_max, 3),
+            **{f"{k}_total": v for k, v in self.counters.items()},
+        }
+
+
+rate_limiter = LLMRateLimiter()
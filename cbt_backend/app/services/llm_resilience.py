@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import random
+import time
+from collections import deque
+from typing import Deque, Dict
+
+import openai
+
+from app.core.config import get_settings
+
+
+class LLMUnavailable(RuntimeError):
+    """
+    The LLM could not answer: retries exhausted on timeouts/5xx/429/connection errors, or the circuit
+    breaker is open. Nodes catch this and take their non-LLM fallback; anything else (bad request,
+    auth) still fails the run.
+    """
+
+
+_RETRYABLE_STATUS = (408, 409, 429)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in _RETRYABLE_STATUS or exc.status_code >= 500
+    return False
+
+
+def backoff_delay(attempt: int, exc: BaseException | None = None) -> float:
+    """
+    Full-jitter exponential backoff (0..base*2^attempt, capped); a Retry-After from a 429/503 is a floor.
+    """
+    s = get_settings()
+    delay = random.uniform(0, min(s.LLM_RETRY_MAX_SECONDS, s.LLM_RETRY_BASE_SECONDS * (2**attempt)))
+    response = getattr(exc, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            delay = max(delay, min(float(retry_after), s.LLM_RETRY_MAX_SECONDS))
+        except ValueError:
+            pass
+    return delay
+
+
+def node_timeout(node: str | None) -> float:
+    """
+    Per-attempt timeout: LLM_NODE_TIMEOUTS ("drafter=90,safety=30,...") or LLM_TIMEOUT_SECONDS.
+    """
+    s = get_settings()
+    for item in s.LLM_NODE_TIMEOUTS.split(","):
+        name, _, value = item.partition("=")
+        if node is not None and name.strip() == node and value.strip():
+            return float(value)
+    return s.LLM_TIMEOUT_SECONDS
+
+
+class CircuitBreaker:
+    """
+    closed -> (LLM_BREAKER_FAILURES consecutive retryable failures) -> open: calls fail fast with
+    LLMUnavailable -> (LLM_BREAKER_RESET_SECONDS) -> half-open: one probe call; its outcome closes
+    or re-opens the breaker.
+    """
+
+    def __init__(self, failures: int, reset_seconds: float) -> None:
+        self.threshold = max(1, failures)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def before_call(self) -> None:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                raise LLMUnavailable("LLM circuit breaker is open")
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                raise LLMUnavailable("LLM circuit breaker is half-open (probe in flight)")
+            self._probing = True
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def release(self) -> None:
+        """
+        The call was abandoned (run cancelled) without an outcome; let the next call probe instead.
+        """
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+
+class LLMResilience:
+    """
+    Process-wide state behind chat_json's retry/breaker/hedging: one breaker per model, a latency
+    window per node (its p95 is the hedge delay), and counters for /metrics.
+    """
+
+    def __init__(self, window: int = 200) -> None:
+        self.window = window
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.counters: Dict[str, int] = {
+            "retries": 0,
+            "timeouts": 0,
+            "unavailable": 0,
+            "short_circuited": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+        }
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        b = self.breakers.get(model)
+        if b is None:
+            s = get_settings()
+            b = self.breakers[model] = CircuitBreaker(s.LLM_BREAKER_FAILURES, s.LLM_BREAKER_RESET_SECONDS)
+        return b
+
+    def observe(self, node: str | None, seconds: float) -> None:
+        window = self.latencies.get(node or "")
+        if window is None:
+            window = self.latencies[node or ""] = deque(maxlen=self.window)
+        window.append(seconds)
+
+    def quantile(self, node: str | None, q: float) -> float | None:
+        window = self.latencies.get(node or "")
+        if not window:
+            return None
+        ordered = sorted(window)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def hedge_delay(self, node: str | None) -> float | None:
+        """
+        When to fire a second, hedged request: the node's recent LLM_HEDGE_QUANTILE latency,
+        once LLM_HEDGE_MIN_SAMPLES calls are on record. None = don't hedge.
+        """
+        s = get_settings()
+        if not s.LLM_HEDGE:
+            return None
+        window = self.latencies.get(node or "")
+        if window is None or len(window) < s.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return self.quantile(node, s.LLM_HEDGE_QUANTILE)
+
+    def stats(self) -> dict:
+        return {
+            "breakers": {m: b.state for m, b in self.breakers.items()},
+            "p95_seconds": {n or "-": round(self.quantile(n, 0.95) or 0.0, 3) for n in self.latencies},
+            **{f"{k}_total": v for k, v in self.counters.items()},
+        }
+
+
+resilience = LLMResilience()
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List
+
+from app.core.config import get_settings
+from app.persistence.run_store import insert_llm_calls
+
+
+logger = logging.getLogger(__name__)
+
+
+class RunLLMCalls:
+    """
+    LLM calls made on behalf of one run, buffered until the runner flushes them to run_llm_calls
+    (after every node and when the leg ends), so chat_json never waits on a database write.
+    """
+
+    def __init__(self, run_id: str) -> None:
+        self.run_id = run_id
+        self.pending: List[Dict[str, Any]] = []
+
+    def flush(self) -> None:
+        rows, self.pending = self.pending, []
+        if rows:
+            self._insert(rows)
+
+    async def aflush(self) -> None:
+        # the runner's per-node flush: the write runs in a thread so the event loop keeps serving
+        rows, self.pending = self.pending, []
+        if rows:
+            await asyncio.to_thread(self._insert, rows)
+
+    def _insert(self, rows: List[Dict[str, Any]]) -> None:
+        try:
+            insert_llm_calls(self.run_id, rows)
+        except Exception:
+            logger.warning("llm usage: dropped %d call record(s) for run %s", len(rows), self.run_id, exc_info=True)
+
+
+# set by the runner around a graph invocation; node tasks inherit it, so chat_json knows its run
+_current: ContextVar[RunLLMCalls | None] = ContextVar("run_llm_calls", default=None)
+
+
+@contextmanager
+def track_run(run_id: str) -> Iterator[RunLLMCalls]:
+    calls = RunLLMCalls(run_id)
+    token = _current.set(calls)
+    try:
+        yield calls
+    finally:
+        _current.reset(token)
+        calls.flush()
+
+
+def record(
+    *,
+    node: str | None,
+    model: str,
+    started: float,
+    outcome: str,
+    usage: Any = None,
+    retries: int = 0,
+) -> None:
+    """
+    One chat_json call: wall time since `started` (time.monotonic(), retries and backoff included),
+    the response's usage, and outcome ok | cached | unavailable | error | cancelled. No-op outside a run.
+    """
+    calls = _current.get()
+    if calls is None:
+        return
+    calls.pending.append(
+        {
+            "node": node,
+            "model": model,
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "wall_ms": int((time.monotonic() - started) * 1000),
+            "retries": retries,
+            "outcome": outcome,
+        }
+    )
+
+
+def _prices() -> Dict[str, tuple[float, float]]:
+    out = {}
+    for item in get_settings().LLM_PRICES.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            prompt, _, completion = value.partition("/")
+            out[name.strip()] = (float(prompt or 0), float(completion or 0))
+    return out
+
+
+_SUMMED = ("calls", "cached", "failed", "prompt_tokens", "completion_tokens", "wall_ms", "retries")
+
+
+def summarize(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Per-node totals for GET /runs/{run_id} from run_llm_calls rows grouped by (node, model).
+    cost_usd uses LLM_PRICES (USD per 1M prompt/completion tokens) and is None for unpriced models.
+    """
+    prices = _prices()
+    by_node: Dict[str, Dict[str, Any]] = {}
+    total = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "wall_ms": 0, "retries": 0, "cost_usd": 0.0}
+    for r in rows:
+        price = prices.get(r["model"])
+        cost = (
+            (r["prompt_tokens"] * price[0] + r["completion_tokens"] * price[1]) / 1_000_000 if price is not None else None
+        )
+        n = by_node.setdefault(r["node"] or "-", {**dict.fromkeys(_SUMMED, 0), "max_wall_ms": 0, "cost_usd": 0.0, "models": []})
+        for k in _SUMMED:
+            n[k] += r[k]
+        n["max_wall_ms"] = max(n["max_wall_ms"], r["max_wall_ms"])
+        n["models"].append(r["model"])
+        for k in ("calls", "prompt_tokens", "completion_tokens", "wall_ms", "retries"):
+            total[k] += r[k]
+        for agg in (n, total):
+            agg["cost_usd"] = None if cost is None or agg["cost_usd"] is None else round(agg["cost_usd"] + cost, 6)
+    return {"total": total, "by_node": by_node}
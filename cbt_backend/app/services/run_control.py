@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+CANCELLED = "cancelled"
+DEADLINE_EXCEEDED = "deadline_exceeded"
+SHUTDOWN = "shutdown"
+
+
+class RunControls:
+    """
+    Maps run_id -> the asyncio task currently driving that run in this process.
+
+    cancel() cancels the task, which raises CancelledError at whatever the graph is awaiting
+    (usually the in-flight chat_json_async request, which aborts the HTTP call).
+    The runner reads the reason back to tell a user cancel apart from a shutdown.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._reasons: Dict[str, str] = {}
+
+    @contextmanager
+    def track(self, run_id: str) -> Iterator[None]:
+        task = asyncio.current_task()
+        if task is not None:
+            self._tasks[run_id] = task
+        try:
+            yield
+        finally:
+            self._tasks.pop(run_id, None)
+
+    def cancel(self, run_id: str, reason: str = CANCELLED) -> bool:
+        task = self._tasks.get(run_id)
+        if task is None or task.done():
+            return False
+        if run_id in self._reasons:
+            return True  # already cancelling; a second task.cancel() would also abort the runner's cleanup
+        self._reasons[run_id] = reason
+        task.cancel()
+        return True
+
+    def pop_reason(self, run_id: str) -> str | None:
+        return self._reasons.pop(run_id, None)
+
+    def is_tracked(self, run_id: str) -> bool:
+        return run_id in self._tasks
+
+    def tracked(self) -> list[str]:
+        return list(self._tasks)
+
+
+run_controls = RunControls()
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import asyncio
+from typing import AsyncIterator
+
+import orjson
+
+from app.services.runner import load_run_events
+from app.services.websocket_manager import ConnectionOptions, ws_manager
+
+
+TERMINAL_STATUSES = ("COMPLETED", "FAILED", "CANCELLED")
+_TERMINAL_SUFFIXES = ("_completed", "_failed", "_cancelled")
+_END = "\x00end"
+
+
+class _SseSink:
+    """
+    Stands in for a WebSocket in ws_manager, so an SSE stream gets the same fan-out, replay, heartbeats
+    and backpressure. The one-slot hand-off makes the connection's writer wait for the HTTP response,
+    so a slow reader backs up (and coalesces/sheds) in its bounded WS queue, not here.
+    """
+
+    def __init__(self) -> None:
+        self._frames: asyncio.Queue[str | None] = asyncio.Queue(maxsize=1)
+        self.closed = False
+
+    async def accept(self, subprotocol: str | None = None) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        await self._frames.put(data)
+
+    async def send_bytes(self, data: bytes) -> None:
+        raise TypeError("SSE streams are text only")
+
+    async def close(self, code: int = 1000) -> None:
+        # evicted (idle, too slow, shutdown): end the response
+        self.closed = True
+        try:
+            self._frames.put_nowait(None)
+        except asyncio.QueueFull:
+            pass  # get() returns None once the pending frame is taken
+
+    async def get(self) -> str | None:
+        if self.closed and self._frames.empty():
+            return None
+        return await self._frames.get()
+
+
+def _event(message: dict) -> bytes:
+    data = orjson.dumps(message)
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (message["seq"], message["type"].encode(), data)
+
+
+async def stream_run(run_id: str, thread_id: str, after_seq: int, finished: bool) -> AsyncIterator[bytes]:
+    """
+    SSE body for GET /runs/{run_id}/stream: the run's events (as on /ws, without state) with `id: <seq>`,
+    starting after after_seq (Last-Event-ID) from the replay buffer / run_events, then live.
+    Ends after the run's *_completed/_failed/_cancelled event; a HALTED run stays open for its resume leg.
+    finished: the run was already terminal when the request came in, so the replay is all there is.
+    """
+    sink = _SseSink()
+    await ws_manager.connect(
+        thread_id, sink, ConnectionOptions(state=False), after=(run_id, after_seq), load_events=load_run_events
+    )
+    try:
+        if finished:
+            # queued behind the replayed events
+            ws_manager.send_text(sink, _END)
+        yield b"retry: 2000\n\n"
+        while True:
+            text = await sink.get()
+            if text is None or text == _END:
+                return
+            ws_manager.touch(sink)
+            message = orjson.loads(text)
+            if message.get("type") == "heartbeat":
+                # also keeps proxies from timing out an idle stream
+                yield b": heartbeat\n\n"
+                continue
+            if message.get("run_id") != run_id or not isinstance(message.get("seq"), int):
+                continue
+            yield _event(message)
+            if message["type"].endswith(_TERMINAL_SUFFIXES):
+                return
+    finally:
+        await ws_manager.release(sink)
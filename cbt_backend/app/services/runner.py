@@ -1,21 +1,29 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime, timezone
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict
 
 from fastapi.encoders import jsonable_encoder
 from langgraph.types import Command
 
-from app.graphs.builder import build_graph
+from app.core.config import get_settings
+from app.graphs.registry import graph_registry
 from app.persistence.checkpointer import checkpointer_manager
 from app.persistence.run_store import (
     create_run,
     get_latest_halted_run,
+    list_run_events_after,
     log_event,
+    next_event_seq,
     update_run_from_state,
     set_pending_interrupt,
 )
+from app.services.draft_stream import track_drafts
+from app.services.llm_usage import track_run
+from app.services.run_control import DEADLINE_EXCEEDED, run_controls
 from app.services.websocket_manager import ws_manager
+from app.utils.json_codec import to_jsonable
 
 
 def _now_iso() -> str:
@@ -36,20 +44,96 @@ def _interrupts_to_json(update: dict) -> list[dict]:
     return out
 
 
-def _read_latest_state(thread_id: str) -> dict | None:
+def _compile_graph():
+    # cached per (checkpointer, variant); compiled once at startup by the lifespan warm-up
+    return graph_registry.get(checkpointer_manager.get())
+
+
+async def _stream_chunks(graph, graph_input: Any, config: dict) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Yields (mode, chunk) for stream_mode=["updates", "values"].
+    Async mode uses graph.astream so LLM calls and checkpoint writes never block the event loop;
+    sync mode (GRAPH_EXECUTION_MODE=sync) keeps the original blocking graph.stream path,
+    where a cancel can only land between nodes.
+    """
+    modes = ["updates", "values"]
+    if get_settings().async_execution:
+        async for mode, chunk in graph.astream(graph_input, config, stream_mode=modes):
+            yield mode, chunk
+        return
+
+    for mode, chunk in graph.stream(graph_input, config, stream_mode=modes):
+        yield mode, chunk
+        await asyncio.sleep(0)
+
+
+async def _stream_updates(graph, graph_input: Any, config: dict) -> AsyncIterator[tuple[dict, dict | None]]:
+    """
+    Yields (update, state): each stream_mode="updates" chunk paired with the merged state after it.
+
+    The "values" chunk LangGraph emits after every step is already reducer-merged (and on resume the
+    first one is the checkpoint being resumed), so the runner never has to re-read the checkpointer per node.
+    A node's update arrives before its step's values, so it is held until that values chunk lands.
+    """
+    state: dict | None = None
+    pending: list[dict] = []
+
+    async for mode, chunk in _stream_chunks(graph, graph_input, config):
+        if mode == "values":
+            state = chunk
+            for update in pending:
+                yield update, state
+            pending.clear()
+        elif "__interrupt__" in chunk:
+            for update in pending:
+                yield update, state
+            pending.clear()
+            yield chunk, state
+        else:
+            pending.append(chunk)
+
+    for update in pending:
+        yield update, state
+
+
+async def _read_latest_state(thread_id: str) -> dict | None:
     """
     Reads the latest state snapshot from the checkpointer.
-    This snapshot already includes reducer merges.
+    This snapshot already includes reducer merges. Only a fallback now: the stream carries the state.
     """
     checkpointer = checkpointer_manager.get()
     config = {"configurable": {"thread_id": thread_id}}
-    ct = checkpointer.get_tuple(config)
+    if checkpointer_manager.is_async:
+        ct = await checkpointer.aget_tuple(config)
+    else:
+        ct = checkpointer.get_tuple(config)
     if not ct:
         return None
     checkpoint = ct.checkpoint or {}
     return checkpoint.get("channel_values")
 
 
+async def load_thread_state(thread_id: str) -> Any:
+    """
+    JSON-encoded latest state for a thread (WS snapshot when no run has streamed it recently).
+    """
+    state = await _read_latest_state(thread_id)
+    return _safe_encode(state) if state is not None else None
+
+
+async def load_run_events(run_id: str, after_seq: int) -> list[dict]:
+    """
+    A run's logged events after `after_seq`, shaped like their WS messages (minus state/patch).
+    WS reconnect catch-up for events the in-memory replay buffer no longer holds.
+    """
+    rows = await asyncio.to_thread(list_run_events_after, run_id, after_seq)
+    out: list[dict] = []
+    for r in rows:
+        payload = r.get("payload") if isinstance(r.get("payload"), dict) else {}
+        out.append({**payload, "type": r["event_type"], "ts": r["ts"], "seq": r["seq"], "run_id": run_id})
+    return out
+
+
 def _node_name_from_update(update: dict) -> str | None:
     # update is typically {"node_name": {...}} (stream_mode="updates")
     if not isinstance(update, dict):
@@ -69,8 +153,12 @@ def _safe_first_str(x: Any, max_len: int = 180) -> str | None:
 
 def _safe_encode(x: Any) -> Any:
     """
-    JSON-encodes arbitrary objects safely (FastAPI encoder).
+    JSON-encodes arbitrary objects safely (orjson round trip; FastAPI encoder as the fallback).
     """
+    try:
+        return to_jsonable(x)
+    except Exception:
+        pass
     try:
         return jsonable_encoder(x)
     except Exception:
@@ -204,245 +292,263 @@ def _interrupt_public(intrs: list[dict]) -> tuple[str, str, dict]:
         return "human_review", "Waiting for your approval…", {}
 
 
-async def run_with_ws(thread_id: str, input_text: str, require_human_approval: bool) -> Dict[str, Any]:
-    graph = build_graph().compile(checkpointer=checkpointer_manager.get())
+async def _drive(
+    *,
+    thread_id: str,
+    run_id: str,
+    graph_input: Any,
+    prefix: str,
+    started_payload: dict | None,
+    deadline_seconds: float | None,
+) -> Dict[str, Any]:
+    """
+    Streams one graph invocation to WS + run_events and records the outcome on the runs row.
+    prefix is "run" or "resume" and names the lifecycle events ({prefix}_started, _completed, _failed, _cancelled).
+
+    A user cancel (run_controls.cancel) or an expired deadline aborts whatever node is in flight and marks
+    the run CANCELLED; the checkpoint written before that node is kept, so continue_with_ws can pick it up.
+    """
+    graph = _compile_graph()
     config = {"configurable": {"thread_id": thread_id}}
 
-    run_id = create_run(thread_id=thread_id, input_text=input_text, require_human_approval=require_human_approval)
+    # run_store calls are blocking psycopg: each goes to a thread so other runs and sockets keep moving.
+    # seq is per-run and monotonic across resume/continue legs, so (run_id, seq) names one event for reconnects
+    seq = await asyncio.to_thread(next_event_seq, run_id)
+    await ws_manager.broadcast(thread_id, {"type": f"{prefix}_started", "ts": _now_iso(), "seq": seq, "run_id": run_id})
+    await asyncio.to_thread(log_event, run_id, f"{prefix}_started", payload=started_payload, seq=seq)
 
-    seq = 1
-    await ws_manager.broadcast(thread_id, {"type": "run_started", "ts": _now_iso(), "seq": seq, "run_id": run_id})
-    log_event(run_id, "run_started", payload={"require_human_approval": require_human_approval}, seq=seq)
+    # starting / resuming => clear stale pending interrupt
+    await asyncio.to_thread(set_pending_interrupt, run_id, None)
 
-    # starting new run => clear stale pending interrupt
-    set_pending_interrupt(run_id, None)
+    if deadline_seconds is None:
+        deadline_seconds = get_settings().RUN_DEADLINE_SECONDS
+    deadline = asyncio.timeout(deadline_seconds if deadline_seconds > 0 else None)
 
-    initial = {"input_text": input_text, "require_human_approval": require_human_approval}
+    state: dict | None = None
 
     try:
-        for update in graph.stream(initial, config, stream_mode="updates"):
-            seq += 1
-
-            # HALT (human_review interrupt)
-            if "__interrupt__" in update:
-                intrs = _interrupts_to_json(update)
-                set_pending_interrupt(run_id, {"interrupts": intrs})
-
-                # emit a final node_update for human_review using interrupt.public
-                node, summary, extra = _interrupt_public(intrs)
-                state_snap = _safe_encode(_read_latest_state(thread_id))
-
-                await ws_manager.broadcast(
-                    thread_id,
-                    {
-                        "type": "node_update",
-                        "ts": _now_iso(),
-                        "seq": seq,
-                        "run_id": run_id,
-                        "node": node,
-                        "summary": summary,
-                        "signals": {"halted": True},
-                        "patch": {},
-                        "state": state_snap,
-                        **extra,
-                    },
-                )
-                log_event(run_id, "node_update", payload={"node": node, "summary": summary, "signals": {"halted": True}}, seq=seq)
-
-                # then emit halt_required
-                await ws_manager.broadcast(
-                    thread_id,
-                    {"type": "halt_required", "ts": _now_iso(), "seq": seq, "run_id": run_id, "interrupts": intrs},
-                )
-                log_event(run_id, "halt_required", payload={"interrupts": intrs}, seq=seq)
-
-                state = _read_latest_state(thread_id)
-                update_run_from_state(run_id, status="HALTED", state=state)
-                return {"run_id": run_id, "status": "HALTED", "interrupts": intrs}
-
-            # node_update (summary + signals + patch + state snapshot)
-            node = _node_name_from_update(update)
-            if node:
-                payload = update.get(node) if isinstance(update, dict) else None
-                summary = _summary_from_payload(node, payload)
-                signals = _public_signals(node, payload)
-
-                # reducers-friendly patch (node output)
-                patch = _safe_encode(payload)
-
-                # full state snapshot (already merged by reducers)
-                state_snap = _safe_encode(_read_latest_state(thread_id))
-
-                await ws_manager.broadcast(
-                    thread_id,
-                    {
-                        "type": "node_update",
-                        "ts": _now_iso(),
-                        "seq": seq,
-                        "run_id": run_id,
-                        "node": node,
-                        "summary": summary,
-                        "signals": signals,
-                        "patch": patch,
-                        "state": state_snap,
-                    },
-                )
-                log_event(
-                    run_id,
-                    "node_update",
-                    payload={"node": node, "summary": summary, "signals": signals},
-                    seq=seq,
-                )
-
-            # state_update (debug)
-            await ws_manager.broadcast(
-                thread_id,
-                {"type": "state_update", "ts": _now_iso(), "seq": seq, "run_id": run_id, "update": _safe_encode(update)},
-            )
+        intrs: list[dict] | None = None
+        # chat_json calls made by the graph's node tasks are attributed to this run (run_llm_calls)
+        with run_controls.track(run_id), track_run(run_id) as llm_calls, track_drafts(thread_id, run_id):
+            async with deadline:
+                async for update, state in _stream_updates(graph, graph_input, config):
+                    seq += 1
+
+                    # HALT (human_review interrupt)
+                    if "__interrupt__" in update:
+                        intrs = _interrupts_to_json(update)
+                        await asyncio.to_thread(set_pending_interrupt, run_id, {"interrupts": intrs})
+
+                        # emit a final node_update for human_review using interrupt.public
+                        node, summary, extra = _interrupt_public(intrs)
+                        state_snap = _safe_encode(state)
+
+                        await ws_manager.broadcast(
+                            thread_id,
+                            {
+                                "type": "node_update",
+                                "ts": _now_iso(),
+                                "seq": seq,
+                                "run_id": run_id,
+                                "node": node,
+                                "summary": summary,
+                                "signals": {"halted": True},
+                                "patch": {},
+                                **extra,
+                            },
+                            state=state_snap,
+                        )
+                        await asyncio.to_thread(
+                            log_event,
+                            run_id,
+                            "node_update",
+                            payload={"node": node, "summary": summary, "signals": {"halted": True}},
+                            seq=seq,
+                        )
+
+                        # then emit halt_required (own seq: a reconnect after the node_update must still get it)
+                        seq += 1
+                        await ws_manager.broadcast(
+                            thread_id,
+                            {"type": "halt_required", "ts": _now_iso(), "seq": seq, "run_id": run_id, "interrupts": intrs},
+                        )
+                        await asyncio.to_thread(
+                            log_event, run_id, "halt_required", payload={"interrupts": intrs}, seq=seq
+                        )
+                        break
+
+                    # node_update (summary + signals + patch + state snapshot)
+                    node = _node_name_from_update(update)
+                    if node:
+                        payload = update.get(node) if isinstance(update, dict) else None
+                        summary = _summary_from_payload(node, payload)
+                        signals = _public_signals(node, payload)
+
+                        # reducers-friendly patch (node output)
+                        patch = _safe_encode(payload)
+
+                        # full state snapshot (already merged by reducers)
+                        state_snap = _safe_encode(state)
+
+                        # full state for legacy sockets, JSON-patch delta for ?sync=delta sockets
+                        await ws_manager.broadcast(
+                            thread_id,
+                            {
+                                "type": "node_update",
+                                "ts": _now_iso(),
+                                "seq": seq,
+                                "run_id": run_id,
+                                "node": node,
+                                "summary": summary,
+                                "signals": signals,
+                                "patch": patch,
+                            },
+                            state=state_snap,
+                        )
+                        await asyncio.to_thread(
+                            log_event,
+                            run_id,
+                            "node_update",
+                            payload={"node": node, "summary": summary, "signals": signals},
+                            seq=seq,
+                        )
+                        await llm_calls.aflush()
+
+                    # state_update (debug; only sockets connected with ?debug=1; carries its node_update's seq)
+                    await ws_manager.broadcast(
+                        thread_id,
+                        {"type": "state_update", "ts": _now_iso(), "seq": seq, "run_id": run_id, "update": _safe_encode(update)},
+                        debug=True,
+                    )
+
+        if state is None:
+            state = await _read_latest_state(thread_id)
+
+        if intrs is not None:
+            await asyncio.to_thread(update_run_from_state, run_id, status="HALTED", state=state)
+            return {"run_id": run_id, "status": "HALTED", "interrupts": intrs}
 
         # COMPLETED
         seq += 1
-        await ws_manager.broadcast(thread_id, {"type": "run_completed", "ts": _now_iso(), "seq": seq, "run_id": run_id})
-        log_event(run_id, "run_completed", payload=None, seq=seq)
+        await ws_manager.broadcast(thread_id, {"type": f"{prefix}_completed", "ts": _now_iso(), "seq": seq, "run_id": run_id})
+        await asyncio.to_thread(log_event, run_id, f"{prefix}_completed", payload=None, seq=seq)
 
-        set_pending_interrupt(run_id, None)
+        await asyncio.to_thread(set_pending_interrupt, run_id, None)
 
-        state = _read_latest_state(thread_id)
-        update_run_from_state(run_id, status="COMPLETED", state=state)
+        await asyncio.to_thread(update_run_from_state, run_id, status="COMPLETED", state=state)
         return {"run_id": run_id, "status": "COMPLETED"}
 
+    except asyncio.CancelledError:
+        reason = run_controls.pop_reason(run_id)
+        if reason is None:
+            # shutdown, not a user cancel: leave the row RUNNING (app.worker hands it back to the queue)
+            raise
+        asyncio.current_task().uncancel()
+        return await _mark_cancelled(thread_id, run_id, prefix, seq + 1, reason, state)
+
     except Exception as e:
+        if isinstance(e, TimeoutError) and deadline.expired():
+            return await _mark_cancelled(thread_id, run_id, prefix, seq + 1, DEADLINE_EXCEEDED, state)
+
         seq += 1
         await ws_manager.broadcast(
             thread_id,
-            {"type": "run_failed", "ts": _now_iso(), "seq": seq, "run_id": run_id, "error": str(e)},
+            {"type": f"{prefix}_failed", "ts": _now_iso(), "seq": seq, "run_id": run_id, "error": str(e)},
         )
-        log_event(run_id, "run_failed", payload={"error": str(e)}, seq=seq)
+        await asyncio.to_thread(log_event, run_id, f"{prefix}_failed", payload={"error": str(e)}, seq=seq)
 
-        set_pending_interrupt(run_id, None)
+        await asyncio.to_thread(set_pending_interrupt, run_id, None)
 
-        state = _read_latest_state(thread_id)
-        update_run_from_state(run_id, status="FAILED", state=state, error=str(e))
+        if state is None:
+            state = await _read_latest_state(thread_id)
+        await asyncio.to_thread(update_run_from_state, run_id, status="FAILED", state=state, error=str(e))
         raise
 
 
+async def _mark_cancelled(
+    thread_id: str,
+    run_id: str,
+    prefix: str,
+    seq: int,
+    reason: str,
+    state: dict | None,
+) -> Dict[str, Any]:
+    await ws_manager.broadcast(
+        thread_id,
+        {"type": f"{prefix}_cancelled", "ts": _now_iso(), "seq": seq, "run_id": run_id, "reason": reason},
+    )
+    await asyncio.to_thread(log_event, run_id, f"{prefix}_cancelled", payload={"reason": reason}, seq=seq)
+
+    await asyncio.to_thread(set_pending_interrupt, run_id, None)
+
+    # snapshot the last merged state we saw; the checkpoint itself is left untouched
+    if state is None:
+        state = await _read_latest_state(thread_id)
+    await asyncio.to_thread(update_run_from_state, run_id, status="CANCELLED", state=state, error=reason)
+    return {"run_id": run_id, "status": "CANCELLED", "reason": reason}
+
+
+async def run_with_ws(
+    thread_id: str,
+    input_text: str,
+    require_human_approval: bool,
+    run_id: str | None = None,
+    deadline_seconds: float | None = None,
+) -> Dict[str, Any]:
+    """
+    run_id is passed when the row was already created (background jobs return it to the client up front).
+    """
+    if run_id is None:
+        run_id = await asyncio.to_thread(
+            create_run, thread_id=thread_id, input_text=input_text, require_human_approval=require_human_approval
+        )
+
+    initial = {"input_text": input_text, "require_human_approval": require_human_approval}
+    return await _drive(
+        thread_id=thread_id,
+        run_id=run_id,
+        graph_input=initial,
+        prefix="run",
+        started_payload={"require_human_approval": require_human_approval},
+        deadline_seconds=deadline_seconds,
+    )
+
+
 async def resume_with_ws(
     thread_id: str,
     approved: bool,
     edited_text: str | None = None,
     feedback: str | None = None,
     run_id: str | None = None,
+    deadline_seconds: float | None = None,
 ) -> Dict[str, Any]:
-    graph = build_graph().compile(checkpointer=checkpointer_manager.get())
-    config = {"configurable": {"thread_id": thread_id}}
-
     if run_id is None:
-        latest = get_latest_halted_run(thread_id)
+        latest = await asyncio.to_thread(get_latest_halted_run, thread_id)
         run_id = latest["run_id"] if latest else None
 
     if run_id is None:
         raise ValueError("No halted run found to resume for this thread")
 
-    seq = 1
-    await ws_manager.broadcast(thread_id, {"type": "resume_started", "ts": _now_iso(), "seq": seq, "run_id": run_id})
-    log_event(run_id, "resume_started", payload={"approved": approved}, seq=seq)
-
-    # attempting resume => clear old pending interrupt
-    set_pending_interrupt(run_id, None)
-
     cmd = Command(resume={"approved": approved, "edited_text": edited_text, "feedback": feedback})
+    return await _drive(
+        thread_id=thread_id,
+        run_id=run_id,
+        graph_input=cmd,
+        prefix="resume",
+        started_payload={"approved": approved},
+        deadline_seconds=deadline_seconds,
+    )
 
-    try:
-        for update in graph.stream(cmd, config, stream_mode="updates"):
-            seq += 1
-
-            # HALT again
-            if "__interrupt__" in update:
-                intrs = _interrupts_to_json(update)
-                set_pending_interrupt(run_id, {"interrupts": intrs})
-
-                node, summary, extra = _interrupt_public(intrs)
-                state_snap = _safe_encode(_read_latest_state(thread_id))
-
-                await ws_manager.broadcast(
-                    thread_id,
-                    {
-                        "type": "node_update",
-                        "ts": _now_iso(),
-                        "seq": seq,
-                        "run_id": run_id,
-                        "node": node,
-                        "summary": summary,
-                        "signals": {"halted": True},
-                        "patch": {},
-                        "state": state_snap,
-                        **extra,
-                    },
-                )
-                log_event(run_id, "node_update", payload={"node": node, "summary": summary, "signals": {"halted": True}}, seq=seq)
-
-                await ws_manager.broadcast(
-                    thread_id,
-                    {"type": "halt_required", "ts": _now_iso(), "seq": seq, "run_id": run_id, "interrupts": intrs},
-                )
-                log_event(run_id, "halt_required", payload={"interrupts": intrs}, seq=seq)
-
-                state = _read_latest_state(thread_id)
-                update_run_from_state(run_id, status="HALTED", state=state)
-                return {"run_id": run_id, "status": "HALTED", "interrupts": intrs}
-
-            # node_update on resume path too
-            node = _node_name_from_update(update)
-            if node:
-                payload = update.get(node) if isinstance(update, dict) else None
-                summary = _summary_from_payload(node, payload)
-                signals = _public_signals(node, payload)
-
-                patch = _safe_encode(payload)
-                state_snap = _safe_encode(_read_latest_state(thread_id))
-
-                await ws_manager.broadcast(
-                    thread_id,
-                    {
-                        "type": "node_update",
-                        "ts": _now_iso(),
-                        "seq": seq,
-                        "run_id": run_id,
-                        "node": node,
-                        "summary": summary,
-                        "signals": signals,
-                        "patch": patch,
-                        "state": state_snap,
-                    },
-                )
-                log_event(run_id, "node_update", payload={"node": node, "summary": summary, "signals": signals}, seq=seq)
-
-            await ws_manager.broadcast(
-                thread_id,
-                {"type": "state_update", "ts": _now_iso(), "seq": seq, "run_id": run_id, "update": _safe_encode(update)},
-            )
-
-        # COMPLETED
-        seq += 1
-        await ws_manager.broadcast(thread_id, {"type": "resume_completed", "ts": _now_iso(), "seq": seq, "run_id": run_id})
-        log_event(run_id, "resume_completed", payload=None, seq=seq)
-
-        set_pending_interrupt(run_id, None)
 
-        state = _read_latest_state(thread_id)
-        update_run_from_state(run_id, status="COMPLETED", state=state)
-        return {"run_id": run_id, "status": "COMPLETED"}
-
-    except Exception as e:
-        seq += 1
-        await ws_manager.broadcast(
-            thread_id,
-            {"type": "resume_failed", "ts": _now_iso(), "seq": seq, "run_id": run_id, "error": str(e)},
-        )
-        log_event(run_id, "resume_failed", payload={"error": str(e)}, seq=seq)
-
-        set_pending_interrupt(run_id, None)
-
-        state = _read_latest_state(thread_id)
-        update_run_from_state(run_id, status="FAILED", state=state, error=str(e))
-        raise
+async def continue_with_ws(thread_id: str, run_id: str, deadline_seconds: float | None = None) -> Dict[str, Any]:
+    """
+    Picks a CANCELLED run up from its last checkpoint (graph input None re-runs the node that was aborted).
+    """
+    return await _drive(
+        thread_id=thread_id,
+        run_id=run_id,
+        graph_input=None,
+        prefix="resume",
+        started_payload={"continued": True},
+        deadline_seconds=deadline_seconds,
+    )
@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict
+
+from app.core.config import get_settings
+from app.persistence.run_store import abandon_run
+from app.services.run_control import SHUTDOWN, run_controls
+
+
+logger = logging.getLogger(__name__)
+
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+
+def lane_for_mode(mode: str | None) -> str:
+    """
+    Dashboard sessions (human_required / human_optional) are interactive; `auto` (MCP, scripts) is bulk.
+    """
+    return BULK if (mode or "").strip().lower() == "auto" else INTERACTIVE
+
+
+class JobQueueFull(RuntimeError):
+    def __init__(self, lane: str, retry_after: int) -> None:
+        super().__init__(f"{lane} run queue is full; retry in ~{retry_after}s")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+@dataclass
+class RunJob:
+    """
+    One unit of scheduled work: a runner coroutine factory plus ids for bookkeeping.
+    kind is "run" or "resume".
+    """
+    run_id: str
+    thread_id: str
+    kind: str
+    factory: Callable[[], Awaitable[Any]]
+    lane: str = INTERACTIVE
+    enqueued_at: float = field(default_factory=time.monotonic)
+    future: asyncio.Future | None = None
+
+
+class _FairQueue:
+    """
+    Per-thread FIFOs served round-robin, so one session's backlog can't starve the others in its lane.
+    """
+
+    def __init__(self) -> None:
+        self._by_thread: "OrderedDict[str, Deque[RunJob]]" = OrderedDict()
+        self._size = 0
+        self._nonempty = asyncio.Event()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def put(self, job: RunJob) -> None:
+        self._by_thread.setdefault(job.thread_id, deque()).append(job)
+        self._size += 1
+        self._nonempty.set()
+
+    async def get(self) -> RunJob:
+        while self._size == 0:
+            self._nonempty.clear()
+            await self._nonempty.wait()
+
+        thread_id, jobs = next(iter(self._by_thread.items()))
+        job = jobs.popleft()
+        # rotate: this thread goes to the back of the line
+        del self._by_thread[thread_id]
+        if jobs:
+            self._by_thread[thread_id] = jobs
+        self._size -= 1
+        return job
+
+    def run_ids(self) -> list[str]:
+        return [job.run_id for jobs in self._by_thread.values() for job in jobs]
+
+    def drain(self) -> list[RunJob]:
+        jobs = [job for q in self._by_thread.values() for job in q]
+        self._by_thread.clear()
+        self._size = 0
+        return jobs
+
+    def remove(self, run_id: str) -> RunJob | None:
+        for thread_id, jobs in self._by_thread.items():
+            for job in jobs:
+                if job.run_id == run_id:
+                    jobs.remove(job)
+                    if not jobs:
+                        del self._by_thread[thread_id]
+                    self._size -= 1
+                    return job
+        return None
+
+
+class _Lane:
+    def __init__(self, name: str, limit: int, max_queue: int) -> None:
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.queue = _FairQueue()
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self._waits: Deque[float] = deque(maxlen=500)
+        self._run_ewma: float | None = None
+
+    def record_wait(self, seconds: float) -> None:
+        self._waits.append(seconds)
+
+    def record_run(self, seconds: float) -> None:
+        self._run_ewma = seconds if self._run_ewma is None else 0.8 * self._run_ewma + 0.2 * seconds
+
+    def is_full(self) -> bool:
+        # idle executors pick a job up immediately, so they count as extra headroom
+        return len(self.queue) >= self.max_queue + max(0, self.limit - self.active)
+
+    def retry_after(self) -> int:
+        # time for the backlog ahead of a new job to drain through `limit` slots
+        avg_run = self._run_ewma if self._run_ewma is not None else 10.0
+        return max(1, math.ceil(avg_run * (len(self.queue) + 1) / self.limit))
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else None
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queue_depth": len(self.queue),
+            "admitted_total": self.admitted,
+            "rejected_total": self.rejected,
+            "completed_total": self.completed,
+            "failed_total": self.failed,
+            "cancelled_total": self.cancelled,
+            "wait_seconds_avg": (sum(waits) / len(waits)) if waits else None,
+            "wait_seconds_p95": p95,
+            "wait_seconds_max": waits[-1] if waits else None,
+            "run_seconds_ewma": self._run_ewma,
+        }
+
+
+async def _abandon(job: RunJob, status: str, error: str | None) -> None:
+    try:
+        await asyncio.to_thread(abandon_run, job.run_id, status, error)
+    except Exception:
+        # shutdown goes on regardless; the row stays RUNNING
+        logger.exception("can't settle %s job on shutdown (run_id=%s)", job.kind, job.run_id)
+
+
+class RunScheduler:
+    """
+    Admission control in front of run_with_ws / resume_with_ws.
+
+    Each lane has its own concurrency limit (executor tasks) and bounded fair queue.
+    Inline requests await the job's future; background requests return 202 and leave it running.
+    """
+
+    def __init__(self) -> None:
+        self._lanes: Dict[str, _Lane] = {}
+        self._workers: list[asyncio.Task] = []
+        self._active: Dict[str, RunJob] = {}
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        s = get_settings()
+        self._lanes = {
+            INTERACTIVE: _Lane(INTERACTIVE, s.SCHED_INTERACTIVE_CONCURRENCY, s.SCHED_INTERACTIVE_QUEUE),
+            BULK: _Lane(BULK, s.SCHED_BULK_CONCURRENCY, s.SCHED_BULK_QUEUE),
+        }
+        for lane in self._lanes.values():
+            for i in range(lane.limit):
+                self._workers.append(asyncio.create_task(self._worker(lane), name=f"run-{lane.name}-{i}"))
+
+    async def stop(self) -> None:
+        """
+        Shutdown. Nothing new is admitted, and queued jobs are dropped: their runs go back to HALTED
+        (a queued resume; approve again) or end CANCELLED. Running jobs get SCHED_SHUTDOWN_GRACE_SECONDS
+        to finish, then are cancelled through run_controls, so they end CANCELLED ("shutdown") with
+        their checkpoint kept for POST .../continue. Every pending future is resolved.
+        """
+        lanes, self._lanes = self._lanes, {}
+        for lane in lanes.values():
+            for job in lane.queue.drain():
+                lane.cancelled += 1
+                await _abandon(job, *(("HALTED", None) if job.kind == "resume" else ("CANCELLED", SHUTDOWN)))
+                self._settle(job, {"run_id": job.run_id, "status": "CANCELLED", "reason": SHUTDOWN})
+
+        active = list(self._active.values())
+        pending = [j.future for j in active if j.future is not None and not j.future.done()]
+        if pending:
+            _, pending = await asyncio.wait(pending, timeout=get_settings().SCHED_SHUTDOWN_GRACE_SECONDS)
+        if pending:
+            # the runner records a reasoned cancel (run_cancelled event, CANCELLED row) before returning
+            cancelled = [j.future for j in active if j.future in pending and run_controls.cancel(j.run_id, SHUTDOWN)]
+            if cancelled:
+                await asyncio.wait(cancelled, timeout=5.0)
+
+        for t in self._workers:
+            t.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._active.clear()
+
+        # jobs cancelled before the runner could record it (e.g. not yet tracked by run_controls)
+        for job in active:
+            if job.future is not None and not job.future.done():
+                await _abandon(job, "CANCELLED", SHUTDOWN)
+                job.future.set_exception(RuntimeError("run scheduler stopped"))
+
+    @staticmethod
+    def _settle(job: RunJob, result: dict) -> None:
+        if job.future is not None and not job.future.done():
+            job.future.set_result(result)
+
+    def _lane(self, name: str) -> _Lane:
+        lane = self._lanes.get(name)
+        if lane is None:
+            raise RuntimeError(f"RunScheduler not started or unknown lane {name!r}")
+        return lane
+
+    def check_admission(self, lane: str) -> None:
+        """
+        Raises JobQueueFull (-> HTTP 429 + Retry-After) if `lane` can't take another job.
+        Call before writing run rows; nothing should await between this and submit().
+        """
+        ln = self._lane(lane)
+        if ln.is_full():
+            ln.rejected += 1
+            raise JobQueueFull(lane, ln.retry_after())
+
+    def submit(self, job: RunJob) -> asyncio.Future:
+        self.check_admission(job.lane)
+        ln = self._lane(job.lane)
+
+        fut = asyncio.get_running_loop().create_future()
+        # mark exceptions as retrieved: background callers never await the future (runner already logged the failure)
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        job.future = fut
+        job.enqueued_at = time.monotonic()
+
+        ln.admitted += 1
+        ln.queue.put(job)
+        return fut
+
+    def cancel_queued(self, run_id: str) -> RunJob | None:
+        """
+        Drops a job that hasn't started yet; its future resolves to a CANCELLED result.
+        Jobs already executing are cancelled through run_controls instead.
+        """
+        for lane in self._lanes.values():
+            job = lane.queue.remove(run_id)
+            if job is None:
+                continue
+            lane.cancelled += 1
+            self._settle(job, {"run_id": run_id, "status": "CANCELLED", "reason": "cancelled"})
+            return job
+        return None
+
+    def queued_run_ids(self) -> list[str]:
+        return [run_id for lane in self._lanes.values() for run_id in lane.queue.run_ids()]
+
+    def stats(self) -> dict:
+        return {name: lane.stats() for name, lane in self._lanes.items()}
+
+    async def _worker(self, lane: _Lane) -> None:
+        while True:
+            job = await lane.queue.get()
+            started = time.monotonic()
+            lane.record_wait(started - job.enqueued_at)
+            lane.active += 1
+            self._active[job.run_id] = job
+            try:
+                result = await job.factory()
+                if isinstance(result, dict) and result.get("status") == "CANCELLED":
+                    lane.cancelled += 1
+                else:
+                    lane.completed += 1
+                if job.future is not None and not job.future.done():
+                    job.future.set_result(result)
+            except Exception as e:
+                # runner already emitted run_failed/resume_failed and marked the run FAILED
+                lane.failed += 1
+                logger.exception("%s %s job failed (run_id=%s)", lane.name, job.kind, job.run_id)
+                if job.future is not None and not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                lane.record_run(time.monotonic() - started)
+                lane.active -= 1
+                self._active.pop(job.run_id, None)
+
+
+run_scheduler = RunScheduler()
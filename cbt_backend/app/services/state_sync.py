@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import copy
+import itertools
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+
+# process-wide so a version is never reused for a thread, even after its entry was evicted
+_versions = itertools.count(1)
+
+
+def json_diff(old: Any, new: Any, path: str = "") -> List[dict]:
+    """
+    RFC 6902 ops (add / remove / replace) turning `old` into `new`, both JSON-encoded values.
+
+    Tuned for GraphState: dicts recurse per key and append-only lists (drafts, trace) become
+    `add .../-` ops, so a node that appends one draft costs one draft on the wire, not all of them.
+    """
+    if old == new:
+        return []
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: List[dict] = []
+        for k in old.keys() - new.keys():
+            ops.append({"op": "remove", "path": f"{path}/{_escape(k)}"})
+        for k, v in new.items():
+            p = f"{path}/{_escape(k)}"
+            if k not in old:
+                ops.append({"op": "add", "path": p, "value": v})
+            else:
+                ops.extend(json_diff(old[k], v, p))
+        return ops
+
+    if isinstance(old, list) and isinstance(new, list) and len(new) >= len(old) and new[: len(old)] == old:
+        return [{"op": "add", "path": f"{path}/-", "value": v} for v in new[len(old):]]
+
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def apply_patch(doc: Any, ops: List[dict]) -> Any:
+    """
+    Applies json_diff output. Mirrors cbt-frontend/src/lib/jsonPatch.ts; used by tests and server-side replays.
+    """
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        parts = [_unescape(p) for p in op["path"].split("/")[1:]] if op["path"] else []
+        if not parts:
+            doc = copy.deepcopy(op.get("value"))
+            continue
+
+        parent = doc
+        for p in parts[:-1]:
+            parent = parent[int(p)] if isinstance(parent, list) else parent[p]
+        last = parts[-1]
+
+        if op["op"] == "remove":
+            if isinstance(parent, list):
+                parent.pop(int(last))
+            else:
+                parent.pop(last, None)
+        elif isinstance(parent, list):
+            value = copy.deepcopy(op["value"])
+            if last == "-":
+                parent.append(value)
+            elif op["op"] == "add":
+                parent.insert(int(last), value)
+            else:
+                parent[int(last)] = value
+        else:
+            parent[last] = copy.deepcopy(op["value"])
+    return doc
+
+
+def _escape(key: Any) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(part: str) -> str:
+    return part.replace("~1", "/").replace("~0", "~")
+
+
+@dataclass
+class SyncedState:
+    seq: int
+    state: Any
+
+
+class StateSyncRegistry:
+    """
+    Latest JSON-encoded state per thread plus its version (state_seq).
+
+    Delta subscribers get a snapshot on subscribe and then ops with base_seq/state_seq;
+    a client whose state_seq != base_seq asks for a resync instead of applying.
+    Bounded LRU: an evicted thread is re-seeded from the checkpointer on the next subscribe.
+    """
+
+    def __init__(self, max_threads: int = 1000) -> None:
+        self._max = max(1, max_threads)
+        self._states: "OrderedDict[str, SyncedState]" = OrderedDict()
+
+    def get(self, thread_id: str) -> SyncedState | None:
+        cur = self._states.get(thread_id)
+        if cur is not None:
+            self._states.move_to_end(thread_id)
+        return cur
+
+    def seed(self, thread_id: str, state: Any) -> SyncedState:
+        cur = self._states.get(thread_id)
+        if cur is not None:
+            return cur
+        return self._put(thread_id, SyncedState(seq=next(_versions), state=state))
+
+    def advance(self, thread_id: str, state: Any, *, diff: bool = True) -> Tuple[int, int, List[dict] | None]:
+        """
+        Records a new state; returns (base_seq, state_seq, ops).
+        ops is None when diff=False (no delta subscribers) or the previous state is unknown (base_seq 0).
+        """
+        prev = self._states.get(thread_id)
+        base_seq = prev.seq if prev is not None else 0
+        ops = json_diff(prev.state, state) if (diff and prev is not None) else None
+        cur = self._put(thread_id, SyncedState(seq=next(_versions), state=state))
+        return base_seq, cur.seq, ops
+
+    def discard(self, thread_id: str) -> None:
+        self._states.pop(thread_id, None)
+
+    def size(self) -> int:
+        return len(self._states)
+
+    def _put(self, thread_id: str, synced: SyncedState) -> SyncedState:
+        self._states[thread_id] = synced
+        self._states.move_to_end(thread_id)
+        while len(self._states) > self._max:
+            self._states.popitem(last=False)
+        return synced
+
+
+def snapshot_message(thread_id: str, synced: SyncedState | None) -> Dict[str, Any]:
+    return {
+        "type": "snapshot",
+        "thread_id": thread_id,
+        "state_seq": synced.seq if synced is not None else 0,
+        "state": synced.state if synced is not None else None,
+    }
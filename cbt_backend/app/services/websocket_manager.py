@@ -1,54 +1,639 @@
 import asyncio
-from typing import Any, Dict, Set
-from fastapi import WebSocket, WebSocketDisconnect
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, FrozenSet, Tuple
+from fastapi import WebSocket
+
+from app.core.config import get_settings
+from app.services.state_sync import StateSyncRegistry, snapshot_message
+from app.services.ws_broadcast import NO_STATE as _NO_STATE, LocalBroadcastBackend, make_backend
+from app.services.ws_replay import ReplayBuffer, merge_replay
+from app.utils.json_codec import dumps_msgpack, dumps_text
+
+
+logger = logging.getLogger(__name__)
+
+# frame kinds (how a frame may be treated when its connection falls behind)
+CONTROL = "control"   # lifecycle events (run_started, halt_required, run_completed, ...): never dropped, never reordered
+STATE = "state"       # node_update with a full `state`: a newer one for the same thread supersedes it
+DELTA = "delta"       # delta node_update: chained by base_seq; on overflow replaced by one snapshot
+DEBUG = "debug"       # state_update: latest wins
+HEARTBEAT = "heartbeat"  # server keepalive: latest wins
+SNAPSHOT = "snapshot" # placeholder, encoded from StateSyncRegistry when the writer reaches it
+DRAFT = "draft"       # draft_delta: a newer one for the same run and draft version merges into it (resent from
+                      # the manager's copy of the draft text when the writer reaches it)
+
+_COALESCIBLE = (STATE, DEBUG, HEARTBEAT, DRAFT)
+
+# Sec-WebSocket-Protocol for MessagePack binary frames (same event schema); without it frames are JSON text
+MSGPACK_SUBPROTOCOL = "cbt.msgpack"
+
+# never projected away: routing/ordering keys, and the state keys governed by the subscription's sync mode
+_ALWAYS_KEPT = frozenset({"type", "thread_id", "run_id", "seq", "state", "base_seq", "state_seq", "delta"})
+
+
+@dataclass(frozen=True)
+class ConnectionOptions:
+    """
+    What one subscription (a /ws/{thread_id} socket, or one thread on the multiplexed /ws) receives.
+      - delta: snapshot on subscribe, then `delta` ops (base_seq/state_seq) instead of a full `state` per event
+      - state: full `state` on state-bearing events (ignored with delta); off => events only
+      - debug: also receive the raw `state_update` stream
+      - types: only these event types (None = all). A delta subscription still gets the state changes of
+        filtered-out events, as `state_delta` frames, so its chain never breaks
+      - fields: keep only these top-level keys (plus type/thread_id/run_id/seq and the sync keys)
+    """
+    delta: bool = False
+    debug: bool = False
+    state: bool = True
+    types: FrozenSet[str] | None = None
+    fields: Tuple[str, ...] | None = None
+
+
+@dataclass(slots=True)
+class _Frame:
+    kind: str
+    data: str | bytes | None = None  # str => text frame, bytes => binary frame
+    thread_id: str | None = None
+    draft: Tuple[str, int, int] | None = None  # DRAFT: (run_id, version, offset)
+
+
+def _resend(draft: _Frame) -> _Frame:
+    # placeholder for draft_delta text from `draft`'s offset up to whatever has been generated since
+    return _Frame(DRAFT, None, draft.thread_id, draft.draft)
+
+
+class _Connection:
+    """
+    One socket's bounded outbound queue plus the writer task draining it, and its subscriptions
+    (one thread for /ws/{thread_id}; any number for the multiplexed /ws, whose frames carry thread_id).
+    broadcast() only appends here, so a slow client throttles itself instead of the run.
+    """
+
+    # tens of thousands of these per process: keep them small
+    __slots__ = (
+        "manager", "websocket", "mux", "binary", "encode", "subs", "last_seen",
+        "_queue", "_ready", "_drained", "_closed", "_writer",
+    )
+
+    def __init__(
+        self, manager: "WebSocketManager", websocket: WebSocket, *, mux: bool = False, binary: bool = False
+    ) -> None:
+        self.manager = manager
+        self.websocket = websocket
+        self.mux = mux
+        self.binary = binary
+        self.encode: Callable[[Any], str | bytes] = dumps_msgpack if binary else dumps_text
+        self.subs: Dict[str, ConnectionOptions] = {}
+        self.last_seen = time.monotonic()  # last inbound message (any text, including heartbeat replies)
+        self._queue: Deque[_Frame] = deque()
+        self._ready = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._closed = False
+        self._writer: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._writer = asyncio.create_task(self._write_loop(), name="ws-writer")
+
+    async def stop(self) -> None:
+        self._closed = True
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+
+    def offer(self, frame: _Frame) -> None:
+        if self._closed:
+            return
+        stats = self.manager.counters
+        q = self._queue
+
+        # superseded by this frame: drop the older one of the same kind and thread, searching only the
+        # trailing run of coalescible frames so nothing moves across a control event or a delta
+        if frame.kind in _COALESCIBLE:
+            for i in range(len(q) - 1, -1, -1):
+                f = q[i]
+                if f.kind == frame.kind and f.thread_id == frame.thread_id:
+                    if frame.kind == DRAFT:
+                        if f.draft[:2] != frame.draft[:2]:
+                            break  # another draft version
+                        frame = _resend(f)
+                    del q[i]
+                    stats["coalesced"] += 1
+                    break
+                if f.kind not in _COALESCIBLE:
+                    break
+        q.append(frame)
+
+        if len(q) > self.manager.queue_max:
+            self._shed()
+            if len(self._queue) > self.manager.queue_max:
+                # nothing left to shed but ordered control events: the peer isn't reading at all
+                stats["slow_disconnects"] += 1
+                self.manager._evict(self)
+                return
+
+        self._drained.clear()
+        self._ready.set()
+
+    def discard_thread(self, thread_id: str) -> None:
+        # unsubscribed: whatever is still queued for that thread is no longer wanted
+        kept = [f for f in self._queue if f.thread_id != thread_id]
+        self._queue.clear()
+        self._queue.extend(kept)
+
+    def _shed(self) -> None:
+        """
+        Overflow: keep control events in order, drop what newer data supersedes.
+        Per thread, only the newest full-state frame survives, where it was, so it still arrives before any
+        control event that followed it. The newest draft's deltas merge into one, at the last one's place.
+        Delta chains are replaced by a single snapshot placed at the end (the client skips older deltas).
+        """
+        stats = self.manager.counters
+        kept: Deque[_Frame] = deque()
+        last_state: Dict[str | None, _Frame] = {}
+        first_draft: Dict[str | None, _Frame] = {}
+        last_draft: Dict[str | None, _Frame] = {}
+        snapshot_for: Dict[str | None, None] = {}
+        for f in self._queue:
+            if f.kind == STATE:
+                last_state[f.thread_id] = f
+            elif f.kind == DRAFT:
+                first = first_draft.get(f.thread_id)
+                if first is None or first.draft[:2] != f.draft[:2]:
+                    first_draft[f.thread_id] = f
+                last_draft[f.thread_id] = f
+        for f in self._queue:
+            if f.kind == CONTROL or (f.kind == STATE and last_state[f.thread_id] is f):
+                kept.append(f)
+            elif f.kind == DRAFT and last_draft[f.thread_id] is f:
+                first = first_draft[f.thread_id]
+                kept.append(f if first is f else _resend(first))
+            elif f.kind in (DELTA, SNAPSHOT):
+                snapshot_for[f.thread_id] = None
+        kept.extend(_Frame(SNAPSHOT, thread_id=t) for t in snapshot_for)
+        stats["dropped"] += len(self._queue) - len(kept)
+        self._queue.clear()
+        self._queue.extend(kept)
+
+    async def drained(self) -> None:
+        await self._drained.wait()
+
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def _draft_data(self, frame: _Frame) -> str | bytes | None:
+        run_id, version, offset = frame.draft
+        current = self.manager.drafts.get(frame.thread_id)
+        if current is None or current[:2] != (run_id, version):
+            return None  # committed (node_update) or reset since: nothing left to show
+        message = {
+            "type": "draft_delta",
+            "run_id": run_id,
+            "node": current[2],
+            "version": version,
+            "offset": offset,
+            "text": current[3][offset:],
+        }
+        if self.mux:
+            message["thread_id"] = frame.thread_id
+        return self.encode(message)
+
+    async def _write_loop(self) -> None:
+        timeout = self.manager.send_timeout
+        try:
+            # stop() also sets _closed: on 3.11 wait_for() can swallow a cancel that lands as a send completes
+            while not self._closed:
+                if not self._queue:
+                    self._drained.set()
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+
+                frame = self._queue.popleft()
+                data = frame.data
+                if frame.kind == SNAPSHOT:
+                    synced = self.manager.state_sync.get(frame.thread_id)
+                    data = self.encode(snapshot_message(frame.thread_id, synced))
+                elif data is None:  # merged draft deltas
+                    data = self._draft_data(frame)
+                    if data is None:
+                        continue
+                if isinstance(data, bytes):
+                    await asyncio.wait_for(self.websocket.send_bytes(data), timeout=timeout)
+                else:
+                    await asyncio.wait_for(self.websocket.send_text(data), timeout=timeout)
+                self.manager.counters["sent"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # closed, reset, or stuck past WS_SEND_TIMEOUT_SECONDS
+            self.manager.counters["send_failures"] += 1
+            self._closed = True
+            self._drained.set()
+            self.manager._evict(self, code=1011)
+
+
+def _variant(mode: str, message: Dict[str, Any], state: Any, sync: tuple | None) -> Dict[str, Any]:
+    if mode == "full":
+        return {**message, "state": state}
+    if mode == "delta":
+        base_seq, state_seq, ops = sync
+        out = {k: v for k, v in message.items() if k != "patch"}
+        out.update({"base_seq": base_seq, "state_seq": state_seq, "delta": ops})
+        return out
+    if mode == "sync":
+        base_seq, state_seq, ops = sync
+        return {
+            "type": "state_delta",
+            "run_id": message.get("run_id"),
+            "seq": message.get("seq"),
+            "base_seq": base_seq,
+            "state_seq": state_seq,
+            "delta": ops,
+        }
+    return message
 
 
 class WebSocketManager:
     def __init__(self) -> None:
-        self._lock = asyncio.Lock()
-        self._rooms: Dict[str, Set[WebSocket]] = {}
+        s = get_settings()
+        self.queue_max = max(1, s.WS_SEND_QUEUE_MAX)
+        self.send_timeout = s.WS_SEND_TIMEOUT_SECONDS
+        self.max_subscriptions = max(1, s.WS_MUX_MAX_SUBSCRIPTIONS)
+        self.heartbeat_seconds = s.WS_HEARTBEAT_SECONDS
+        self.idle_timeout = s.WS_IDLE_TIMEOUT_SECONDS
+        self._conns: Dict[WebSocket, _Connection] = {}
+        # copy-on-write: a room is an immutable tuple replaced on (un)subscribe, so fan-out iterates it
+        # without a lock or a copy. Everything here runs on the event loop and mutations never await.
+        self._rooms: Dict[str, Tuple[_Connection, ...]] = {}
+        self._heartbeat_task: asyncio.Task | None = None
+        self.state_sync = StateSyncRegistry(max_threads=s.WS_STATE_CACHE_THREADS)
+        self.replay = ReplayBuffer(max_threads=s.WS_STATE_CACHE_THREADS, per_thread=s.WS_REPLAY_BUFFER_EVENTS)
+        # thread_id -> (run_id, version, node, text) of the draft being streamed, from its draft_delta events
+        # (local or relayed; kept whether or not anyone is subscribed yet); merged draft frames are resent from here
+        self.drafts: Dict[str, Tuple[str, int, str, str]] = {}
+        self.counters: Dict[str, int] = {
+            "sent": 0,
+            "coalesced": 0,
+            "dropped": 0,
+            "slow_disconnects": 0,
+            "send_failures": 0,
+            "replayed": 0,
+            "replayed_from_db": 0,
+            "evicted_idle": 0,
+            "heartbeats": 0,
+        }
+        self.backend: LocalBroadcastBackend = LocalBroadcastBackend()
+        self.backend.bind(self)
+
+    async def start(self) -> None:
+        """
+        Selects the cross-process backend (WS_BROADCAST_BACKEND); until then events stay in-process.
+        """
+        backend = make_backend()
+        backend.bind(self)
+        await backend.start()
+        self.backend = backend
+        if self.heartbeat_seconds > 0 and self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop(), name="ws-heartbeat")
+
+    async def stop(self) -> None:
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+            self._heartbeat_task = None
+        await self.backend.stop()
+        self.backend = LocalBroadcastBackend()
+        self.backend.bind(self)
+
+    def has_subscribers(self, thread_id: str) -> bool:
+        return bool(self._rooms.get(thread_id))
+
+    async def connect(
+        self,
+        thread_id: str,
+        websocket: WebSocket,
+        options: ConnectionOptions | None = None,
+        *,
+        after: tuple[str, int] | None = None,
+        load_events: Callable[[str, int], Awaitable[list]] | None = None,
+        subprotocol: str | None = None,
+    ) -> None:
+        """
+        A /ws/{thread_id} socket: accepted and subscribed to its one thread.
+        subprotocol: the one negotiated by the endpoint (MSGPACK_SUBPROTOCOL => binary frames).
+        """
+        await websocket.accept(subprotocol=subprotocol)
+        self._open(websocket, mux=False, subprotocol=subprotocol)
+        await self.subscribe(websocket, thread_id, options, after=after, load_events=load_events)
+
+    async def connect_mux(self, websocket: WebSocket, subprotocol: str | None = None) -> None:
+        """
+        A multiplexed /ws socket: starts with no subscriptions; see subscribe().
+        """
+        await websocket.accept(subprotocol=subprotocol)
+        self._open(websocket, mux=True, subprotocol=subprotocol)
+
+    def _open(self, websocket: WebSocket, *, mux: bool, subprotocol: str | None = None) -> _Connection:
+        conn = _Connection(self, websocket, mux=mux, binary=subprotocol == MSGPACK_SUBPROTOCOL)
+        self._conns[websocket] = conn
+        conn.start()
+        return conn
+
+    async def subscribe(
+        self,
+        websocket: WebSocket,
+        thread_id: str,
+        options: ConnectionOptions | None = None,
+        *,
+        after: tuple[str, int] | None = None,
+        load_events: Callable[[str, int], Awaitable[list]] | None = None,
+    ) -> bool:
+        """
+        Adds (or re-configures) the socket's subscription to thread_id. False if the socket is gone
+        or already at WS_MUX_MAX_SUBSCRIPTIONS.
+
+        after=(run_id, after_seq): reconnect catch-up. That run's events with a higher seq are queued
+        (marked `replayed`, without state) ahead of live traffic, from the replay buffer, or from
+        load_events (run_events) for whatever the buffer no longer holds. The caller follows up with a
+        snapshot for the current state.
+        """
+        conn = self._conns.get(websocket)
+        if conn is None:
+            return False
+        if thread_id not in conn.subs and len(conn.subs) >= self.max_subscriptions:
+            return False
 
-    async def connect(self, thread_id: str, websocket: WebSocket) -> None:
-        await websocket.accept()
-        async with self._lock:
-            self._rooms.setdefault(thread_id, set()).add(websocket)
+        older: list = []
+        if after is not None:
+            _, complete = self.replay.since(thread_id, *after)
+            if not complete and load_events is not None:
+                try:
+                    older = await load_events(*after)
+                except Exception:
+                    logger.warning("ws replay: loading events for run %s failed", after[0], exc_info=True)
+            if conn._closed:
+                return False
+
+        # nothing below awaits, so the replay ends exactly where live frames for this subscription begin
+        if after is not None:
+            recent, _ = self.replay.since(thread_id, *after)
+            events = merge_replay(older, recent)
+            # leave room for live traffic; the snapshot that follows covers state for anything cut here
+            events = events[-max(1, self.queue_max // 2):]
+            extra = {"replayed": True, "thread_id": thread_id} if conn.mux else {"replayed": True}
+            for m in events:
+                conn.offer(_Frame(CONTROL, conn.encode({**m, **extra}), thread_id))
+            self.counters["replayed"] += len(events)
+            self.counters["replayed_from_db"] += len(older)
+
+        new = thread_id not in conn.subs
+        conn.subs[thread_id] = options or ConnectionOptions()
+        if new:
+            self._rooms[thread_id] = self._rooms.get(thread_id, ()) + (conn,)
+        return True
+
+    def unsubscribe(self, websocket: WebSocket, thread_id: str) -> None:
+        conn = self._conns.get(websocket)
+        if conn is None or conn.subs.pop(thread_id, None) is None:
+            return
+        self._leave_room(thread_id, conn)
+        conn.discard_thread(thread_id)
+
+    def subscriptions(self, websocket: WebSocket) -> Dict[str, ConnectionOptions]:
+        conn = self._conns.get(websocket)
+        return dict(conn.subs) if conn is not None else {}
 
     async def disconnect(self, thread_id: str, websocket: WebSocket) -> None:
-        async with self._lock:
-            conns = self._rooms.get(thread_id)
-            if not conns:
-                return
-            conns.discard(websocket)
-            if not conns:
-                self._rooms.pop(thread_id, None)
+        # thread_id kept for the /ws/{thread_id} call sites; a socket's subscriptions all go with it
+        await self.release(websocket)
+
+    async def release(self, websocket: WebSocket) -> None:
+        conn = self._conns.pop(websocket, None)
+        if conn is None:
+            return
+        for thread_id in list(conn.subs):
+            self._leave_room(thread_id, conn)
+        await conn.stop()
 
-    async def broadcast(self, thread_id: str, message: Dict[str, Any]) -> None:
-        async with self._lock:
-            conns = list(self._rooms.get(thread_id, set()))
+    def _leave_room(self, thread_id: str, conn: _Connection) -> None:
+        room = tuple(c for c in self._rooms.get(thread_id, ()) if c is not conn)
+        if room:
+            self._rooms[thread_id] = room
+        else:
+            self._rooms.pop(thread_id, None)
 
-        if not conns:
+    def _evict(self, conn: _Connection, code: int = 1013) -> None:
+        if self._conns.get(conn.websocket) is conn:
+            self._conns.pop(conn.websocket, None)
+        for thread_id in list(conn.subs):
+            self._leave_room(thread_id, conn)
+        conn._closed = True
+        # closing the socket ends the endpoint's receive loop; don't wait for it here
+        asyncio.get_running_loop().create_task(self._close_quietly(conn, code))
+
+    async def _close_quietly(self, conn: _Connection, code: int) -> None:
+        try:
+            await asyncio.wait_for(conn.websocket.close(code=code), timeout=self.send_timeout)
+        except Exception:
+            pass
+        await conn.stop()
+
+    def touch(self, websocket: WebSocket) -> None:
+        # the endpoint calls this on every inbound message; that is the liveness signal sweep() checks
+        conn = self._conns.get(websocket)
+        if conn is not None:
+            conn.last_seen = time.monotonic()
+
+    def sweep(self, now: float | None = None) -> None:
+        """
+        One heartbeat tick: evicts connections silent for WS_IDLE_TIMEOUT_SECONDS (half-open TCP,
+        suspended tabs), then queues a `heartbeat` frame on the rest; clients answer with any message
+        (the bundled client sends "pong"). Heartbeats coalesce, so a slow client never piles them up.
+        """
+        now = time.monotonic() if now is None else now
+        frames = {
+            False: _Frame(HEARTBEAT, dumps_text({"type": "heartbeat"})),
+            True: _Frame(HEARTBEAT, dumps_msgpack({"type": "heartbeat"})),
+        }
+        for conn in list(self._conns.values()):
+            if self.idle_timeout > 0 and now - conn.last_seen > self.idle_timeout:
+                self.counters["evicted_idle"] += 1
+                self._evict(conn, code=1001)
+                continue
+            conn.offer(frames[conn.binary])
+            self.counters["heartbeats"] += 1
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                self.sweep()
+            except Exception:
+                logger.warning("ws heartbeat sweep failed", exc_info=True)
+
+    def send_text(self, websocket: WebSocket, text: str) -> None:
+        # replies to one socket (e.g. "pong", subscribe acks) go through its queue so the writer stays the only sender
+        conn = self._conns.get(websocket)
+        if conn is not None:
+            conn.offer(_Frame(CONTROL, text))
+
+    def send_json(self, websocket: WebSocket, message: Dict[str, Any]) -> None:
+        # a message object, in the socket's negotiated encoding
+        conn = self._conns.get(websocket)
+        if conn is not None:
+            conn.offer(_Frame(CONTROL, conn.encode(message)))
+
+    async def send_snapshot(
+        self,
+        thread_id: str,
+        websocket: WebSocket,
+        load_state: Callable[[], Awaitable[Any]],
+    ) -> None:
+        """
+        Full state for a delta subscriber. Served from the in-memory copy the runner keeps current;
+        only a thread with no recent run costs a checkpointer read (load_state).
+        Queued like any other frame, so it can't overtake deltas already on their way.
+        """
+        if self.state_sync.get(thread_id) is None:
+            state = await load_state()
+            if state is not None:
+                self.state_sync.seed(thread_id, state)
+        conn = self._conns.get(websocket)
+        if conn is not None:
+            conn.offer(_Frame(SNAPSHOT, thread_id=thread_id))
+
+    async def broadcast(
+        self,
+        thread_id: str,
+        message: Dict[str, Any],
+        *,
+        state: Any = _NO_STATE,
+        debug: bool = False,
+    ) -> None:
+        """
+        Encodes and enqueues; never waits on socket I/O (each connection's writer task does the sending)
+        or on the broadcast backend (which also delivers it to subscribers in other processes).
+
+        state: the JSON-encoded merged state after this event. Full-state subscriptions get it as `state`;
+        delta subscriptions get `delta` ops against their base_seq (and no redundant `patch`).
+        debug: only subscriptions that opted into the debug stream receive this message.
+        """
+        self.backend.publish(thread_id, message, state, debug)
+
+    def _track_draft(self, thread_id: str, message: Dict[str, Any]) -> None:
+        key = (message.get("run_id"), message.get("version"))
+        current = self.drafts.get(thread_id)
+        text = current[3] if current is not None and current[:2] == key else ""
+        offset = message.get("offset") or 0
+        self.drafts[thread_id] = (*key, message.get("node"), text[:offset] + (message.get("text") or ""))
+
+    def _fanout(self, thread_id: str, message: Dict[str, Any], state: Any, debug: bool) -> None:
+        # delivery to this process's sockets, for local and remote (backend) events alike
+        if not debug:
+            # kept even with nobody connected: that's the client that will reconnect with after_seq
+            self.replay.record(thread_id, message)
+
+        has_state = state is not _NO_STATE
+        mtype = message.get("type")
+        if mtype == "draft_delta":
+            self._track_draft(thread_id, message)
+        elif thread_id in self.drafts:
+            # the drafter's node_update commits the draft; a draft_reset or run end voids it
+            del self.drafts[thread_id]
+        targets = []
+        for conn in self._rooms.get(thread_id, ()):
+            opts = conn.subs[thread_id]
+            if debug and not opts.debug:
+                continue
+            if opts.types is not None and mtype not in opts.types:
+                # a delta chain must see every state change, even of events filtered out
+                if has_state and opts.delta:
+                    targets.append((conn, opts, "sync"))
+                continue
+            if has_state and opts.delta:
+                mode = "delta"
+            elif has_state and opts.state:
+                mode = "full"
+            else:
+                mode = "bare"
+            targets.append((conn, opts, mode))
+
+        sync = None
+        if has_state:
+            wants_delta = any(mode in ("delta", "sync") for _, _, mode in targets)
+            # always advanced (diff only if someone wants it) so late subscribers get a snapshot without a DB read
+            base_seq, state_seq, ops = self.state_sync.advance(thread_id, state, diff=wants_delta)
+            if ops is None:
+                ops = [{"op": "replace", "path": "", "value": state}]
+            sync = (base_seq, state_seq, ops)
+
+        if not targets:
             return
 
-        async def _send(ws: WebSocket):
-            # Don't let a slow client block "real-time" updates
-            await asyncio.wait_for(ws.send_json(message), timeout=1.5)
-
-        results = await asyncio.gather(*(_send(ws) for ws in conns), return_exceptions=True)
-
-        dead: list[WebSocket] = []
-        for ws, res in zip(conns, results):
-            if isinstance(res, (WebSocketDisconnect, asyncio.TimeoutError, RuntimeError, Exception)):
-                dead.append(ws)
-
-        if dead:
-            async with self._lock:
-                conns2 = self._rooms.get(thread_id)
-                if not conns2:
-                    return
-                for ws in dead:
-                    conns2.discard(ws)
-                if not conns2:
-                    self._rooms.pop(thread_id, None)
+        # serialize once per distinct variant (sync mode, thread_id tagging, projection, encoding), not once per socket
+        frames: Dict[tuple, _Frame] = {}
+        for conn, opts, mode in targets:
+            key = (mode, conn.mux, opts.fields, conn.binary)
+            frame = frames.get(key)
+            if frame is None:
+                out = _variant(mode, message, state, sync)
+                if conn.mux:
+                    out = {**out, "thread_id": thread_id}
+                if opts.fields is not None:
+                    keep = _ALWAYS_KEPT.union(opts.fields)
+                    out = {k: v for k, v in out.items() if k in keep}
+                draft = None
+                if debug:
+                    kind = DEBUG
+                elif mode == "full":
+                    kind = STATE
+                elif mode in ("delta", "sync"):
+                    kind = DELTA
+                elif mtype == "draft_delta":
+                    kind = DRAFT
+                    draft = (message.get("run_id"), message.get("version"), message.get("offset") or 0)
+                else:
+                    kind = CONTROL
+                frame = frames[key] = _Frame(kind, conn.encode(out), thread_id, draft)
+            conn.offer(frame)
+
+    async def flush(self, timeout: float | None = None) -> bool:
+        """
+        Waits until every connection's queue is empty (tests, graceful shutdown). False on timeout.
+        """
+        waits = [c.drained() for c in list(self._conns.values())]
+        if not waits:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.gather(*waits), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def stats(self) -> dict:
+        depths = [c.depth() for c in self._conns.values()]
+        return {
+            "rooms": len(self._rooms),
+            "connections": len(depths),
+            "msgpack_connections": sum(1 for c in self._conns.values() if c.binary),
+            "subscriptions": sum(len(room) for room in self._rooms.values()),
+            "evictions": {
+                "idle": self.counters["evicted_idle"],
+                "slow": self.counters["slow_disconnects"],
+                "send_failed": self.counters["send_failures"],
+            },
+            "queued_frames": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "state_cache_threads": self.state_sync.size(),
+            "replay_threads": self.replay.size(),
+            "draft_threads": len(self.drafts),
+            **{f"{k}_total": v for k, v in self.counters.items()},
+            "broadcast": self.backend.stats(),
+        }
 
 
 ws_manager = WebSocketManager()
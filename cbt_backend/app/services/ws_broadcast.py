@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from typing import TYPE_CHECKING, Any, Dict
+
+import orjson
+import psycopg
+from psycopg import sql
+
+from app.core.config import get_settings
+from app.utils.json_codec import dumps
+
+if TYPE_CHECKING:
+    from app.services.websocket_manager import WebSocketManager
+
+
+logger = logging.getLogger(__name__)
+
+# "no state attached to this event" (None is a valid state)
+NO_STATE = object()
+
+# pg_notify payloads are capped at 8000 bytes; stay below it with some room for the envelope
+_NOTIFY_HARD_LIMIT = 7900
+
+
+class LocalBroadcastBackend:
+    """
+    WS_BROADCAST_BACKEND=memory: events reach only the sockets of this process.
+    Correct for a single API process running its own runs.
+    """
+
+    name = "memory"
+
+    def __init__(self) -> None:
+        self._manager: "WebSocketManager | None" = None
+
+    def bind(self, manager: "WebSocketManager") -> None:
+        self._manager = manager
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def publish(self, thread_id: str, message: Dict[str, Any], state: Any, debug: bool) -> None:
+        self._manager._fanout(thread_id, message, state, debug)
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class PostgresBroadcastBackend(LocalBroadcastBackend):
+    """
+    WS_BROADCAST_BACKEND=postgres: every API replica, app.worker and the MCP server publish through
+    LISTEN/NOTIFY on DATABASE_URL, so a socket on any process sees runs executing on any other.
+
+    publish() fans out locally right away and queues the event for a publisher task (the runner never
+    waits on the database). Envelopes above WS_NOTIFY_INLINE_MAX_BYTES (full states, usually) are stored
+    as a `ws_broadcast` row in run_events and the notification carries only its id; listeners with no
+    subscriber for that thread skip the fetch. Those rows are pruned after WS_NOTIFY_REF_TTL_SECONDS.
+
+    Events published while a listener is reconnecting are lost to it; delta clients notice the gap
+    (base_seq mismatch) and resync.
+    """
+
+    name = "postgres"
+
+    def __init__(
+        self,
+        dsn: str,
+        channel: str = "cbt_ws",
+        *,
+        inline_max_bytes: int = 7000,
+        ref_ttl_seconds: float = 600.0,
+        outbox_max: int = 10000,
+    ) -> None:
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        self.inline_max_bytes = max(256, min(inline_max_bytes, _NOTIFY_HARD_LIMIT))
+        self.ref_ttl_seconds = ref_ttl_seconds
+        self.origin = uuid.uuid4().hex
+        self._outbox_max = outbox_max
+        self._outbox: asyncio.Queue | None = None
+        self._listening = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self.counters: Dict[str, int] = {
+            "published": 0,
+            "published_by_ref": 0,
+            "received": 0,
+            "received_by_ref": 0,
+            "skipped_by_ref": 0,
+            "outbox_dropped": 0,
+            "errors": 0,
+        }
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._outbox = asyncio.Queue(maxsize=self._outbox_max)
+        self._tasks = [
+            asyncio.create_task(self._listen_loop(), name="ws-notify-listen"),
+            asyncio.create_task(self._publish_loop(), name="ws-notify-publish"),
+        ]
+        # don't report ready before LISTEN is active, or the first events after startup are missed
+        try:
+            await asyncio.wait_for(self._listening.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            logger.warning("ws broadcast: LISTEN %s not active yet; retrying in the background", self.channel)
+
+    async def stop(self) -> None:
+        # give queued events a moment to go out before closing the publisher
+        if self._outbox is not None and not self._outbox.empty():
+            deadline = time.monotonic() + 2.0
+            while not self._outbox.empty() and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._listening.clear()
+
+    def publish(self, thread_id: str, message: Dict[str, Any], state: Any, debug: bool) -> None:
+        self._manager._fanout(thread_id, message, state, debug)
+
+        envelope: Dict[str, Any] = {"o": self.origin, "t": thread_id, "m": message, "d": debug}
+        if state is not NO_STATE:
+            envelope["s"] = state
+        try:
+            self._outbox.put_nowait(envelope)
+        except (AttributeError, asyncio.QueueFull):
+            # not started, or the database has been unreachable long enough to fill the outbox
+            self.counters["outbox_dropped"] += 1
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "listening": self._listening.is_set(),
+            "outbox_depth": self._outbox.qsize() if self._outbox is not None else 0,
+            **{f"{k}_total": v for k, v in self.counters.items()},
+        }
+
+    # ---- publisher ----
+
+    async def _publish_loop(self) -> None:
+        pending: Dict[str, Any] | None = None
+        last_prune = 0.0
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self.dsn, autocommit=True) as conn:
+                    while True:
+                        if pending is None:
+                            pending = await self._outbox.get()
+                        try:
+                            await self._send(conn, pending)
+                        except psycopg.OperationalError:
+                            raise  # connection trouble: reconnect and resend
+                        except psycopg.Error:
+                            # rejected (e.g. its run was deleted); resending won't help
+                            self.counters["errors"] += 1
+                            logger.warning("ws broadcast: dropping event the database rejected", exc_info=True)
+                        pending = None
+
+                        if time.monotonic() - last_prune > 60:
+                            last_prune = time.monotonic()
+                            await conn.execute(
+                                "DELETE FROM run_events WHERE event_type='ws_broadcast' AND ts < now() - make_interval(secs => %s)",
+                                [self.ref_ttl_seconds],
+                            )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.counters["errors"] += 1
+                logger.warning("ws broadcast: publisher connection failed; reconnecting", exc_info=True)
+                await asyncio.sleep(1.0)
+
+    async def _send(self, conn: psycopg.AsyncConnection, envelope: Dict[str, Any]) -> None:
+        payload = dumps(envelope)
+        if len(payload) <= self.inline_max_bytes:
+            await conn.execute("SELECT pg_notify(%s, %s)", [self.channel, payload.decode("utf-8")])
+            self.counters["published"] += 1
+            return
+
+        run_id = envelope["m"].get("run_id")
+        if not run_id:
+            # run_events rows hang off a run; nothing to reference an oversized run-less event by
+            self.counters["outbox_dropped"] += 1
+            logger.warning("ws broadcast: dropping oversized %s event without run_id", envelope["m"].get("type"))
+            return
+
+        # one round trip: store the envelope, notify its id (commit order = delivery order)
+        await conn.execute(
+            """
+            WITH e AS (
+              INSERT INTO run_events (run_id, seq, event_type, payload)
+              VALUES (%s, %s, 'ws_broadcast', %s::jsonb)
+              RETURNING id
+            )
+            SELECT pg_notify(%s, json_build_object('o', %s::text, 't', %s::text, 'ref', e.id)::text) FROM e
+            """,
+            [run_id, envelope["m"].get("seq"), payload.decode("utf-8"), self.channel, self.origin, envelope["t"]],
+        )
+        self.counters["published"] += 1
+        self.counters["published_by_ref"] += 1
+
+    # ---- listener ----
+
+    async def _listen_loop(self) -> None:
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self.dsn, autocommit=True) as conn, \
+                        await psycopg.AsyncConnection.connect(self.dsn, autocommit=True) as fetch_conn:
+                    await conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+                    self._listening.set()
+                    async for n in conn.notifies():
+                        await self._on_notify(n.payload, fetch_conn)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.counters["errors"] += 1
+                logger.warning("ws broadcast: listener connection failed; reconnecting", exc_info=True)
+            self._listening.clear()
+            await asyncio.sleep(1.0)
+
+    async def _on_notify(self, payload: str, fetch_conn: psycopg.AsyncConnection) -> None:
+        try:
+            envelope = orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            return
+        if envelope.get("o") == self.origin:
+            return  # already fanned out locally in publish()
+
+        thread_id = envelope.get("t")
+        if "ref" in envelope:
+            if not self._manager.has_subscribers(thread_id):
+                # nobody here to send it to; the cached state for this thread is now stale
+                self._manager.state_sync.discard(thread_id)
+                self.counters["skipped_by_ref"] += 1
+                return
+            cur = await fetch_conn.execute("SELECT payload FROM run_events WHERE id=%s", [envelope["ref"]])
+            row = await cur.fetchone()
+            if row is None:
+                return
+            envelope = row[0]
+            self.counters["received_by_ref"] += 1
+
+        self.counters["received"] += 1
+        self._manager._fanout(thread_id, envelope["m"], envelope.get("s", NO_STATE), bool(envelope.get("d")))
+
+
+def make_backend() -> LocalBroadcastBackend:
+    s = get_settings()
+    backend = s.WS_BROADCAST_BACKEND.strip().lower()
+
+    if backend == "memory":
+        return LocalBroadcastBackend()
+
+    if backend == "postgres":
+        return PostgresBroadcastBackend(
+            s.DATABASE_URL,
+            s.WS_NOTIFY_CHANNEL,
+            inline_max_bytes=s.WS_NOTIFY_INLINE_MAX_BYTES,
+            ref_ttl_seconds=s.WS_NOTIFY_REF_TTL_SECONDS,
+        )
+
+    raise ValueError(f"Unsupported WS_BROADCAST_BACKEND={s.WS_BROADCAST_BACKEND!r} (use 'memory' or 'postgres')")
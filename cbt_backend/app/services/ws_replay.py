@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Tuple
+
+
+class ReplayBuffer:
+    """
+    Recent WS events per thread for `?run_id=&after_seq=` reconnects: a ring of the messages as broadcast
+    (without `state`; the reconnect ends with one snapshot instead). Debug state_update frames aren't kept.
+
+    Bounded both ways: `per_thread` events per ring, LRU over `max_threads` threads. Whatever fell out
+    is served from run_events by the caller.
+    """
+
+    def __init__(self, max_threads: int = 1000, per_thread: int = 256) -> None:
+        self._max = max(1, max_threads)
+        self._per_thread = max(1, per_thread)
+        self._rings: "OrderedDict[str, Deque[Dict[str, Any]]]" = OrderedDict()
+
+    def record(self, thread_id: str, message: Dict[str, Any]) -> None:
+        if message.get("run_id") is None or not isinstance(message.get("seq"), int):
+            return
+        ring = self._rings.get(thread_id)
+        if ring is None:
+            ring = self._rings[thread_id] = deque(maxlen=self._per_thread)
+            while len(self._rings) > self._max:
+                self._rings.popitem(last=False)
+        else:
+            self._rings.move_to_end(thread_id)
+        ring.append(message)
+
+    def since(self, thread_id: str, run_id: str, after_seq: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        (events of run_id with seq > after_seq, complete). complete=False means some event after after_seq
+        isn't in the ring: evicted, sent before this process saw the run, or never recorded here (a by-ref
+        event skipped while nobody was subscribed). The caller then fills the gap from run_events.
+        """
+        ring = self._rings.get(thread_id) or ()
+        first_seq = None
+        expected = after_seq + 1
+        gap = False
+        events: List[Dict[str, Any]] = []
+        for m in ring:
+            if m["run_id"] != run_id:
+                continue
+            if first_seq is None:
+                first_seq = m["seq"]
+            if m["seq"] > after_seq:
+                events.append(m)
+                gap = gap or m["seq"] > expected
+                expected = max(expected, m["seq"] + 1)
+        complete = first_seq is not None and first_seq <= after_seq + 1 and not gap
+        return events, complete
+
+    def size(self) -> int:
+        return len(self._rings)
+
+
+def merge_replay(older: List[Dict[str, Any]], recent: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    run_events rows + ring entries, ordered by seq; the ring's copy wins where both have an event.
+    """
+    have = {m["seq"] for m in recent}
+    merged = [m for m in older if m.get("seq") not in have] + recent
+    merged.sort(key=lambda m: m["seq"])
+    return merged
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Any
+
+import orjson
+import ormsgpack
+
+
+# int keys (e.g. {1: ...} in scratch data) become strings, matching jsonable_encoder
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+_MSGPACK_OPTIONS = ormsgpack.OPT_NON_STR_KEYS
+
+
+def _default(x: Any) -> Any:
+    """
+    Whatever orjson doesn't handle natively. GraphState is TypedDicts (plain dicts), lists, str/number/bool
+    and the odd datetime/UUID/dataclass, all covered in C; this only sees exotic values.
+    """
+    if hasattr(x, "model_dump"):
+        return x.model_dump(mode="json")
+    if isinstance(x, (set, frozenset)):
+        return list(x)
+    if isinstance(x, Decimal):
+        return float(x)
+    if isinstance(x, bytes):
+        return x.decode("utf-8", "replace")
+    return str(x)
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+
+def dumps_text(obj: Any) -> str:
+    # WS text frames need str; decode once per event, not per socket
+    return dumps(obj).decode("utf-8")
+
+
+def dumps_msgpack(obj: Any) -> bytes:
+    # same schema as dumps() (datetimes/UUIDs as strings), for WS clients that negotiated cbt.msgpack
+    return ormsgpack.packb(obj, default=_default, option=_MSGPACK_OPTIONS)
+
+
+def to_jsonable(obj: Any) -> Any:
+    """
+    JSON-safe copy of obj (what a client would get after a JSON round trip).
+    One C-level dumps/loads is much cheaper than jsonable_encoder's per-node Python recursion.
+    """
+    return orjson.loads(dumps(obj))
@@ -0,0 +1,202 @@
+"""
+Standalone run worker: claims queued jobs from the `runs` table and executes them.
+
+    python -m app.worker --concurrency 4
+
+The API enqueues these jobs when RUN_JOB_BACKEND=postgres. Start as many worker processes
+(on as many hosts) as needed against the same DATABASE_URL; SELECT ... FOR UPDATE SKIP LOCKED
+guarantees each job is claimed by exactly one worker.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+from typing import Any, Dict
+
+from app.core.config import get_settings
+from app.graphs.registry import graph_registry
+from app.main import SESSIONS_TABLE_SQL
+from app.persistence.checkpointer import checkpointer_manager
+from app.persistence.db import advisory_lock, exec_sql
+from app.persistence.run_queue import cancel_requested_runs, claim_next_run, heartbeat_run, release_run
+from app.persistence.run_tables import RUNS_ALTER_SQL, RUNS_TABLE_SQL, RUN_EVENTS_TABLE_SQL, RUN_LLM_CALLS_TABLE_SQL
+from app.services.llm import close_llm_clients
+from app.services.run_control import run_controls
+from app.services.runner import continue_with_ws, resume_with_ws, run_with_ws
+from app.services.websocket_manager import ws_manager
+
+
+logger = logging.getLogger("app.worker")
+
+
+class RunQueueWorker:
+    def __init__(self, worker_id: str, concurrency: int) -> None:
+        self.worker_id = worker_id
+        self.concurrency = max(1, concurrency)
+        self._stop = asyncio.Event()
+        self._active: Dict[str, asyncio.Task] = {}
+
+    def request_stop(self) -> None:
+        self._stop.set()
+
+    async def _heartbeat(self, run_id: str) -> None:
+        # a missed beat is retried next tick; a dead heartbeat would let another worker re-claim the run
+        interval = get_settings().RUN_QUEUE_HEARTBEAT_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(heartbeat_run, run_id, self.worker_id)
+            except Exception:
+                logger.warning("heartbeat for run %s failed", run_id, exc_info=True)
+
+    async def _watch_cancellations(self) -> None:
+        # one query per tick for all of this worker's runs, instead of one per run
+        interval = get_settings().RUN_CANCEL_POLL_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            if not self._active:
+                continue
+            try:
+                flagged = await asyncio.to_thread(cancel_requested_runs, self.worker_id)
+            except Exception:
+                logger.warning("cancel watch: can't check for cancel requests", exc_info=True)
+                continue
+            for run_id in flagged:
+                if run_id in self._active:
+                    run_controls.cancel(run_id)
+
+    async def _execute(self, job: Dict[str, Any]) -> None:
+        run_id = job["run_id"]
+        thread_id = job["thread_id"]
+        payload = job.get("job_payload") or {}
+        deadline_seconds = payload.get("deadline_seconds")
+        hb = asyncio.create_task(self._heartbeat(run_id))
+        try:
+            if job["job_kind"] == "resume":
+                await resume_with_ws(
+                    thread_id=thread_id,
+                    run_id=run_id,
+                    approved=bool(payload.get("approved")),
+                    edited_text=payload.get("edited_text"),
+                    feedback=payload.get("feedback"),
+                    deadline_seconds=deadline_seconds,
+                )
+            elif job["job_kind"] == "continue":
+                await continue_with_ws(thread_id=thread_id, run_id=run_id, deadline_seconds=deadline_seconds)
+            else:
+                await run_with_ws(
+                    thread_id=thread_id,
+                    input_text=job.get("input_text") or "",
+                    require_human_approval=bool(job.get("require_human_approval")),
+                    run_id=run_id,
+                    deadline_seconds=deadline_seconds,
+                )
+        except asyncio.CancelledError:
+            try:
+                await asyncio.to_thread(release_run, run_id, self.worker_id)
+            except Exception:
+                # the claim goes stale instead and another worker picks the run up after RUN_QUEUE_STALE_SECONDS
+                logger.warning("can't release run %s", run_id, exc_info=True)
+            raise
+        except Exception:
+            # runner already logged run_failed/resume_failed and marked the row FAILED
+            logger.exception("job %s (%s) failed", run_id, job["job_kind"])
+        finally:
+            hb.cancel()
+
+    async def _idle(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self) -> None:
+        s = get_settings()
+        logger.info("worker %s started (concurrency=%s)", self.worker_id, self.concurrency)
+        watcher = asyncio.create_task(self._watch_cancellations())
+
+        while not self._stop.is_set():
+            if len(self._active) >= self.concurrency:
+                # all slots busy: wake on the first finished run (or poll tick, to notice stop requests)
+                await asyncio.wait(
+                    list(self._active.values()),
+                    timeout=s.RUN_QUEUE_POLL_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                continue
+
+            try:
+                job = await asyncio.to_thread(claim_next_run, self.worker_id, s.RUN_QUEUE_STALE_SECONDS)
+            except Exception:
+                logger.warning("can't claim from the run queue", exc_info=True)
+                job = None
+            if job is None:
+                await self._idle(s.RUN_QUEUE_POLL_SECONDS)
+                continue
+
+            run_id = job["run_id"]
+            task = asyncio.create_task(self._execute(job), name=f"run-{run_id}")
+            self._active[run_id] = task
+            task.add_done_callback(lambda _t, rid=run_id: self._active.pop(rid, None))
+
+        # drain: let in-flight runs finish, then hand leftovers back to the queue
+        pending = list(self._active.values())
+        if pending:
+            logger.info("draining %s in-flight run(s)", len(pending))
+            _, still_running = await asyncio.wait(pending, timeout=s.WORKER_SHUTDOWN_GRACE_SECONDS)
+            for t in still_running:
+                t.cancel()
+            await asyncio.gather(*still_running, return_exceptions=True)
+
+        watcher.cancel()
+
+
+async def _main(concurrency: int, worker_id: str) -> None:
+    if get_settings().async_execution:
+        await checkpointer_manager.astart()
+    else:
+        checkpointer_manager.start()
+
+    with advisory_lock():
+        exec_sql(SESSIONS_TABLE_SQL)
+        exec_sql(RUNS_TABLE_SQL)
+        exec_sql(RUN_EVENTS_TABLE_SQL)
+        exec_sql(RUNS_ALTER_SQL)
+        exec_sql(RUN_LLM_CALLS_TABLE_SQL)
+    graph_registry.warm(checkpointer_manager.get())
+    # no sockets here; with WS_BROADCAST_BACKEND=postgres the API processes relay our run events
+    await ws_manager.start()
+
+    worker = RunQueueWorker(worker_id=worker_id, concurrency=concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, worker.request_stop)
+        except NotImplementedError:
+            pass
+
+    try:
+        await worker.run()
+    finally:
+        await ws_manager.stop()
+        await close_llm_clients()
+        await checkpointer_manager.astop()
+
+
+def main() -> None:
+    s = get_settings()
+    parser = argparse.ArgumentParser(description="Run worker for the Postgres-backed runs queue.")
+    parser.add_argument("--concurrency", type=int, default=s.RUN_JOB_WORKERS, help="max runs executed at once")
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}:{os.getpid()}")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    asyncio.run(_main(concurrency=args.concurrency, worker_id=args.worker_id))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Per-event WebSocket encode cost vs room size.
+
+    python -m benchmarks.ws_encode [--iterations 200] [--drafts 3]
+
+"per-socket" is the old path: jsonable_encoder on the state, then send_json (json.dumps) for every socket.
+"encode-once" is the current path: one orjson round trip for the state, one dumps per message variant,
+the same text frame handed to every socket. Only serialization is timed; no sockets are involved.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+
+from fastapi.encoders import jsonable_encoder
+
+from app.utils.json_codec import dumps_text, to_jsonable
+
+
+ROOM_SIZES = (1, 10, 100, 1000)
+
+
+def _graph_state(n_drafts: int) -> dict:
+    now = datetime.now(timezone.utc)
+    md = "# Box Breathing\n\n## Steps\n" + "\n".join(f"{i}. Breathe in for four counts, hold, release." for i in range(120))
+    return {
+        "input_text": "Draft a 5-minute grounding exercise for anxiety.",
+        "require_human_approval": True,
+        "request": {"goal": "grounding", "constraints": ["5 minutes", "plain language"]},
+        "drafts": [
+            {"version": i + 1, "created_at": now, "markdown": md, "data": {"title": "Box Breathing", "steps": 120}}
+            for i in range(n_drafts)
+        ],
+        "reviews": {
+            "safety": {"safety_pass": True, "safety_score": 0.92, "flags": [], "required_changes": []},
+            "critic": {"quality_pass": True, "quality_score": 0.81, "issues": ["long"], "suggestions": ["trim"]},
+        },
+        "supervisor": {"action": "finalize", "rationale": "Both reviews pass."},
+        "metrics": {"iteration": n_drafts, "safety_score": 0.92, "quality_score": 0.81},
+        "scratchpad": {node: [f"{node} note {i}" for i in range(n_drafts)] for node in ("drafter", "safety", "critic")},
+        "trace": [{"node": "drafter", "ts": now, "summary": f"Draft v{i + 1}"} for i in range(n_drafts)],
+    }
+
+
+def _per_socket(state: dict, room: int) -> None:
+    encoded = jsonable_encoder(state)
+    message = {"type": "node_update", "seq": 7, "state": encoded}
+    for _ in range(room):
+        json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def _encode_once(state: dict, room: int) -> None:
+    encoded = to_jsonable(state)
+    text = dumps_text({"type": "node_update", "seq": 7, "state": encoded})
+    for _ in range(room):
+        _ = text  # fan-out hands the same frame to each socket
+
+
+def _time(fn, state: dict, room: int, iterations: int) -> float:
+    fn(state, room)  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(state, room)
+    return (time.perf_counter() - start) / iterations * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--drafts", type=int, default=3, help="draft versions in the state (message size)")
+    args = parser.parse_args()
+
+    state = _graph_state(args.drafts)
+    size_kb = len(dumps_text(to_jsonable(state))) / 1024
+    print(f"state: {args.drafts} drafts, {size_kb:.1f} KiB encoded; {args.iterations} events per cell\n")
+    print(f"{'room':>6} | {'per-socket ms/event':>20} | {'encode-once ms/event':>21} | {'speedup':>8}")
+    print("-" * 65)
+    for room in ROOM_SIZES:
+        iterations = max(5, args.iterations // max(1, room // 10))
+        old = _time(_per_socket, state, room, iterations)
+        new = _time(_encode_once, state, room, iterations)
+        print(f"{room:>6} | {old:>20.3f} | {new:>21.3f} | {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,33 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Annotated
+from contextlib import asynccontextmanager
+from typing import Annotated, AsyncIterator
 
 from mcp.server.fastmcp import FastMCP
 
+from app.core.config import get_settings
+from app.graphs.registry import graph_registry
 from app.main import SESSIONS_TABLE_SQL
 from app.persistence.checkpointer import checkpointer_manager
 from app.persistence.db import exec_sql
 from app.persistence.run_store import get_run
 from app.persistence.run_tables import RUNS_TABLE_SQL, RUN_EVENTS_TABLE_SQL
-from app.services.runner import resume_with_ws, run_with_ws
+from app.services.jobs import schedule_resume, schedule_run
+from app.services.scheduler import lane_for_mode, run_scheduler
+from app.services.websocket_manager import ws_manager
 from app.utils.ids import new_thread_id
 
 
+@asynccontextmanager
+async def _lifespan(_server: FastMCP) -> AsyncIterator[None]:
+    # Warm checkpointer, tables and the compiled graph at launch instead of on the first tool call.
+    await _bootstrap_backend()
+    yield
+
+
 # print('running mcp server\n')
-server = FastMCP("cerina-protocol-foundry")
+server = FastMCP("cerina-protocol-foundry", lifespan=_lifespan)
 
 _BOOTSTRAPPED = False
 _BOOTSTRAP_LOCK = asyncio.Lock()
@@ -30,10 +42,16 @@ async def _bootstrap_backend() -> None:
     async with _BOOTSTRAP_LOCK:
         if _BOOTSTRAPPED:
             return
-        checkpointer_manager.start()
+        if get_settings().async_execution:
+            await checkpointer_manager.astart()
+        else:
+            checkpointer_manager.start()
         exec_sql(SESSIONS_TABLE_SQL)
         exec_sql(RUNS_TABLE_SQL)
         exec_sql(RUN_EVENTS_TABLE_SQL)
+        graph_registry.warm(checkpointer_manager.get())
+        await ws_manager.start()
+        await run_scheduler.start()
         _BOOTSTRAPPED = True
 
 
@@ -51,12 +69,15 @@ async def _run_foundry(
 
     mode = "human_required" if require_human_approval else "auto"
     thread_id = await _create_session(mode=mode)
+    lane = lane_for_mode(mode)
 
-    result = await run_with_ws(
+    _, fut = await schedule_run(
         thread_id=thread_id,
         input_text=prompt,
         require_human_approval=require_human_approval,
+        lane=lane,
     )
+    result = await fut
     run_id = result["run_id"]
 
     if result["status"] == "HALTED":
@@ -71,13 +92,15 @@ async def _run_foundry(
                 "message": "Run halted awaiting approval. Re-run the MCP tool with auto_approve_on_halt=True to continue.",
             }
 
-        resume = await resume_with_ws(
+        resume_fut = await schedule_resume(
             thread_id=thread_id,
             run_id=run_id,
             approved=True,
             edited_text=None,
             feedback=None,
+            lane=lane,
         )
+        resume = await resume_fut
         run_id = resume["run_id"]
 
     row = get_run(run_id) or {}
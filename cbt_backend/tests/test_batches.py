@@ -0,0 +1,81 @@
+import asyncio
+import os
+
+import orjson
+import pytest
+
+from app.core.config import get_settings
+from app.main import SESSIONS_TABLE_SQL
+from app.persistence.db import exec_sql
+from app.persistence.run_store import update_run_from_state
+from app.persistence.run_tables import (
+    BATCHES_TABLE_SQL,
+    RUNS_ALTER_SQL,
+    RUNS_TABLE_SQL,
+    RUN_EVENTS_TABLE_SQL,
+    RUN_LLM_CALLS_TABLE_SQL,
+)
+from app.services import runner
+from app.services.batches import BatchRunner, progress
+from app.services.scheduler import run_scheduler
+
+
+@pytest.fixture(scope="module")
+def db_ready():
+    if not os.getenv("DATABASE_URL"):
+        pytest.skip("DATABASE_URL is not set; skipping batch tests.")
+
+    exec_sql(SESSIONS_TABLE_SQL)
+    exec_sql(RUNS_TABLE_SQL)
+    exec_sql(RUN_EVENTS_TABLE_SQL)
+    exec_sql(RUNS_ALTER_SQL)
+    exec_sql(RUN_LLM_CALLS_TABLE_SQL)
+    exec_sql(BATCHES_TABLE_SQL)
+
+
+@pytest.mark.asyncio
+async def test_batch_runs_prompts_with_bounded_parallelism_and_streams_ndjson(db_ready, monkeypatch):
+    s = get_settings()
+    monkeypatch.setattr(s, "SCHED_BULK_CONCURRENCY", 8)
+    in_flight = peak = 0
+
+    async def fake_run_with_ws(*, thread_id, input_text, require_human_approval, run_id, deadline_seconds):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05 if input_text != "p0" else 0.2)
+        in_flight -= 1
+        if input_text == "p3":
+            update_run_from_state(run_id, status="FAILED", error="boom")
+            raise RuntimeError("boom")
+        update_run_from_state(run_id, status="COMPLETED", state={"final": {"markdown": f"# {input_text}"}})
+        return {"run_id": run_id, "status": "COMPLETED"}
+
+    monkeypatch.setattr(runner, "run_with_ws", fake_run_with_ws)
+    await run_scheduler.start()
+    try:
+        batches = BatchRunner()
+        batch = await batches.start(
+            [f"p{i}" for i in range(6)], mode="auto", concurrency=2, require_human_approval=None, deadline_seconds=None
+        )
+        lines = [orjson.loads(chunk) async for chunk in batches.stream(batch)]
+    finally:
+        await run_scheduler.stop()
+
+    assert lines[0] == {"type": "batch", "batch_id": batch.batch_id, "total": 6, "concurrency": 2}
+    results = lines[1:-1]
+    assert sorted(r["index"] for r in results) == list(range(6))
+    assert results[0]["index"] != 0  # completion order: p0 is the slow one
+    assert peak == 2
+
+    by_index = {r["index"]: r for r in results}
+    assert by_index[1]["status"] == "COMPLETED" and by_index[1]["final_markdown"] == "# p1"
+    assert by_index[3]["status"] == "FAILED" and by_index[3]["error"] == "boom"
+
+    summary = lines[-1]
+    assert summary["type"] == "summary" and summary["status"] == "COMPLETED"
+    assert (summary["started"], summary["completed"], summary["failed"], summary["pending"]) == (6, 5, 1, 0)
+    assert summary["runs_per_minute"] > 0
+
+    assert progress(batch.batch_id)["finished"] == 6
+    assert progress("00000000-0000-0000-0000-000000000000") is None
@@ -0,0 +1,93 @@
+import asyncio
+import os
+
+import pytest
+import pytest_asyncio
+
+from app.graphs.nodes import critic, drafter, intent_guard, safety, supervisor
+from app.main import SESSIONS_TABLE_SQL
+from app.persistence.checkpointer import checkpointer_manager
+from app.persistence.db import exec_sql
+from app.persistence.run_store import get_latest_run, get_run
+from app.persistence.run_tables import RUNS_ALTER_SQL, RUNS_TABLE_SQL, RUN_EVENTS_TABLE_SQL
+from app.services.jobs import cancel_run
+from app.services.runner import continue_with_ws, run_with_ws
+from app.utils.ids import new_thread_id
+from tests.test_graph_async import _fake_chat_json_async
+
+
+@pytest_asyncio.fixture
+async def backend(monkeypatch):
+    if not os.getenv("DATABASE_URL"):
+        pytest.skip("DATABASE_URL is not set; skipping cancellation tests.")
+
+    exec_sql(SESSIONS_TABLE_SQL)
+    exec_sql(RUNS_TABLE_SQL)
+    exec_sql(RUN_EVENTS_TABLE_SQL)
+    exec_sql(RUNS_ALTER_SQL)
+    for mod in (intent_guard, safety, critic, supervisor, drafter):
+        monkeypatch.setattr(mod, "chat_json_async", _fake_chat_json_async)
+
+    await checkpointer_manager.astart()
+    yield
+    await checkpointer_manager.astop()
+
+
+def _session() -> str:
+    thread_id = new_thread_id()
+    exec_sql("INSERT INTO sessions (thread_id, mode) VALUES (%s, %s)", [thread_id, "auto"])
+    return thread_id
+
+
+@pytest.fixture
+def hanging_drafter(monkeypatch):
+    state = {"started": asyncio.Event(), "aborted": False}
+
+    async def hang(system, user, *, model=None, node=None):
+        state["started"].set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            state["aborted"] = True
+            raise
+
+    monkeypatch.setattr(drafter, "chat_json_async", hang)
+    return state
+
+
+@pytest.mark.asyncio
+async def test_cancel_aborts_inflight_llm_call_and_run_can_continue(backend, hanging_drafter, monkeypatch):
+    thread_id = _session()
+    task = asyncio.create_task(run_with_ws(thread_id, "grounding for anxiety", require_human_approval=False))
+    await asyncio.wait_for(hanging_drafter["started"].wait(), timeout=5)
+
+    run_id = get_latest_run(thread_id)["run_id"]
+    assert await cancel_run(run_id) == "CANCELLING"
+    result = await asyncio.wait_for(task, timeout=5)
+
+    assert result["status"] == "CANCELLED"
+    assert hanging_drafter["aborted"]
+    assert get_run(run_id)["status"] == "CANCELLED"
+    assert await cancel_run(run_id) is None
+
+    # checkpoint survived: continuing re-runs the drafter and finishes the graph
+    monkeypatch.setattr(drafter, "chat_json_async", _fake_chat_json_async)
+    exec_sql("UPDATE runs SET status='RUNNING' WHERE run_id=%s", [run_id])
+    result = await continue_with_ws(thread_id, run_id)
+    assert result["status"] == "COMPLETED"
+    assert get_run(run_id)["final_markdown"].startswith("# Grounding")
+
+
+@pytest.mark.asyncio
+async def test_deadline_marks_run_cancelled(backend, hanging_drafter):
+    thread_id = _session()
+    result = await asyncio.wait_for(
+        run_with_ws(thread_id, "grounding for anxiety", require_human_approval=False, deadline_seconds=0.2),
+        timeout=5,
+    )
+
+    assert result == {"run_id": result["run_id"], "status": "CANCELLED", "reason": "deadline_exceeded"}
+    assert hanging_drafter["aborted"]
+    row = get_run(result["run_id"])
+    assert row["status"] == "CANCELLED"
+    assert row["error"] == "deadline_exceeded"
@@ -0,0 +1,113 @@
+import json
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.core.config import get_settings
+from app.graphs.nodes.drafter import drafter_node_async
+from app.services import draft_stream, llm
+from app.services.draft_stream import JsonStringFieldReader, track_drafts
+from app.services.llm_resilience import LLMResilience
+
+MARKDOWN = '# Grounding\n\n1. Name 5 things you "see".\n2. Breathe \\ exhale — café 😀\n'
+RESPONSE = json.dumps({"markdown": MARKDOWN, "data": {"title": "Grounding"}})  # ensure_ascii: \u escapes
+
+
+def test_reader_decodes_the_field_across_arbitrary_chunk_boundaries():
+    reader = JsonStringFieldReader("markdown")
+    out = "".join(reader.feed(c) for c in RESPONSE)
+    assert out == MARKDOWN and reader.done
+
+    reader = JsonStringFieldReader("markdown")
+    assert reader.feed('{"data": {}, "markdown"') == ""
+    assert reader.feed(': "ab\\') == "ab"  # escape split across chunks is held back
+    assert reader.feed('ncd"}') == "\ncd"
+
+
+@pytest.mark.asyncio
+async def test_streaming_drafter_broadcasts_deltas_then_commits_the_draft(monkeypatch):
+    s = get_settings()
+    monkeypatch.setattr(s, "DRAFTER_STREAMING", True)
+    monkeypatch.setattr(s, "DRAFT_DELTA_INTERVAL_MS", 0)
+    monkeypatch.setattr(llm, "resilience", LLMResilience())
+
+    async def chunks():
+        for i in range(0, len(RESPONSE), 7):
+            delta = SimpleNamespace(content=RESPONSE[i : i + 7])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+    async def create(*, stream=False, **kw):
+        assert stream and kw["stream_options"] == {"include_usage": True}
+        return chunks()
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(llm, "get_async_openai_client", lambda: client)
+
+    sent = []
+
+    async def broadcast(thread_id, message, **kw):
+        sent.append((thread_id, message))
+
+    monkeypatch.setattr(draft_stream, "ws_manager", SimpleNamespace(broadcast=broadcast))
+
+    with track_drafts("t-draft", "r-draft"):
+        out = await drafter_node_async({"input_text": "grounding please", "metrics": {}})
+
+    assert out["drafts"][0]["markdown"] == MARKDOWN.strip()
+    assert len(sent) > 3 and {t for t, _ in sent} == {"t-draft"}
+    text = ""
+    for _, m in sent:
+        assert (m["type"], m["run_id"], m["version"], m["offset"]) == ("draft_delta", "r-draft", 1, len(text))
+        assert "seq" not in m
+        text += m["text"]
+    assert text == MARKDOWN
+
+    # outside the runner (or with streaming off) the drafter makes a plain call and broadcasts nothing
+    sent.clear()
+
+    async def plain(*a, **kw):
+        return {"markdown": "# Plain"}
+
+    monkeypatch.setattr("app.graphs.nodes.drafter.chat_json_async", plain)
+    out = await drafter_node_async({"input_text": "grounding please", "metrics": {}})
+    assert out["drafts"][0]["markdown"] == "# Plain" and sent == []
+
+
+@pytest.mark.asyncio
+async def test_failed_stream_resets_the_partial_draft_before_the_fallback(monkeypatch):
+    s = get_settings()
+    monkeypatch.setattr(s, "DRAFTER_STREAMING", True)
+    monkeypatch.setattr(s, "DRAFT_DELTA_INTERVAL_MS", 0)
+    monkeypatch.setattr(llm, "resilience", LLMResilience())
+    sent = []
+
+    async def chunks():
+        for i in range(0, 40, 8):
+            delta = SimpleNamespace(content=RESPONSE[i : i + 8])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        raise openai.APIConnectionError(request=httpx.Request("POST", "http://llm.test/v1/chat/completions"))
+
+    async def create(*, stream=False, **kw):
+        if stream:
+            return chunks()
+        sent.append(("t-draft", {"type": "fallback_call"}))
+        message = SimpleNamespace(content=json.dumps({"markdown": "# Retried"}))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(llm, "get_async_openai_client", lambda: client)
+
+    async def broadcast(thread_id, message, **kw):
+        sent.append((thread_id, message))
+
+    monkeypatch.setattr(draft_stream, "ws_manager", SimpleNamespace(broadcast=broadcast))
+
+    with track_drafts("t-draft", "r-draft"):
+        out = await drafter_node_async({"input_text": "grounding please", "metrics": {}})
+
+    assert out["drafts"][0]["markdown"] == "# Retried"
+    types = [m["type"] for _, m in sent]
+    assert types[0] == "draft_delta" and types[-2:] == ["draft_reset", "fallback_call"]
+    assert sent[-2][1] == {"type": "draft_reset", "run_id": "r-draft", "node": "drafter", "version": 1}
@@ -0,0 +1,71 @@
+import pytest
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.types import Command
+
+from app.graphs.builder import build_graph
+from app.graphs.nodes import critic, drafter, intent_guard, safety, supervisor
+
+
+async def _fake_chat_json_async(system: str, user: str, *, model=None, node=None) -> dict:
+    return {
+        "relevant": True,
+        "markdown": "# Grounding\n\n## Steps\n1. Breathe.",
+        "data": {"title": "Grounding"},
+        "safety_pass": True,
+        "safety_score": 0.9,
+        "quality_pass": True,
+        "quality_score": 0.9,
+        "action": "finalize",
+    }
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    for mod in (intent_guard, drafter, safety, critic, supervisor):
+        monkeypatch.setattr(mod, "chat_json_async", _fake_chat_json_async)
+
+
+@pytest.mark.asyncio
+async def test_async_graph_halts_and_resumes(fake_llm):
+    graph = build_graph(async_nodes=True).compile(checkpointer=InMemorySaver())
+    config = {"configurable": {"thread_id": "async-test"}}
+
+    nodes = []
+    async for update in graph.astream(
+        {"input_text": "grounding for anxiety", "require_human_approval": True}, config, stream_mode="updates"
+    ):
+        nodes.extend(update.keys())
+
+    assert nodes == ["intake", "intent_guard", "drafter", "safety", "critic", "supervisor", "finalize", "__interrupt__"]
+
+    async for _ in graph.astream(Command(resume={"approved": True}), config, stream_mode="updates"):
+        pass
+
+    snap = await graph.aget_state(config)
+    assert snap.values["status"] == "COMPLETED"
+    assert snap.values["final"]["markdown"].startswith("# Grounding")
+
+
+@pytest.mark.asyncio
+async def test_stream_pairs_each_update_with_merged_state(fake_llm):
+    from app.services.runner import _stream_updates
+
+    graph = build_graph(async_nodes=True).compile(checkpointer=InMemorySaver())
+    config = {"configurable": {"thread_id": "stream-test"}}
+
+    seen = []
+    async for update, state in _stream_updates(
+        graph, {"input_text": "grounding for anxiety", "require_human_approval": True}, config
+    ):
+        seen.append((next(iter(update)), state))
+
+    by_node = dict(seen)
+    assert by_node["intake"]["drafts"] == []
+    assert len(by_node["drafter"]["drafts"]) == 1
+    assert "safety" in by_node["safety"]["reviews"]
+    assert by_node["__interrupt__"]["final"]["markdown"].startswith("# Grounding")
+
+    # resume: the first state is the checkpoint being resumed, no separate read needed
+    async for update, state in _stream_updates(graph, Command(resume={"approved": True}), config):
+        assert next(iter(update)) == "human_review"
+        assert state["status"] == "COMPLETED"
@@ -0,0 +1,61 @@
+from langgraph.checkpoint.memory import InMemorySaver
+
+from app.core.config import get_settings
+from app.graphs import registry
+from app.persistence import checkpointer as checkpointer_module
+from app.persistence.checkpointer import CheckpointerManager
+
+
+def _counting_build(monkeypatch) -> list[bool]:
+    built: list[bool] = []
+    real = registry.build_graph
+
+    def build_graph(async_nodes: bool = False):
+        built.append(async_nodes)
+        return real(async_nodes=async_nodes)
+
+    monkeypatch.setattr(registry, "build_graph", build_graph)
+    return built
+
+
+def test_warm_compiles_once_per_checkpointer_and_variant(monkeypatch):
+    built = _counting_build(monkeypatch)
+    graphs = registry.CompiledGraphRegistry()
+    a, b = InMemorySaver(), InMemorySaver()
+
+    graphs.warm(a, "async")
+    graphs.warm(a, "async")
+    assert graphs.get(a, "async") is graphs.get(a, "async")
+    assert built == [True]
+
+    graphs.warm(a, "sync")
+    graphs.warm(b, "async")
+    assert graphs.get(a, "sync") is not graphs.get(a, "async")
+    assert graphs.get(b, "async") is not graphs.get(a, "async")
+    assert built == [True, False, True] and graphs.size() == 3
+
+
+def test_stopping_the_checkpointer_drops_its_graphs(monkeypatch, tmp_path):
+    built = _counting_build(monkeypatch)
+    graphs = registry.CompiledGraphRegistry()
+    monkeypatch.setattr(checkpointer_module, "graph_registry", graphs)
+    monkeypatch.setattr(get_settings(), "CHECKPOINT_BACKEND", "sqlite")
+    monkeypatch.setattr(get_settings(), "SQLITE_PATH", str(tmp_path / "checkpoints.sqlite"))
+    other = InMemorySaver()
+    graphs.warm(other, "sync")
+
+    manager = CheckpointerManager()
+    saver = manager.start()
+    graphs.warm(saver, "sync")
+    graphs.warm(saver, "async")
+    assert graphs.size() == 3
+
+    manager.stop()
+    assert graphs.size() == 1
+    graphs.warm(other, "sync")  # untouched entries stay compiled
+    assert len(built) == 3
+
+    fresh = manager.start()
+    graphs.warm(fresh, "sync")
+    assert len(built) == 4 and graphs.size() == 2
+    manager.stop()
@@ -0,0 +1,63 @@
+import pytest
+
+from app.core.config import get_settings
+from app.graphs.nodes import intent_guard
+from app.services.intent_classifier import IntentModel, build_artifact, classify_locally, load_seed
+
+
+def test_bundled_lexicon_decides_clear_cases_and_defers_the_rest():
+    relevant, reason = classify_locally("Create a grounding exercise for panic attacks")
+    assert relevant and reason.startswith("local classifier v1")
+    assert classify_locally("hello") is None
+    # rejects go to the LLM unless a reject threshold is configured
+    assert classify_locally("Write a python script to parse a csv file") is None
+
+
+@pytest.mark.asyncio
+async def test_emotionally_loaded_requests_are_left_to_the_llm(monkeypatch):
+    calls = []
+
+    async def llm(system, user, *, model=None, node=None):
+        calls.append(user)
+        return {"relevant": True, "reason": "emotional support request"}
+
+    monkeypatch.setattr(intent_guard, "chat_json_async", llm)
+    for text in (
+        "write a poem about my sadness",  # the lexicon scores these below 0.1
+        "what is the capital of France, I feel anxious",
+        "I can't sleep because I keep worrying about work, write me a story",
+    ):
+        result = classify_locally(text)
+        assert result is None or result[0]
+        out = await intent_guard.intent_guard_node_async({"input_text": text})
+        assert out["is_cbt_relevant"]
+    assert len(calls) == 3
+
+    # a calibrated model can opt back in to local rejects
+    monkeypatch.setattr(get_settings(), "INTENT_REJECT_THRESHOLD", 0.1)
+    relevant, _ = classify_locally("Write a python script to parse a csv file")
+    assert not relevant
+
+
+def test_training_is_reproducible():
+    examples = load_seed()
+    a, b = build_artifact(examples, "t"), build_artifact(examples, "t")
+    assert a["weights"] == b["weights"]
+    model = IntentModel("t", a["bias"], a["weights"])
+    assert all((model.probability(text) > 0.5) == label for text, label in examples)
+
+
+@pytest.mark.asyncio
+async def test_confident_requests_skip_the_llm(monkeypatch):
+    calls = []
+
+    async def llm(system, user, *, model=None, node=None):
+        calls.append(user)
+        return {"relevant": False, "reason": "llm says no"}
+
+    monkeypatch.setattr(intent_guard, "chat_json_async", llm)
+    out = await intent_guard.intent_guard_node_async({"input_text": "Build an exposure ladder for flying"})
+    assert out["is_cbt_relevant"] and not calls
+
+    out = await intent_guard.intent_guard_node_async({"input_text": "hello"})
+    assert not out["is_cbt_relevant"] and len(calls) == 1
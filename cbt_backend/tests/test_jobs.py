@@ -0,0 +1,232 @@
+import asyncio
+
+import pytest
+
+from app.core.config import get_settings
+from app.services import jobs
+from app.services.run_control import CANCELLED, run_controls
+from app.services.scheduler import BULK, INTERACTIVE, JobQueueFull, RunJob, RunScheduler
+
+
+@pytest.fixture
+def small_lanes(monkeypatch):
+    s = get_settings()
+    monkeypatch.setattr(s, "SCHED_INTERACTIVE_CONCURRENCY", 2)
+    monkeypatch.setattr(s, "SCHED_INTERACTIVE_QUEUE", 2)
+    monkeypatch.setattr(s, "SCHED_BULK_CONCURRENCY", 1)
+    monkeypatch.setattr(s, "SCHED_BULK_QUEUE", 10)
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_in_background_and_survive_failures(small_lanes):
+    sched = RunScheduler()
+    await sched.start()
+
+    done: list[str] = []
+
+    async def ok(name: str):
+        await asyncio.sleep(0.01)
+        done.append(name)
+        return name
+
+    async def boom():
+        raise RuntimeError("llm exploded")
+
+    failed = sched.submit(RunJob(run_id="r1", thread_id="t", kind="run", factory=boom))
+    sched.submit(RunJob(run_id="r2", thread_id="t", kind="run", factory=lambda: ok("r2")))
+    await asyncio.sleep(0.05)
+    fut = sched.submit(RunJob(run_id="r3", thread_id="t", kind="run", factory=lambda: ok("r3")))
+
+    assert await fut == "r3"
+    with pytest.raises(RuntimeError):
+        await failed
+    assert sorted(done) == ["r2", "r3"]
+    lane = sched.stats()[INTERACTIVE]
+    assert lane["active"] == 0
+    assert lane["failed_total"] == 1
+    await sched.stop()
+
+
+@pytest.mark.asyncio
+async def test_full_lane_rejects_with_retry_after(small_lanes):
+    sched = RunScheduler()
+    await sched.start()
+    gate = asyncio.Event()
+
+    for i in range(4):  # 2 picked up by the lane's executors, 2 buffered
+        sched.submit(RunJob(run_id=f"r{i}", thread_id="t", kind="run", factory=gate.wait))
+        await asyncio.sleep(0)
+
+    with pytest.raises(JobQueueFull) as exc:
+        sched.submit(RunJob(run_id="overflow", thread_id="t", kind="run", factory=gate.wait))
+    assert exc.value.retry_after >= 1
+    assert sched.stats()[INTERACTIVE]["rejected_total"] == 1
+
+    # the bulk lane is independent
+    sched.submit(RunJob(run_id="b1", thread_id="t", kind="run", lane=BULK, factory=gate.wait))
+
+    gate.set()
+    await sched.stop()
+
+
+@pytest.mark.asyncio
+async def test_lane_serves_threads_round_robin(small_lanes):
+    sched = RunScheduler()
+    await sched.start()
+    gate = asyncio.Event()
+    order: list[str] = []
+
+    async def record(name: str):
+        order.append(name)
+
+    # occupy the single bulk executor, then queue a burst from "a" before one job from "b"
+    sched.submit(RunJob(run_id="hold", thread_id="x", kind="run", lane=BULK, factory=gate.wait))
+    await asyncio.sleep(0)
+    futs = [
+        sched.submit(RunJob(run_id=f"a{i}", thread_id="a", kind="run", lane=BULK, factory=lambda i=i: record(f"a{i}")))
+        for i in range(3)
+    ]
+    futs.append(sched.submit(RunJob(run_id="b0", thread_id="b", kind="run", lane=BULK, factory=lambda: record("b0"))))
+    assert sched.stats()[BULK]["queue_depth"] == 4
+
+    gate.set()
+    await asyncio.gather(*futs)
+    assert order == ["a0", "b0", "a1", "a2"]
+    await sched.stop()
+
+
+@pytest.mark.asyncio
+async def test_cancel_queued_job_never_runs(small_lanes):
+    sched = RunScheduler()
+    await sched.start()
+    gate = asyncio.Event()
+    ran: list[str] = []
+
+    async def record():
+        ran.append("q")
+
+    sched.submit(RunJob(run_id="hold", thread_id="x", kind="run", lane=BULK, factory=gate.wait))
+    await asyncio.sleep(0)
+    fut = sched.submit(RunJob(run_id="q", thread_id="y", kind="run", lane=BULK, factory=record))
+
+    assert sched.cancel_queued("q") is not None
+    assert (await fut)["status"] == "CANCELLED"
+    assert sched.cancel_queued("hold") is None  # already executing: run_controls' job
+
+    gate.set()
+    await asyncio.sleep(0.01)
+    assert ran == []
+    assert sched.stats()[BULK]["cancelled_total"] == 1
+    await sched.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_settles_queued_and_running_jobs(small_lanes, monkeypatch):
+    from app.services import scheduler
+    from app.services.run_control import run_controls
+
+    monkeypatch.setattr(get_settings(), "SCHED_SHUTDOWN_GRACE_SECONDS", 0.05)
+    settled: dict[str, tuple] = {}
+    monkeypatch.setattr(scheduler, "abandon_run", lambda run_id, status, error: settled.update({run_id: (status, error)}))
+
+    async def runner_like(run_id: str):
+        # what _drive does: a reasoned cancel ends the run CANCELLED
+        with run_controls.track(run_id):
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                asyncio.current_task().uncancel()
+                return {"run_id": run_id, "status": "CANCELLED", "reason": run_controls.pop_reason(run_id)}
+
+    async def quick():
+        return {"status": "COMPLETED"}
+
+    sched = RunScheduler()
+    await sched.start()
+    running = sched.submit(RunJob(run_id="tracked", thread_id="t1", kind="run", factory=lambda: runner_like("tracked")))
+    stuck = sched.submit(RunJob(run_id="untracked", thread_id="t2", kind="run", factory=asyncio.Event().wait))
+    await asyncio.sleep(0.01)
+    queued = sched.submit(RunJob(run_id="queued", thread_id="t3", kind="run", factory=quick))
+    resume = sched.submit(RunJob(run_id="resume", thread_id="t4", kind="resume", factory=quick))
+
+    await sched.stop()
+
+    assert (await running)["reason"] == "shutdown"
+    with pytest.raises(RuntimeError):
+        await stuck
+    assert (await queued)["status"] == (await resume)["status"] == "CANCELLED"
+    assert settled == {
+        "queued": ("CANCELLED", "shutdown"),
+        "resume": ("HALTED", None),
+        "untracked": ("CANCELLED", "shutdown"),
+    }
+
+
+@pytest.mark.asyncio
+async def test_cancel_watch_acts_on_requests_made_through_another_process(small_lanes, monkeypatch):
+    # another replica served POST /runs/{id}/cancel: all this process sees is cancel_requested_at
+    monkeypatch.setattr(get_settings(), "RUN_CANCEL_POLL_SECONDS", 0.01)
+    sched = RunScheduler()
+    await sched.start()
+    monkeypatch.setattr(jobs, "run_scheduler", sched)
+    flagged: set[str] = set()
+    checked: list[list[str]] = []
+    recorded: list[str] = []
+    monkeypatch.setattr(jobs, "cancel_requested_among", lambda ids: checked.append(ids) or sorted(flagged & set(ids)))
+    monkeypatch.setattr(jobs, "_record_queued_cancel", recorded.append)
+    gate = asyncio.Event()
+
+    async def drive():  # what the runner does with a reasoned cancel
+        with run_controls.track("busy"):
+            try:
+                await gate.wait()
+            except asyncio.CancelledError:
+                asyncio.current_task().uncancel()
+                return {"status": "CANCELLED", "reason": run_controls.pop_reason("busy")}
+
+    busy = sched.submit(RunJob(run_id="busy", thread_id="x", kind="run", lane=BULK, factory=drive))
+    await asyncio.sleep(0)
+    queued = sched.submit(RunJob(run_id="queued", thread_id="y", kind="run", lane=BULK, factory=gate.wait))
+    watch = asyncio.create_task(jobs.watch_cancellations())
+    await asyncio.sleep(0.05)
+    assert not busy.done() and not queued.done()
+    assert sorted(checked[-1]) == ["busy", "queued"]
+
+    flagged.update({"busy", "queued"})
+    assert (await asyncio.wait_for(queued, 1))["status"] == "CANCELLED"
+    assert await asyncio.wait_for(busy, 1) == {"status": "CANCELLED", "reason": CANCELLED}
+    assert recorded == ["queued"]
+    assert sched.stats()[BULK]["cancelled_total"] == 2
+
+    watch.cancel()
+    await asyncio.gather(watch, return_exceptions=True)
+    await sched.stop()
+
+
+@pytest.mark.asyncio
+async def test_run_row_is_rolled_back_when_the_lane_fills_during_admission(small_lanes, monkeypatch):
+    sched = RunScheduler()
+    await sched.start()
+    monkeypatch.setattr(jobs, "run_scheduler", sched)
+    gate = asyncio.Event()
+    deleted: list[str] = []
+
+    def create_run(**kw):
+        # meanwhile, on the loop, other requests take every slot of the lane
+        for i in range(4):
+            loop.call_soon_threadsafe(
+                sched.submit, RunJob(run_id=f"other{i}", thread_id="x", kind="run", factory=gate.wait)
+            )
+        return "mine"
+
+    loop = asyncio.get_running_loop()
+    monkeypatch.setattr(jobs, "create_run", create_run)
+    monkeypatch.setattr(jobs, "delete_run", deleted.append)
+    sched.check_admission(INTERACTIVE)
+
+    with pytest.raises(JobQueueFull):
+        await jobs.schedule_run("t", "hi", False, lane=INTERACTIVE)
+    assert deleted == ["mine"]
+
+    gate.set()
+    await sched.stop()
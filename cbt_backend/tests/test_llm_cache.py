@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import get_settings
+from app.services import llm
+from app.services.llm_cache import LLMResponseCache
+
+
+@pytest.mark.asyncio
+async def test_response_cache_serves_opted_in_nodes_from_both_tiers(monkeypatch, tmp_path):
+    s = get_settings()
+    monkeypatch.setattr(s, "LLM_CACHE_BACKEND", "sqlite")
+    monkeypatch.setattr(s, "LLM_CACHE_SQLITE_PATH", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(s, "LLM_CACHE_NODES", "safety")
+    monkeypatch.setattr(s, "LLM_CACHE_MAX_ENTRIES", 1)
+
+    calls = []
+
+    async def create(*, model, messages, **kw):
+        calls.append(messages[1]["content"])
+        message = SimpleNamespace(content='{"safety_score": %d}' % len(calls))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(llm, "get_async_openai_client", lambda: client)
+    cache = LLMResponseCache()
+    monkeypatch.setattr(llm, "llm_cache", cache)
+
+    first = await llm.chat_json_async("sys", "draft A", node="safety")
+    first["mutated"] = True
+    assert await llm.chat_json_async("sys", "draft A", node="safety") == {"safety_score": 1}
+    await llm.chat_json_async("sys", "draft B", node="safety")  # pushes A out of the 1-entry LRU
+    assert await llm.chat_json_async("sys", "draft A", node="safety") == {"safety_score": 1}  # from sqlite
+    assert await llm.chat_json_async("sys", "draft A", node="drafter") == {"safety_score": 3}  # not opted in
+    assert calls == ["draft A", "draft B", "draft A"]
+
+    stats = cache.stats()
+    assert stats["backend"] == "sqlite"
+    assert (stats["memory_hits_total"], stats["persistent_hits_total"], stats["misses_total"]) == (1, 1, 2)
@@ -0,0 +1,111 @@
+import random
+
+import pytest
+from langgraph.checkpoint.memory import InMemorySaver
+
+from app.core.config import get_settings
+from app.graphs.builder import build_graph
+from app.services import llm
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_fake import latency_for
+from app.services.llm_provider import Completion
+from app.services.llm_resilience import LLMResilience, LLMUnavailable
+
+
+@pytest.fixture
+def fake_provider(monkeypatch):
+    s = get_settings()
+    monkeypatch.setattr(s, "LLM_PROVIDER", "fake")
+    monkeypatch.setattr(s, "LLM_RETRY_BASE_SECONDS", 0.0)
+    monkeypatch.setattr(llm, "resilience", LLMResilience())
+    monkeypatch.setattr(llm, "llm_cache", LLMResponseCache())
+    monkeypatch.setattr(llm, "_fake", None)
+    return s
+
+
+async def _run(thread_id: str) -> dict:
+    graph = build_graph(async_nodes=True).compile(checkpointer=InMemorySaver())
+    config = {"configurable": {"thread_id": thread_id}}
+    nodes = []
+    async for update in graph.astream(
+        {"input_text": "grounding for panic on the bus", "require_human_approval": False}, config, stream_mode="updates"
+    ):
+        nodes.extend(update.keys())
+    return {"nodes": nodes, **(await graph.aget_state(config)).values}
+
+
+@pytest.mark.asyncio
+async def test_fake_provider_drives_the_whole_graph_deterministically(fake_provider, monkeypatch):
+    monkeypatch.setattr(fake_provider, "LLM_FAKE_REVISE_RATE", 1.0)  # every review fails -> revision loop
+
+    first = await _run("fake-1")
+    assert first["nodes"].count("drafter") == 3 and first["nodes"][-1] == "finalize"
+    assert first["final"]["markdown"].startswith("# Grounding for panic on the bus")
+    assert first["reviews"]["safety"]["safety_pass"] is False
+    assert first["drafts"][-1]["data"]["steps"]
+
+    second = await _run("fake-2")
+    assert second["final"]["markdown"] == first["final"]["markdown"]
+    assert llm.pool_stats()["fake"]["requests"] >= 11  # drafter, safety, critic x3 + supervisor x2
+
+
+@pytest.mark.asyncio
+async def test_fake_provider_injects_failures_into_the_retry_path(fake_provider, monkeypatch):
+    monkeypatch.setattr(fake_provider, "LLM_FAKE_ERROR_RATE", 1.0)
+    monkeypatch.setattr(fake_provider, "LLM_MAX_RETRIES", 2)
+    with pytest.raises(LLMUnavailable):
+        await llm.chat_json_async("sys", "Return ONLY JSON: {relevant: boolean, reason: string}", node="intent_guard")
+    assert llm.resilience.counters["retries"] == 2
+    assert llm.pool_stats()["fake"] == {"requests": 3, "errors": 3, "timeouts": 0}
+
+    # a stalled request lasts until the node's timeout, then counts as one
+    monkeypatch.setattr(fake_provider, "LLM_FAKE_ERROR_RATE", 0.0)
+    monkeypatch.setattr(fake_provider, "LLM_FAKE_TIMEOUT_RATE", 1.0)
+    monkeypatch.setattr(fake_provider, "LLM_NODE_TIMEOUTS", "critic=0.01")
+    monkeypatch.setattr(fake_provider, "LLM_MAX_RETRIES", 0)
+    with pytest.raises(LLMUnavailable):
+        await llm.chat_json_async("sys", "{quality_pass: bool, quality_score: number}", node="critic")
+    assert llm.resilience.counters["timeouts"] == 1
+
+
+def test_latency_distributions_and_provider_validation(fake_provider, monkeypatch):
+    monkeypatch.setattr(fake_provider, "LLM_FAKE_LATENCY", "default=fixed:250,drafter=uniform:1000:2000")
+    rng = random.Random(0)
+    assert latency_for("safety", rng) == 0.25
+    assert all(1.0 <= latency_for("drafter", rng) <= 2.0 for _ in range(50))
+
+    monkeypatch.setattr(fake_provider, "LLM_FAKE_LATENCY", "default=lognormal:800:0")
+    assert latency_for("critic", rng) == pytest.approx(0.8)
+
+    monkeypatch.setattr(fake_provider, "LLM_FAKE_LATENCY", "default=gamma:1")
+    with pytest.raises(ValueError):
+        latency_for("critic", rng)
+
+    monkeypatch.setattr(fake_provider, "LLM_PROVIDER", "anthropic")
+    with pytest.raises(ValueError):
+        llm.get_provider()
+
+
+@pytest.mark.asyncio
+async def test_chat_json_calls_through_the_provider_interface(fake_provider, monkeypatch):
+    # no SDK shape needed: a provider only answers complete_json / stream_json
+    class Echo:
+        name = "echo"
+
+        async def complete_json(self, *, model, system, user, temperature, timeout):
+            return Completion(content=f'{{"user": "{user}"}}')
+
+        async def stream_json(self, *, model, system, user, temperature, timeout, on_text):
+            for part in ('{"user": ', f'"{user}"}}'):
+                await on_text(part)
+            return Completion(content=f'{{"user": "{user}"}}')
+
+    monkeypatch.setattr(llm, "get_provider", Echo)
+    assert await llm.chat_json_async("sys", "hi", node="critic") == {"user": "hi"}
+    parts: list[str] = []
+
+    async def on_text(text):
+        parts.append(text)
+
+    assert await llm.chat_json_stream_async("sys", "yo", on_text=on_text, node="drafter") == {"user": "yo"}
+    assert "".join(parts) == '{"user": "yo"}'
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from app.core.config import get_settings
+from app.services import llm
+
+_BODY = (
+    b'{"id":"c1","object":"chat.completion","created":0,"model":"m",'
+    b'"choices":[{"index":0,"finish_reason":"stop","message":{"role":"assistant","content":"{\\"ok\\": true}"}}]}'
+)
+
+
+@pytest.mark.asyncio
+async def test_async_calls_share_keepalive_connections(monkeypatch):
+    connections = 0
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # a minimal OpenAI-compatible endpoint that keeps connections alive
+        nonlocal connections
+        connections += 1
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = next(
+                int(line.split(b":")[1]) for line in head.split(b"\r\n") if line.lower().startswith(b"content-length")
+            )
+            await reader.readexactly(length)
+            await asyncio.sleep(0.05)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\ncontent-length: %d\r\n\r\n%s" % (len(_BODY), _BODY)
+            )
+            await writer.drain()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    s = get_settings()
+    monkeypatch.setattr(s, "OPENAI_API_KEY", "test")
+    monkeypatch.setattr(s, "OPENAI_BASE_URL", f"http://127.0.0.1:{port}/v1")
+    monkeypatch.setattr(s, "LLM_MAX_CONNECTIONS", 3)
+    await llm.close_llm_clients()
+    try:
+        for _ in range(2):
+            results = await asyncio.gather(*(llm.chat_json_async("sys", f"u{i}") for i in range(6)))
+            assert results == [{"ok": True}] * 6
+
+        stats = llm.pool_stats()
+        assert connections <= 3  # 12 calls over the capped pool, second wave on warm connections
+        assert stats["requests_total"] >= 12 and stats["in_flight"] == 0
+        assert stats["connections"]["open"] == connections and stats["connections"]["active"] == 0
+    finally:
+        await llm.close_llm_clients()
+        server.close()
+
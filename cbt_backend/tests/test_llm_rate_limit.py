@@ -0,0 +1,80 @@
+import asyncio
+import os
+
+import pytest
+
+from app.core.config import get_settings
+from app.services.llm_rate_limit import LLMRateLimiter, PostgresRateTier
+from app.utils.ids import new_thread_id
+
+
+@pytest.mark.asyncio
+async def test_over_budget_callers_wait_in_arrival_order(monkeypatch):
+    s = get_settings()
+    monkeypatch.setattr(s, "LLM_RATE_LIMIT_BACKEND", "memory")
+    monkeypatch.setattr(s, "LLM_RPM", 0)
+    monkeypatch.setattr(s, "LLM_TPM", 0)
+    monkeypatch.setattr(s, "LLM_RATE_LIMITS", "m=0/60000")  # 1000 tokens/s, one minute of burst
+    limiter = LLMRateLimiter()
+
+    assert await limiter.acquire("other", 10**6) == 0.0  # no limits configured for it
+    assert await limiter.acquire("m", 10**6) == 60000  # clamped to the bucket, drains it
+    order = []
+
+    async def caller(i: int) -> None:
+        await limiter.acquire("m", 100)
+        order.append(i)
+
+    started = asyncio.get_running_loop().time()
+    await asyncio.gather(*(caller(i) for i in range(3)))
+    assert order == [0, 1, 2]
+    assert asyncio.get_running_loop().time() - started >= 0.25  # ~0.1s per 100 tokens
+
+    stats = limiter.stats()
+    assert (stats["acquired_total"], stats["waited_total"], stats["waiting"]) == (4, 3, 0)
+    assert 0.29 <= stats["wait_seconds_max"] <= 0.31
+
+    # usage below the estimate is credited back to the bucket
+    limiter.settle("m", 60000, 0)
+    assert await asyncio.wait_for(limiter.acquire("m", 100), 0.05) == 100
+
+
+def test_postgres_buckets_are_shared(monkeypatch):
+    if not os.getenv("DATABASE_URL"):
+        pytest.skip("DATABASE_URL is not set; skipping persistence tests.")
+    model = f"test-{new_thread_id()}"
+    a, b = PostgresRateTier(), PostgresRateTier()  # two processes' view of one budget
+    limits = (60.0, 6000.0)
+
+    assert a.reserve(model, limits, 1, 3000) == 0.0
+    assert b.reserve(model, limits, 1, 3000) == 0.0
+    wait = a.reserve(model, limits, 1, 3000)
+    assert 29.0 <= wait <= 30.0  # 3000 tokens in debt at 100/s
+
+    b.credit(model, limits, 1, 3000)
+    assert b.reserve(model, limits, 1, 100) < 1.1
+
+
+@pytest.mark.asyncio
+async def test_failed_attempts_hand_their_reservation_back(monkeypatch):
+    from app.services import llm
+    from app.services.llm_cache import LLMResponseCache
+    from app.services.llm_resilience import LLMResilience, LLMUnavailable
+
+    s = get_settings()
+    monkeypatch.setattr(s, "LLM_PROVIDER", "fake")
+    monkeypatch.setattr(s, "LLM_FAKE_ERROR_RATE", 1.0)
+    monkeypatch.setattr(s, "LLM_MAX_RETRIES", 3)
+    monkeypatch.setattr(s, "LLM_RETRY_BASE_SECONDS", 0.0)
+    monkeypatch.setattr(s, "LLM_RATE_LIMIT_BACKEND", "memory")
+    monkeypatch.setattr(s, "LLM_RATE_LIMITS", "m=0/60000")
+    monkeypatch.setattr(llm, "rate_limiter", LLMRateLimiter())
+    monkeypatch.setattr(llm, "resilience", LLMResilience())
+    monkeypatch.setattr(llm, "llm_cache", LLMResponseCache())
+    monkeypatch.setattr(llm, "_fake", None)
+
+    with pytest.raises(LLMUnavailable):
+        await llm.chat_json_async("sys", "{quality_pass: bool}", model="m", node="critic")
+    tokens = llm.rate_limiter._tier._buckets["m"][1]
+    assert llm.rate_limiter.stats()["acquired_total"] == 4
+    assert tokens > 60000 - 1  # four reservations, all credited back
@@ -0,0 +1,129 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.core.config import get_settings
+from app.services import llm
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_resilience import LLMResilience, LLMUnavailable
+
+_REQUEST = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+
+
+def _ok(content: str):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _server_error():
+    return openai.InternalServerError("boom", response=httpx.Response(500, request=_REQUEST), body=None)
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """
+    Scripted async client: each call pops the next step (an exception to raise, a delay, or content).
+    """
+    s = get_settings()
+    monkeypatch.setattr(s, "LLM_CACHE_BACKEND", "none")
+    monkeypatch.setattr(s, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(s, "LLM_RETRY_BASE_SECONDS", 0.001)
+    monkeypatch.setattr(s, "LLM_BREAKER_FAILURES", 3)
+    monkeypatch.setattr(s, "LLM_BREAKER_RESET_SECONDS", 60.0)
+    monkeypatch.setattr(llm, "resilience", LLMResilience())
+    monkeypatch.setattr(llm, "llm_cache", LLMResponseCache())
+
+    script: list = []
+    calls: list = []
+
+    async def create(*, model, messages, timeout, **kw):
+        calls.append(timeout.read)
+        step = script.pop(0) if script else '{"ok": true}'
+        if isinstance(step, BaseException):
+            raise step
+        if isinstance(step, tuple):
+            delay, step = step
+            await asyncio.sleep(delay)
+        return _ok(step)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(llm, "get_async_openai_client", lambda: client)
+    return SimpleNamespace(script=script, calls=calls)
+
+
+@pytest.mark.asyncio
+async def test_retryable_errors_are_retried_with_the_node_timeout(fake_llm, monkeypatch):
+    monkeypatch.setattr(get_settings(), "LLM_NODE_TIMEOUTS", "safety=7")
+    fake_llm.script.extend([_server_error(), openai.APITimeoutError(request=_REQUEST), '{"safety_pass": true}'])
+
+    assert await llm.chat_json_async("sys", "u", node="safety") == {"safety_pass": True}
+    assert fake_llm.calls == [7.0, 7.0, 7.0]
+    stats = llm.resilience.stats()
+    assert (stats["retries_total"], stats["timeouts_total"], stats["unavailable_total"]) == (2, 1, 0)
+
+    # a bad request is the caller's problem: no retry, and it isn't turned into LLMUnavailable
+    bad = openai.BadRequestError("nope", response=httpx.Response(400, request=_REQUEST), body=None)
+    fake_llm.script.append(bad)
+    with pytest.raises(openai.BadRequestError):
+        await llm.chat_json_async("sys", "u", node="safety")
+    assert len(fake_llm.calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_and_nodes_fall_back(fake_llm):
+    from app.graphs.nodes.drafter import drafter_node_async
+
+    fake_llm.script.extend([_server_error()] * 3)
+    with pytest.raises(LLMUnavailable):
+        await llm.chat_json_async("sys", "u", node="critic")
+    assert llm.resilience.stats()["breakers"] == {get_settings().OPENAI_MODEL: "open"}
+
+    # open breaker: the drafter fails fast (no request) and ships the template draft
+    out = await drafter_node_async({"input_text": "help with panic", "metrics": {}})
+    assert len(fake_llm.calls) == 3
+    assert out["drafts"][0]["markdown"].startswith("# CBT Exercise")
+    stats = llm.resilience.stats()
+    assert (stats["unavailable_total"], stats["short_circuited_total"]) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_slow_call_is_hedged_and_the_loser_cancelled(fake_llm, monkeypatch):
+    s = get_settings()
+    monkeypatch.setattr(s, "LLM_HEDGE", True)
+    monkeypatch.setattr(s, "LLM_HEDGE_MIN_SAMPLES", 3)
+    for _ in range(3):
+        llm.resilience.observe("critic", 0.02)
+
+    fake_llm.script.extend([(5.0, '{"from": "first"}'), (0.0, '{"from": "hedge"}')])
+    assert await asyncio.wait_for(llm.chat_json_async("sys", "u", node="critic"), 2) == {"from": "hedge"}
+    stats = llm.resilience.stats()
+    assert (stats["hedged_total"], stats["hedge_wins_total"]) == (1, 1)
+    assert llm.pool_stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_outage_halts_auto_runs_for_human_review_instead_of_publishing(fake_llm):
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    from app.graphs.builder import build_graph
+
+    breaker = llm.resilience.breaker(get_settings().OPENAI_MODEL)
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == "open"
+
+    graph = build_graph(async_nodes=True).compile(checkpointer=InMemorySaver())
+    config = {"configurable": {"thread_id": "outage-auto"}}
+    nodes = []
+    async for update in graph.astream(
+        {"input_text": "grounding for anxiety", "require_human_approval": False}, config, stream_mode="updates"
+    ):
+        nodes.extend(update.keys())
+
+    assert nodes[-2:] == ["finalize", "__interrupt__"]
+    snap = await graph.aget_state(config)
+    assert snap.next == ("human_review",)
+    assert snap.values["reviews"]["safety"]["flags"] == ["llm_unavailable"]
+    assert fake_llm.calls == []  # every call short-circuited
@@ -1,11 +1,13 @@
+import asyncio
 import os
+from types import SimpleNamespace
 
 import pytest
 
 from app.main import SESSIONS_TABLE_SQL
 from app.persistence.db import exec_sql
 from app.persistence.run_store import create_run, get_run, set_pending_interrupt
-from app.persistence.run_tables import RUNS_ALTER_SQL, RUNS_TABLE_SQL, RUN_EVENTS_TABLE_SQL
+from app.persistence.run_tables import RUNS_ALTER_SQL, RUNS_TABLE_SQL, RUN_EVENTS_TABLE_SQL, RUN_LLM_CALLS_TABLE_SQL
 from app.utils.ids import new_thread_id
 
 
@@ -20,6 +22,7 @@ def db_ready():
     exec_sql(RUNS_TABLE_SQL)
     exec_sql(RUN_EVENTS_TABLE_SQL)
     exec_sql(RUNS_ALTER_SQL)
+    exec_sql(RUN_LLM_CALLS_TABLE_SQL)
 
 
 def test_pending_interrupt_round_trip(db_ready):
@@ -38,3 +41,75 @@ def test_pending_interrupt_round_trip(db_ready):
     row2 = get_run(run_id)
     assert row2 is not None
     assert row2["pending_interrupt"] is None
+
+
+@pytest.mark.asyncio
+async def test_llm_calls_are_attributed_to_the_run(db_ready, monkeypatch):
+    from app.api.routes_runs import get_run_detail
+    from app.core.config import get_settings
+    from app.services import llm
+    from app.services.llm_cache import LLMResponseCache
+    from app.services.llm_usage import track_run
+
+    monkeypatch.setattr(get_settings(), "LLM_PRICES", "m=1000000/2000000")  # $1 / $2 per token, easy sums
+    monkeypatch.setattr(get_settings(), "LLM_CACHE_NODES", "safety")
+    monkeypatch.setattr(llm, "llm_cache", LLMResponseCache())
+
+    async def create(*, model, messages, **kw):
+        usage = SimpleNamespace(prompt_tokens=len(messages[1]["content"]), completion_tokens=1, total_tokens=0)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="{}"))], usage=usage)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(llm, "get_async_openai_client", lambda: client)
+
+    thread_id = new_thread_id()
+    exec_sql("INSERT INTO sessions (thread_id, mode) VALUES (%s, %s)", [thread_id, "human_optional"])
+    run_id = create_run(thread_id=thread_id, input_text="usage check", require_human_approval=False)
+
+    await llm.chat_json_async("sys", "outside any run", model="m", node="drafter")
+    with track_run(run_id):
+        # node tasks inherit the run from the runner's context
+        await asyncio.gather(
+            asyncio.ensure_future(llm.chat_json_async("sys", "draft", model="m", node="drafter")),
+            llm.chat_json_async("sys", "review", model="m", node="safety"),
+        )
+        await llm.chat_json_async("sys", "review", model="m", node="safety")  # cache hit
+
+    usage = get_run_detail(run_id)["llm_usage"]
+    assert usage["total"]["calls"] == 3
+    assert usage["total"]["prompt_tokens"] == len("draft") + len("review")
+    assert usage["total"]["cost_usd"] == 11 + 2 * 2
+    assert usage["by_node"]["safety"]["calls"] == 2 and usage["by_node"]["safety"]["cached"] == 1
+    assert usage["by_node"]["drafter"]["models"] == ["m"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_async", [False, True])
+async def test_checkpointer_migrates_a_fresh_database_under_the_schema_lock(db_ready, monkeypatch, use_async):
+    # the migrations include CREATE INDEX CONCURRENTLY, which waits on any session idle in a transaction
+    import uuid
+
+    import psycopg
+
+    from app.core.config import get_settings
+    from app.persistence.checkpointer import CheckpointerManager
+
+    s = get_settings()
+    name = f"cbt_fresh_{uuid.uuid4().hex[:12]}"
+    with psycopg.connect(s.DATABASE_URL, autocommit=True) as admin:
+        admin.execute(f'CREATE DATABASE "{name}"')
+    try:
+        monkeypatch.setattr(s, "DATABASE_URL", psycopg.conninfo.make_conninfo(s.DATABASE_URL, dbname=name))
+        monkeypatch.setattr(s, "CHECKPOINT_BACKEND", "postgres")
+
+        manager = CheckpointerManager()
+        if use_async:
+            await asyncio.wait_for(manager.astart(), 30)
+            await manager.astop()
+        else:
+            await asyncio.wait_for(asyncio.to_thread(manager.start), 30)
+            manager.stop()
+    finally:
+        monkeypatch.undo()
+        with psycopg.connect(s.DATABASE_URL, autocommit=True) as admin:
+            admin.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import psycopg
+import pytest
+
+from app.core.config import get_settings
+from app.main import SESSIONS_TABLE_SQL
+from app.persistence.db import exec_sql, fetch_one
+from app.persistence.run_queue import claim_next_run, enqueue_resume, enqueue_run
+from app.persistence.run_store import get_run, set_run_status, update_run_from_state
+from app.persistence.run_tables import RUNS_ALTER_SQL, RUNS_TABLE_SQL, RUN_EVENTS_TABLE_SQL
+from app.utils.ids import new_thread_id
+
+
+@pytest.fixture(scope="module")
+def db_ready():
+    if not os.getenv("DATABASE_URL"):
+        pytest.skip("DATABASE_URL is not set; skipping run queue tests.")
+
+    # claim_next_run takes any queued job, so the queue must hold only this module's rows:
+    # a throwaway database rather than rewriting jobs other tests or a live worker left in the shared one
+    s = get_settings()
+    name = f"cbt_queue_{uuid.uuid4().hex[:12]}"
+    with psycopg.connect(s.DATABASE_URL, autocommit=True) as admin:
+        admin.execute(f'CREATE DATABASE "{name}"')
+    try:
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(s, "DATABASE_URL", psycopg.conninfo.make_conninfo(s.DATABASE_URL, dbname=name))
+            exec_sql(SESSIONS_TABLE_SQL)
+            exec_sql(RUNS_TABLE_SQL)
+            exec_sql(RUN_EVENTS_TABLE_SQL)
+            exec_sql(RUNS_ALTER_SQL)
+            yield s.DATABASE_URL
+    finally:
+        with psycopg.connect(s.DATABASE_URL, autocommit=True) as admin:
+            admin.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+
+
+def _drain(worker: str, database_url: str) -> list[str]:
+    # module-level so a spawned worker process can run it
+    get_settings().DATABASE_URL = database_url
+    got: list[str] = []
+    while True:
+        job = claim_next_run(worker, stale_seconds=3600)
+        if job is None:
+            return got
+        got.append(job["run_id"])
+
+
+@pytest.mark.parametrize("workers", ["threads", "processes"])
+def test_concurrent_workers_never_claim_the_same_run(db_ready, workers):
+    thread_id = new_thread_id()
+    exec_sql("INSERT INTO sessions (thread_id, mode) VALUES (%s, %s)", [thread_id, "auto"])
+    queued = {enqueue_run(thread_id, f"prompt {i}", require_human_approval=False) for i in range(20)}
+
+    if workers == "processes":  # separate app.worker processes, each with its own connections
+        pool = ProcessPoolExecutor(max_workers=4, mp_context=multiprocessing.get_context("spawn"))
+    else:
+        pool = ThreadPoolExecutor(max_workers=4)
+    with pool:
+        results = list(pool.map(_drain, [f"w{i}" for i in range(4)], [db_ready] * 4))
+
+    claimed = [rid for r in results for rid in r]
+    assert len(claimed) == len(set(claimed))
+    assert set(claimed) == queued
+
+
+def test_resume_requeues_halted_run(db_ready):
+    thread_id = new_thread_id()
+    exec_sql("INSERT INTO sessions (thread_id, mode) VALUES (%s, %s)", [thread_id, "human_required"])
+    run_id = enqueue_run(thread_id, "prompt", require_human_approval=True)
+    assert claim_next_run("w1", stale_seconds=3600)["run_id"] == run_id
+    set_run_status(run_id, "HALTED")
+
+    assert claim_next_run("w1", stale_seconds=3600) is None
+
+    enqueue_resume(run_id, approved=True, edited_text=None, feedback="ok")
+    job = claim_next_run("w2", stale_seconds=3600)
+    assert job["run_id"] == run_id
+    assert job["job_kind"] == "resume"
+    assert job["job_payload"]["feedback"] == "ok"
+    assert get_run(run_id)["status"] == "RUNNING"
+
+
+def test_finished_job_is_not_reclaimed_after_an_inline_resume(db_ready):
+    thread_id = new_thread_id()
+    exec_sql("INSERT INTO sessions (thread_id, mode) VALUES (%s, %s)", [thread_id, "human_required"])
+    run_id = enqueue_run(thread_id, "prompt", require_human_approval=True)
+    assert claim_next_run("w1", stale_seconds=3600)["run_id"] == run_id
+    update_run_from_state(run_id, status="HALTED", state={})
+
+    # approved inline (schedule_resume): RUNNING again in the API process, not a queued job
+    set_run_status(run_id, "RUNNING")
+    row = fetch_one("SELECT job_kind, claimed_by, claimed_at FROM runs WHERE run_id=%s", [run_id])
+    assert row == {"job_kind": None, "claimed_by": None, "claimed_at": None}  # never claimable, however old
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from app.services.run_stream import stream_run
+from app.services.websocket_manager import ws_manager
+from tests.test_state_sync import _state
+
+
+async def _collect(gen) -> list[bytes]:
+    return [chunk async for chunk in gen]
+
+
+@pytest.mark.asyncio
+async def test_sse_resumes_after_last_event_id_and_ends_with_the_run():
+    thread_id, run_id = "t-sse", "r-sse"
+    for seq, type_ in enumerate(["run_started", "node_update", "node_update"], start=1):
+        await ws_manager.broadcast(thread_id, {"type": type_, "seq": seq, "run_id": run_id}, state=_state(seq))
+
+    reader = asyncio.create_task(_collect(stream_run(run_id, thread_id, after_seq=1, finished=False)))
+    await asyncio.sleep(0.05)
+    await ws_manager.broadcast(thread_id, {"type": "node_update", "seq": 1, "run_id": "another-run"})
+    await ws_manager.broadcast(thread_id, {"type": "halt_required", "seq": 4, "run_id": run_id, "interrupts": []})
+    await ws_manager.broadcast(thread_id, {"type": "resume_completed", "seq": 5, "run_id": run_id})
+    chunks = await asyncio.wait_for(reader, timeout=2)
+
+    assert chunks[0] == b"retry: 2000\n\n"
+    events = [c.decode().split("\n")[:2] for c in chunks[1:]]
+    assert events == [
+        ["id: 2", "event: node_update"],
+        ["id: 3", "event: node_update"],
+        ["id: 4", "event: halt_required"],
+        ["id: 5", "event: resume_completed"],
+    ]
+    assert b'"replayed":true' in chunks[1] and b'"state"' not in chunks[1]
+    assert not ws_manager.has_subscribers(thread_id)
+
+    # a finished run: just the backlog, then the stream closes
+    chunks = await asyncio.wait_for(_collect(stream_run(run_id, thread_id, after_seq=3, finished=True)), timeout=2)
+    assert [c.split(b"\n")[0] for c in chunks[1:]] == [b"id: 4", b"id: 5"]
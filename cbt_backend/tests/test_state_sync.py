@@ -0,0 +1,282 @@
+import asyncio
+import json
+
+import ormsgpack
+import pytest
+
+from app.services.state_sync import StateSyncRegistry, apply_patch, json_diff
+from app.services.websocket_manager import MSGPACK_SUBPROTOCOL, ConnectionOptions, WebSocketManager
+
+
+class FakeSocket:
+    def __init__(self, gate: asyncio.Event | None = None) -> None:
+        self.sent: list[dict] = []
+        self.frames: list[str] = []
+        self.gate = gate  # a slow client: sends block until the gate opens
+        self.closed = False
+
+    async def accept(self, subprotocol: str | None = None) -> None:
+        self.subprotocol = subprotocol
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed = True
+        self.close_code = code
+
+    async def send_text(self, data: str) -> None:
+        if self.gate is not None:
+            await self.gate.wait()
+        self.frames.append(data)
+        self.sent.append(json.loads(data))
+
+    async def send_bytes(self, data: bytes) -> None:
+        if self.gate is not None:
+            await self.gate.wait()
+        self.frames.append(data)
+        self.sent.append(ormsgpack.unpackb(data))
+
+
+def _state(n_drafts: int) -> dict:
+    return {
+        "status": "RUNNING",
+        "drafts": [{"version": i + 1, "markdown": "# Draft\n" + "x" * 2000} for i in range(n_drafts)],
+        "reviews": {"safety": {"safety_pass": n_drafts > 1}},
+        "scratchpad": {"drafter": [f"v{i}" for i in range(n_drafts)]},
+        "metrics": {"iteration": n_drafts},
+    }
+
+
+def test_diff_appends_only_new_drafts_and_round_trips():
+    old, new = _state(2), _state(3)
+    new["final"] = {"markdown": "done"}
+    del new["reviews"]["safety"]
+
+    ops = json_diff(old, new)
+
+    assert {"op": "add", "path": "/drafts/-", "value": new["drafts"][2]} in ops
+    assert all(not op["path"].startswith("/drafts/0") for op in ops)
+    assert apply_patch(old, ops) == new
+    assert json_diff(new, new) == []
+
+
+def test_registry_versions_are_monotonic_and_chain():
+    reg = StateSyncRegistry(max_threads=1)
+    base, seq1, ops = reg.advance("t1", _state(1))
+    assert base == 0 and ops is None
+
+    base, seq2, ops = reg.advance("t1", _state(2))
+    assert base == seq1 and seq2 > seq1
+    assert apply_patch(_state(1), ops) == _state(2)
+
+    reg.advance("t2", _state(1))  # evicts t1
+    assert reg.get("t1") is None
+
+
+@pytest.mark.asyncio
+async def test_broadcast_sends_delta_or_full_state_per_socket():
+    mgr = WebSocketManager()
+    legacy, delta, debug = FakeSocket(), FakeSocket(), FakeSocket()
+    await mgr.connect("t", legacy)
+    await mgr.connect("t", delta, ConnectionOptions(delta=True))
+    await mgr.connect("t", debug, ConnectionOptions(debug=True))
+
+    # a client that keeps up gets every frame
+    await mgr.broadcast("t", {"type": "node_update", "seq": 2, "patch": {"x": 1}}, state=_state(1))
+    await mgr.flush()
+    await mgr.broadcast("t", {"type": "node_update", "seq": 3, "patch": {"x": 2}}, state=_state(2))
+    await mgr.flush()
+    await mgr.broadcast("t", {"type": "state_update", "seq": 3}, debug=True)
+    await mgr.flush()
+
+    assert [m["state"] for m in legacy.sent] == [_state(1), _state(2)]
+
+    first, second = delta.sent
+    assert "state" not in second and "patch" not in second
+    assert second["base_seq"] == first["state_seq"]
+    assert apply_patch(apply_patch(None, first["delta"]), second["delta"]) == _state(2)
+
+    assert [m["type"] for m in debug.sent] == ["node_update", "node_update", "state_update"]
+
+
+@pytest.mark.asyncio
+async def test_broadcast_encodes_once_per_variant(monkeypatch):
+    import app.services.websocket_manager as wsm
+
+    calls = []
+    real = wsm.dumps_text
+    monkeypatch.setattr(wsm, "dumps_text", lambda obj: calls.append(obj) or real(obj))
+
+    mgr = WebSocketManager()
+    socks = [FakeSocket() for _ in range(20)]
+    for i, ws in enumerate(socks):
+        await mgr.connect("t", ws, ConnectionOptions(delta=i % 2 == 0))
+
+    await mgr.broadcast("t", {"type": "node_update", "seq": 2}, state=_state(1))
+    await mgr.flush()
+
+    assert len(calls) == 2  # one full-state frame, one delta frame
+    assert len({ws.frames[0] for ws in socks}) == 2
+
+
+@pytest.mark.asyncio
+async def test_slow_client_coalesces_state_and_keeps_control_order():
+    mgr = WebSocketManager()
+    gate = asyncio.Event()
+    slow, fast = FakeSocket(gate), FakeSocket()
+    await mgr.connect("t", slow)
+    await mgr.connect("t", fast)
+
+    async def emit(msg, **kw):
+        # the runner side never waits on the blocked socket; the fast client is let catch up as between real nodes
+        await mgr.broadcast("t", msg, **kw)
+        for _ in range(20):
+            if fast.sent and fast.sent[-1]["seq"] == msg["seq"]:
+                break
+            await asyncio.sleep(0)
+
+    await emit({"type": "run_started", "seq": 1})  # slow writer is now stuck sending this
+    for i in range(1, 6):
+        await emit({"type": "node_update", "seq": i + 1}, state=_state(i))
+    await emit({"type": "halt_required", "seq": 7})
+    await emit({"type": "node_update", "seq": 8}, state=_state(6))
+    await emit({"type": "run_completed", "seq": 9})
+
+    assert [m["seq"] for m in fast.sent] == [1, 2, 3, 4, 5, 6, 7, 8, 9]
+    assert mgr.stats()["max_queue_depth"] > 0
+
+    gate.set()
+    assert await mgr.flush(timeout=1)
+    assert [m["seq"] for m in slow.sent] == [1, 6, 7, 8, 9]
+    assert slow.sent[1]["state"] == _state(5)
+    assert not slow.closed
+
+
+@pytest.mark.asyncio
+async def test_overflow_keeps_surviving_state_ahead_of_later_control_events(monkeypatch):
+    mgr = WebSocketManager()
+    monkeypatch.setattr(mgr, "queue_max", 3)
+    gate = asyncio.Event()
+    ws = FakeSocket(gate)
+    await mgr.connect("t", ws)
+
+    await mgr.broadcast("t", {"type": "run_started", "seq": 1})
+    await asyncio.sleep(0)  # writer is stuck sending this
+    await mgr.broadcast("t", {"type": "node_update", "seq": 2}, state=_state(1))
+    await mgr.broadcast("t", {"type": "halt_required", "seq": 3})
+    await mgr.broadcast("t", {"type": "node_update", "seq": 4}, state=_state(2))
+    await mgr.broadcast("t", {"type": "run_completed", "seq": 5})  # overflows
+    assert mgr.stats()["dropped_total"] == 1
+
+    gate.set()
+    assert await mgr.flush(timeout=1)
+    assert [m["seq"] for m in ws.sent] == [1, 3, 4, 5]
+    assert ws.sent[2]["state"] == _state(2)
+
+
+@pytest.mark.asyncio
+async def test_slow_client_gets_draft_deltas_merged_instead_of_being_evicted(monkeypatch):
+    mgr = WebSocketManager()
+    monkeypatch.setattr(mgr, "queue_max", 4)
+    gate = asyncio.Event()
+    ws = FakeSocket(gate)
+    await mgr.connect("t", ws)
+
+    await mgr.broadcast("t", {"type": "run_started", "seq": 1})
+    await asyncio.sleep(0)  # writer is stuck sending this
+    text = "# Draft\n" + "".join(f"line {i}\n" for i in range(50))
+    for i in range(0, len(text), 5):
+        msg = {"type": "draft_delta", "run_id": "r", "node": "drafter", "version": 1, "offset": i, "text": text[i : i + 5]}
+        await mgr.broadcast("t", msg)
+    assert mgr.stats()["connections"] == 1 and mgr.stats()["coalesced_total"] > 0
+
+    gate.set()
+    assert await mgr.flush(timeout=1)
+    live = ""
+    for m in ws.sent[1:]:  # what the UI does: splice each chunk in at its offset
+        assert m["type"] == "draft_delta" and m["offset"] <= len(live)
+        live = live[: m["offset"]] + m["text"]
+    assert live == text and len(ws.sent) <= 3
+
+    # once the draft is committed, a merged frame still queued has nothing left to send
+    gate.clear()
+    before = len(ws.sent)
+    await mgr.broadcast("t", {**msg, "offset": len(text), "text": "more"})
+    await mgr.broadcast("t", {**msg, "offset": len(text) + 4, "text": "!"})
+    await mgr.broadcast("t", {"type": "node_update", "seq": 2}, state=_state(1))
+    gate.set()
+    assert await mgr.flush(timeout=1)
+    assert [m["type"] for m in ws.sent[before:]] == ["node_update"]
+    assert mgr.stats()["draft_threads"] == 0
+
+
+@pytest.mark.asyncio
+async def test_overflow_sheds_deltas_to_a_snapshot_then_drops_dead_peer(monkeypatch):
+    mgr = WebSocketManager()
+    monkeypatch.setattr(mgr, "queue_max", 4)
+    gate = asyncio.Event()
+    ws = FakeSocket(gate)
+    await mgr.connect("t", ws, ConnectionOptions(delta=True))
+
+    await mgr.broadcast("t", {"type": "run_started", "seq": 1})
+    await asyncio.sleep(0)
+    for i in range(1, 10):
+        await mgr.broadcast("t", {"type": "node_update", "seq": i + 1}, state=_state(i))
+    assert mgr.stats()["dropped_total"] > 0
+
+    gate.set()
+    assert await mgr.flush(timeout=1)
+    last = ws.sent[-1]
+    assert last["type"] == "snapshot" and last["state"] == _state(9)
+
+    # a peer that reads nothing while control events pile up is evicted, not waited on
+    gate.clear()
+    for i in range(6):
+        await mgr.broadcast("t", {"type": "run_started", "seq": 100 + i})
+    await asyncio.sleep(0)
+    assert mgr.stats()["connections"] == 0 and mgr.stats()["slow_disconnects_total"] == 1
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_sweep_evicts_silent_sockets_and_keeps_live_ones():
+    mgr = WebSocketManager()
+    mgr.idle_timeout = 30
+    quiet, live = FakeSocket(), FakeSocket()
+    await mgr.connect("t", quiet)
+    await mgr.connect("t", live)
+    mgr._conns[quiet].last_seen -= 60
+    mgr.touch(live)
+
+    mgr.sweep()
+    mgr.sweep()  # the second heartbeat supersedes the first if it hasn't gone out yet
+    assert await mgr.flush(timeout=1)
+    await asyncio.sleep(0)
+
+    assert quiet.closed and quiet.close_code == 1001
+    assert [m["type"] for m in live.sent] == ["heartbeat"] and not live.closed
+    stats = mgr.stats()
+    assert stats["connections"] == 1 and stats["subscriptions"] == 1
+    assert stats["evictions"]["idle"] == 1
+
+    await mgr.broadcast("t", {"type": "run_started", "seq": 1})
+    assert await mgr.flush(timeout=1)
+    assert live.sent[-1]["seq"] == 1 and not quiet.sent
+
+
+@pytest.mark.asyncio
+async def test_msgpack_subprotocol_gets_same_events_as_binary_frames():
+    mgr = WebSocketManager()
+    text, binary = FakeSocket(), FakeSocket()
+    await mgr.connect("t", text, ConnectionOptions(delta=True))
+    await mgr.connect("t", binary, ConnectionOptions(delta=True), subprotocol=MSGPACK_SUBPROTOCOL)
+    assert binary.subprotocol == MSGPACK_SUBPROTOCOL and text.subprotocol is None
+
+    await mgr.broadcast("t", {"type": "run_started", "seq": 1, "run_id": "r"})
+    await mgr.broadcast("t", {"type": "node_update", "seq": 2, "run_id": "r"}, state=_state(2))
+    assert await mgr.flush(timeout=1)
+    mgr.send_json(binary, {"type": "subscribed"})
+    assert await mgr.flush(timeout=1)
+
+    assert all(isinstance(f, str) for f in text.frames)
+    assert all(isinstance(f, bytes) for f in binary.frames)
+    assert binary.sent[:-1] == text.sent and binary.sent[-1] == {"type": "subscribed"}
+    assert len(binary.frames[1]) < len(text.frames[1])
+    assert mgr.stats()["msgpack_connections"] == 1
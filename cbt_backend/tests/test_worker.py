@@ -0,0 +1,68 @@
+import asyncio
+
+import psycopg
+import pytest
+
+from app import worker as worker_module
+from app.core.config import get_settings
+from app.services.run_control import CANCELLED, run_controls
+from app.worker import RunQueueWorker
+
+
+@pytest.mark.asyncio
+async def test_worker_rides_out_database_errors(monkeypatch):
+    s = get_settings()
+    for name in ("RUN_QUEUE_POLL_SECONDS", "RUN_QUEUE_HEARTBEAT_SECONDS", "RUN_CANCEL_POLL_SECONDS"):
+        monkeypatch.setattr(s, name, 0.01)
+
+    def flaky(results):
+        # raises for the first call, then answers from `results` (the last one repeats)
+        calls = []
+
+        def call(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise psycopg.OperationalError("connection reset")
+            return results[min(len(calls) - 2, len(results) - 1)]
+
+        return calls, call
+
+    job = {"run_id": "r1", "thread_id": "t1", "job_kind": "run", "input_text": "hi"}
+    claims, claim = flaky([job, None])
+    beats, beat = flaky([None])
+    polls, poll = flaky([[]])
+    monkeypatch.setattr(worker_module, "claim_next_run", claim)
+    monkeypatch.setattr(worker_module, "heartbeat_run", beat)
+    monkeypatch.setattr(worker_module, "cancel_requested_runs", poll)
+    outcome: list[str | None] = []
+
+    async def run_with_ws(*, run_id, **kw):
+        with run_controls.track(run_id):
+            try:
+                while len(beats) < 3 or len(polls) < 3:
+                    await asyncio.sleep(0.01)
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                asyncio.current_task().uncancel()
+                outcome.append(run_controls.pop_reason(run_id))
+
+    monkeypatch.setattr(worker_module, "run_with_ws", run_with_ws)
+    w = RunQueueWorker("w1", concurrency=1)
+    loop = asyncio.create_task(w.run())
+
+    # the failed claim is retried; the heartbeat and cancel watch keep going after their first error
+    for _ in range(200):
+        if len(beats) >= 3 and len(polls) >= 3:
+            break
+        await asyncio.sleep(0.01)
+    assert len(claims) >= 2 and len(beats) >= 3 and len(polls) >= 3
+
+    monkeypatch.setattr(worker_module, "cancel_requested_runs", lambda worker_id: ["r1"])
+    for _ in range(200):
+        if outcome:
+            break
+        await asyncio.sleep(0.01)
+    assert outcome == [CANCELLED]
+
+    w.request_stop()
+    await asyncio.wait_for(loop, 1)
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from app.main import SESSIONS_TABLE_SQL
+from app.persistence.db import exec_sql, fetch_one
+from app.persistence.run_store import create_run, list_run_events
+from app.persistence.run_tables import RUNS_ALTER_SQL, RUNS_TABLE_SQL, RUN_EVENTS_TABLE_SQL
+from app.services.state_sync import apply_patch
+from app.services.websocket_manager import ConnectionOptions, WebSocketManager
+from app.services.ws_broadcast import PostgresBroadcastBackend
+from app.utils.ids import new_thread_id
+from tests.test_state_sync import FakeSocket, _state
+
+
+async def _manager(channel: str) -> WebSocketManager:
+    mgr = WebSocketManager()
+    backend = PostgresBroadcastBackend(os.environ["DATABASE_URL"], channel, inline_max_bytes=2000)
+    backend.bind(mgr)
+    await backend.start()
+    mgr.backend = backend
+    return mgr
+
+
+async def _until(cond, timeout: float = 5.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not cond():
+        assert asyncio.get_running_loop().time() < deadline, "timed out waiting for fan-out"
+        await asyncio.sleep(0.02)
+
+
+@pytest.mark.asyncio
+async def test_events_reach_sockets_on_another_process():
+    if not os.getenv("DATABASE_URL"):
+        pytest.skip("DATABASE_URL is not set; skipping LISTEN/NOTIFY tests.")
+    exec_sql(SESSIONS_TABLE_SQL)
+    exec_sql(RUNS_TABLE_SQL)
+    exec_sql(RUN_EVENTS_TABLE_SQL)
+    exec_sql(RUNS_ALTER_SQL)
+
+    thread_id = new_thread_id()
+    exec_sql("INSERT INTO sessions (thread_id, mode) VALUES (%s, %s)", [thread_id, "auto"])
+    run_id = create_run(thread_id=thread_id, input_text="x", require_human_approval=False)
+
+    channel = f"cbt_ws_test_{uuid.uuid4().hex[:8]}"
+    runner_side, api_side = await _manager(channel), await _manager(channel)
+    try:
+        local, remote, remote_delta = FakeSocket(), FakeSocket(), FakeSocket()
+        await runner_side.connect(thread_id, local)
+        await api_side.connect(thread_id, remote)
+        await api_side.connect(thread_id, remote_delta, ConnectionOptions(delta=True))
+
+        async def emit(msg, **kw):
+            await runner_side.broadcast(thread_id, {**msg, "run_id": run_id}, **kw)
+            await asyncio.sleep(0.01)  # node work between events (back to back, state frames would coalesce)
+
+        await emit({"type": "run_started", "seq": 1})
+        # full states are far above inline_max_bytes => sent by reference
+        await emit({"type": "node_update", "seq": 2}, state=_state(1))
+        await emit({"type": "node_update", "seq": 3}, state=_state(2))
+        await emit({"type": "run_completed", "seq": 4})
+
+        await _until(lambda: len(remote.sent) == 4 and len(remote_delta.sent) == 4)
+        assert await runner_side.flush(timeout=1)
+
+        assert [m["seq"] for m in remote.sent] == [1, 2, 3, 4]
+        assert remote.sent[2]["state"] == _state(2)
+        doc = apply_patch(None, remote_delta.sent[1]["delta"])
+        assert apply_patch(doc, remote_delta.sent[2]["delta"]) == _state(2)
+
+        # the publishing process delivers its own events once, not again off the notification
+        assert [m["seq"] for m in local.sent] == [1, 2, 3, 4]
+
+        stats = api_side.backend.stats()
+        assert stats["received_by_ref_total"] == 2 and stats["received_total"] == 4
+
+        # the by-reference rows stay out of the run's public event log
+        assert fetch_one("SELECT count(*) AS n FROM run_events WHERE run_id=%s AND event_type='ws_broadcast'", [run_id])["n"] == 2
+        assert all(e["event_type"] != "ws_broadcast" for e in list_run_events(run_id))
+    finally:
+        await runner_side.backend.stop()
+        await api_side.backend.stop()
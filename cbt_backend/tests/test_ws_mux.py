@@ -0,0 +1,72 @@
+import pytest
+
+from app.services.state_sync import apply_patch
+from app.services.websocket_manager import ConnectionOptions, WebSocketManager
+from tests.test_state_sync import FakeSocket, _state
+
+
+async def _emit(mgr: WebSocketManager, thread_id: str, seq: int, type_: str, **kw) -> None:
+    await mgr.broadcast(
+        thread_id,
+        {"type": type_, "seq": seq, "run_id": f"run-{thread_id}", "node": "drafter", "summary": "s", "patch": {"x": 1}},
+        **kw,
+    )
+    await mgr.flush(timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_one_socket_filters_and_projects_per_subscription():
+    mgr = WebSocketManager()
+    ws = FakeSocket()
+    await mgr.connect_mux(ws)
+
+    # ops view: just progress events for t1, no state, trimmed to a few fields
+    await mgr.subscribe(ws, "t1", ConnectionOptions(state=False, types=frozenset({"node_update", "halt_required"}), fields=("node",)))
+    # t2: only completion events, but keeps an in-sync state via deltas
+    await mgr.subscribe(ws, "t2", ConnectionOptions(delta=True, types=frozenset({"run_completed"})))
+    assert mgr.stats()["connections"] == 1 and mgr.stats()["subscriptions"] == 2
+
+    await _emit(mgr, "t1", 1, "run_started")
+    await _emit(mgr, "t1", 2, "node_update", state=_state(1))
+    await _emit(mgr, "t1", 3, "state_update", debug=True)
+    await _emit(mgr, "t2", 1, "node_update", state=_state(1))
+    await _emit(mgr, "t2", 2, "node_update", state=_state(2))
+    await _emit(mgr, "t2", 3, "run_completed")
+
+    t1 = [m for m in ws.sent if m["thread_id"] == "t1"]
+    assert t1 == [{"type": "node_update", "seq": 2, "run_id": "run-t1", "node": "drafter", "thread_id": "t1"}]
+
+    t2 = [m for m in ws.sent if m["thread_id"] == "t2"]
+    assert [m["type"] for m in t2] == ["state_delta", "state_delta", "run_completed"]
+    assert t2[1]["base_seq"] == t2[0]["state_seq"]
+    assert apply_patch(apply_patch(None, t2[0]["delta"]), t2[1]["delta"]) == _state(2)
+
+    mgr.unsubscribe(ws, "t1")
+    await _emit(mgr, "t1", 4, "node_update", state=_state(2))
+    assert not [m for m in ws.sent if m["thread_id"] == "t1" and m["seq"] == 4]
+    assert mgr.stats()["rooms"] == 1
+
+
+@pytest.mark.asyncio
+async def test_mux_subscribers_share_encoded_frames_and_respect_limit(monkeypatch):
+    import app.services.websocket_manager as wsm
+
+    calls = []
+    real = wsm.dumps_text
+    monkeypatch.setattr(wsm, "dumps_text", lambda obj: calls.append(obj) or real(obj))
+
+    mgr = WebSocketManager()
+    monkeypatch.setattr(mgr, "max_subscriptions", 1)
+    socks = [FakeSocket() for _ in range(10)]
+    opts = ConnectionOptions(state=False, fields=("summary",))
+    for ws in socks:
+        await mgr.connect_mux(ws)
+        assert await mgr.subscribe(ws, "t", opts)
+    assert not await mgr.subscribe(socks[0], "other", opts)
+
+    calls.clear()
+    await mgr.broadcast("t", {"type": "node_update", "seq": 2, "run_id": "r", "summary": "s", "patch": {}}, state=_state(1))
+    await mgr.flush(timeout=1)
+
+    assert len(calls) == 1
+    assert all(ws.sent == [{"type": "node_update", "seq": 2, "run_id": "r", "summary": "s", "thread_id": "t"}] for ws in socks)
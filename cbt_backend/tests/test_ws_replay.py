@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from app.main import SESSIONS_TABLE_SQL
+from app.persistence.db import exec_sql
+from app.persistence.run_store import create_run, log_event, next_event_seq
+from app.persistence.run_tables import RUNS_ALTER_SQL, RUNS_TABLE_SQL, RUN_EVENTS_TABLE_SQL
+from app.services.runner import load_run_events
+from app.services.websocket_manager import WebSocketManager
+from app.services.ws_replay import ReplayBuffer
+from app.utils.ids import new_thread_id
+from tests.test_state_sync import FakeSocket, _state
+
+
+def _event(run_id: str, seq: int, type_: str = "node_update") -> dict:
+    return {"type": type_, "seq": seq, "run_id": run_id, "summary": f"step {seq}"}
+
+
+def test_ring_reports_whether_it_covers_the_gap():
+    buf = ReplayBuffer(max_threads=1, per_thread=3)
+    for seq in range(1, 6):
+        buf.record("t", _event("r1", seq))
+
+    events, complete = buf.since("t", "r1", 3)
+    assert [e["seq"] for e in events] == [4, 5] and complete
+
+    events, complete = buf.since("t", "r1", 1)  # seq 2 was pushed out
+    assert [e["seq"] for e in events] == [3, 4, 5] and not complete
+
+    assert buf.since("t", "other-run", 0) == ([], False)
+
+    buf.record("t2", _event("r2", 1))  # evicts thread t
+    assert buf.since("t", "r1", 3) == ([], False)
+
+
+def test_ring_with_a_hole_is_not_complete():
+    # with the postgres backend a by-ref event is skipped (never recorded) while this process has no subscribers
+    buf = ReplayBuffer()
+    for seq in (1, 2, 4, 5):
+        buf.record("t", _event("r1", seq))
+
+    events, complete = buf.since("t", "r1", 1)
+    assert [e["seq"] for e in events] == [2, 4, 5] and not complete
+    events, complete = buf.since("t", "r1", 3)
+    assert [e["seq"] for e in events] == [4, 5] and complete
+
+
+@pytest.mark.asyncio
+async def test_reconnect_replays_missed_events_before_live_ones():
+    mgr = WebSocketManager()
+    # the run keeps going while nobody is connected
+    for seq in range(1, 5):
+        await mgr.broadcast("t", _event("r1", seq), state=_state(seq))
+        await mgr.broadcast("t", {"type": "state_update", "seq": seq, "run_id": "r1"}, debug=True)
+
+    async def no_db(run_id, after_seq):
+        raise AssertionError("the ring covers this gap")
+
+    ws = FakeSocket()
+    await mgr.connect("t", ws, after=("r1", 2), load_events=no_db)
+    await mgr.broadcast("t", _event("r1", 5, "run_completed"))
+    assert await mgr.flush(timeout=1)
+
+    assert [(m["seq"], m.get("replayed", False)) for m in ws.sent] == [(3, True), (4, True), (5, False)]
+    assert all("state" not in m for m in ws.sent[:2])
+
+
+@pytest.mark.asyncio
+async def test_reconnect_falls_back_to_run_events(monkeypatch):
+    if not os.getenv("DATABASE_URL"):
+        pytest.skip("DATABASE_URL is not set; skipping replay fallback test.")
+    exec_sql(SESSIONS_TABLE_SQL)
+    exec_sql(RUNS_TABLE_SQL)
+    exec_sql(RUN_EVENTS_TABLE_SQL)
+    exec_sql(RUNS_ALTER_SQL)
+
+    thread_id = new_thread_id()
+    exec_sql("INSERT INTO sessions (thread_id, mode) VALUES (%s, %s)", [thread_id, "auto"])
+    run_id = create_run(thread_id=thread_id, input_text="x", require_human_approval=True)
+
+    mgr = WebSocketManager()
+    mgr.replay = ReplayBuffer(per_thread=2)
+
+    # first leg halts; seqs carry on for the resume leg instead of restarting at 1
+    assert next_event_seq(run_id) == 1
+    for seq, type_ in enumerate(["run_started", "node_update", "node_update", "halt_required"], start=1):
+        msg = _event(run_id, seq, type_)
+        log_event(run_id, type_, payload={"summary": msg["summary"]}, seq=seq)
+        await mgr.broadcast(thread_id, msg)
+    assert next_event_seq(run_id) == 5
+
+    ws = FakeSocket()
+    await mgr.connect(thread_id, ws, after=(run_id, 1), load_events=load_run_events)
+    assert await mgr.flush(timeout=1)
+
+    assert [m["seq"] for m in ws.sent] == [2, 3, 4]
+    assert ws.sent[0]["type"] == "node_update" and ws.sent[0]["summary"] == "step 2"
+    assert mgr.stats()["replayed_from_db_total"] == 3